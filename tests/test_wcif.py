@@ -0,0 +1,40 @@
+"""Round trips of generated schedules through export_wcif and read_wcif."""
+import io
+import json
+
+import pytest
+
+from tools.scheduling import Config, Event, estimate, schedule
+from tools.scheduling.constants import categories, fixed_time_categories
+from tools.scheduling.wcif import DEFAULT_DAY_HOURS, export_wcif, read_wcif
+
+
+def round_trip(config):
+    plan = estimate(config)
+    result = schedule(plan)
+    document = export_wcif(config, plan, result, 'Test2026', 'Test 2026', '2026-01-01')
+    return document, read_wcif(io.StringIO(json.dumps(document)))
+
+
+@pytest.mark.parametrize('category', categories)
+def test_event_settings_round_trip(category):
+    if category in fixed_time_categories:
+        event = Event(category)
+    else:
+        event = Event(category, rounds=2, cutoff='5:00')
+    config = Config(200, (event,), 1, (DEFAULT_DAY_HOURS,), category)
+    _, competition = round_trip(config)
+    assert competition.events == (event,)
+
+
+def test_days_keep_the_default_hours():
+    config = Config(20, (Event('3x3'), Event('Skewb')), 2, (DEFAULT_DAY_HOURS,) * 2, '3x3')
+    _, competition = round_trip(config)
+    assert competition.day_schedules == (DEFAULT_DAY_HOURS,) * 2
+
+
+def test_time_limits_follow_the_event():
+    config = Config(200, (Event('3x3'), Event('7x7')), 1, (DEFAULT_DAY_HOURS,), '3x3')
+    document, _ = round_trip(config)
+    limits = {event['id']: event['rounds'][0]['timeLimit']['centiseconds'] for event in document['events']}
+    assert limits['333'] < limits['777']
@@ -0,0 +1,243 @@
+"""
+Benchmarks of the estimation and scheduling hot paths.
+
+Every scenario (events, competitors, days, rounds) runs the core functions, the
+page's schedule_to_frame and display_schedule, and a full scheduleGenerator()
+script run through Streamlit's AppTest harness. For each function the median
+wall time is taken over several runs, then one more run is traced with
+tracemalloc for its peak memory and the memory blocks it allocated that are
+still alive when it returns. These retained blocks stand in for an allocation
+count, which tracemalloc cannot give: memory a call allocates and frees again
+only shows in its peak. Memoized functions have their caches cleared
+before each run unless the benchmark is of the memoized rerun.
+
+    python -m tools.benchmark --output benchmark.json
+    python -m tools.benchmark --baseline benchmark.json --time-threshold 0.25
+
+With --baseline the run exits with status 1 if any function got slower or
+used more memory than the thresholds allow.
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+from tools.scheduling import Config, Event, estimate, schedule
+from tools.scheduling.constants import categories
+from tools.scheduling.estimation import estimate_event
+from tools.scheduling.solver import solve
+from tools.scheduling.stages import schedule_stages
+from tools.scheduling.stations import probe
+
+# Relative increase over the baseline reported as a regression
+TIME_THRESHOLD = 0.2
+MEMORY_THRESHOLD = 0.2
+# Differences below these are noise whatever the ratio
+MIN_TIME_MS = 1.0
+MIN_MEMORY_KIB = 64
+
+SOLVER_TIME_BUDGET = 0.5
+APPTEST_TIMEOUT = 120
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    name: str
+    events: int
+    competitors: int
+    days: int
+    rounds: int
+
+    def config(self):
+        events = tuple(Event(category, rounds=self.rounds) for category in categories[:self.events])
+        return Config(self.competitors, events, self.days, (('08:00', '18:00'),) * self.days)
+
+
+SCENARIOS = (
+    Scenario('tiny', 1, 10, 1, 1),
+    Scenario('small', 5, 100, 1, 2),
+    Scenario('medium', 11, 500, 2, 3),
+    Scenario('large', 17, 1000, 3, 4),
+    Scenario('huge', 17, 5000, 3, 4),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Measurement:
+    """Wall times in milliseconds, memory in KiB"""
+    scenario: str
+    function: str
+    repeats: int
+    wall_ms: float
+    min_ms: float
+    peak_kib: float
+    retained_blocks: int
+
+
+def measure(scenario, function, run, setup=None, repeats=5):
+    """Time run() repeats times, then trace one more call for its memory use"""
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - started) * 1000)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained_blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(before, 'lineno'))
+    return Measurement(scenario.name, function, repeats, round(statistics.median(times), 3),
+                       round(min(times), 3), round(peak / 1024, 1), retained_blocks)
+
+def _clear_page_caches():
+    from tools import scheduleGenerator as page
+    estimate_event.cache_clear()
+    probe.cache_clear()
+    for cached in (page.estimates_to_frame, page.schedule_competition, page.schedule_to_frame,
+                   page.schedule_day_views, page.simulate_overruns, page.live_schedule,
+                   page.schedule_wcif, page.schedule_timeline, page.setting_suggestions,
+                   page.sweep_to_frame, page.station_trade_off, page.export_key,
+                   page.competitor_order, page.group_assignment, page.staff_assignment,
+                   page.schedule_csv):
+        cached.cache_clear()
+
+def _render_schedule(result):
+    from tools.scheduleGenerator import display_schedule, schedule_day_views
+    schedule_day_views.cache_clear()
+    display_schedule(result)
+
+def _page():
+    from tools.scheduleGenerator import scheduleGenerator
+    scheduleGenerator()
+
+def _page_test(scenario):
+    """AppTest of the page with the scenario's settings already in session state"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_function(_page, default_timeout=APPTEST_TIMEOUT)
+    config = scenario.config()
+    at.session_state['selected_categories'] = [event.category for event in config.events]
+    at.session_state['number_of_competitors'] = scenario.competitors
+    at.session_state['num_days'] = scenario.days
+    at.session_state['day_schedules'] = config.day_schedules + config.day_schedules[-1:] * (3 - scenario.days)
+    at.session_state['rounds_cutoffs'] = {event.category: event for event in config.events}
+    return at
+
+def _checked(at):
+    if at.exception:
+        raise RuntimeError(f"Page raised: {at.exception[0].value}")
+    return at
+
+def core_benchmarks(scenario, repeats):
+    config = scenario.config()
+    plan = estimate(config)
+    return [
+        measure(scenario, 'estimate', lambda: estimate(config), estimate_event.cache_clear, repeats),
+        measure(scenario, 'estimate (memoized)', lambda: estimate(config), repeats=repeats),
+        measure(scenario, 'schedule', lambda: schedule(plan), repeats=repeats),
+        measure(scenario, 'schedule_stages', lambda: schedule_stages(plan), repeats=repeats),
+        measure(scenario, 'solve', lambda: solve(plan, SOLVER_TIME_BUDGET), repeats=min(repeats, 3)),
+    ]
+
+def page_benchmarks(scenario, repeats):
+    from streamlit.testing.v1 import AppTest
+    from tools.scheduleGenerator import schedule_competition, schedule_to_frame
+    plan = estimate(scenario.config())
+    result, _ = schedule_competition(plan)
+
+    measurements = [
+        measure(scenario, 'schedule_to_frame', lambda: schedule_to_frame(result),
+                schedule_to_frame.cache_clear, repeats),
+        measure(scenario, 'display_schedule',
+                lambda: _checked(AppTest.from_function(_render_schedule, default_timeout=APPTEST_TIMEOUT,
+                                                       args=(result,)).run()),
+                repeats=repeats),
+        measure(scenario, 'scheduleGenerator', lambda: _checked(_page_test(scenario).run()),
+                _clear_page_caches, repeats=min(repeats, 3)),
+    ]
+    # A rerun with nothing changed, as after any widget interaction that hits the caches
+    at = _checked(_page_test(scenario).run())
+    measurements.append(measure(scenario, 'scheduleGenerator (rerun)', lambda: _checked(at.run()),
+                                repeats=min(repeats, 3)))
+    return measurements
+
+def run_benchmarks(scenarios=SCENARIOS, repeats=5, page=True):
+    measurements = []
+    for scenario in scenarios:
+        measurements.extend(core_benchmarks(scenario, repeats))
+        if page:
+            measurements.extend(page_benchmarks(scenario, repeats))
+    return measurements
+
+def compare(measurements, baseline, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """Regressions against baseline results as (scenario, function, message) tuples"""
+    previous = {(row['scenario'], row['function']): row for row in baseline['results']}
+    regressions = []
+    for current in measurements:
+        before = previous.get((current.scenario, current.function))
+        if before is None:
+            continue
+        if current.wall_ms - before['wall_ms'] > MIN_TIME_MS \
+                and current.wall_ms > before['wall_ms'] * (1 + time_threshold):
+            regressions.append((current.scenario, current.function,
+                                f"wall time {before['wall_ms']:.1f} -> {current.wall_ms:.1f} ms"))
+        if current.peak_kib - before['peak_kib'] > MIN_MEMORY_KIB \
+                and current.peak_kib > before['peak_kib'] * (1 + memory_threshold):
+            regressions.append((current.scenario, current.function,
+                                f"peak memory {before['peak_kib']:.0f} -> {current.peak_kib:.0f} KiB"))
+    return regressions
+
+def to_json(measurements):
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': [asdict(m) for m in measurements],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file")
+    parser.add_argument('--scenario', action='append', choices=[s.name for s in SCENARIOS],
+                        help="only run these scenarios (default: all)")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--no-page', action='store_true', help="skip the Streamlit benchmarks")
+    parser.add_argument('--time-threshold', type=float, default=TIME_THRESHOLD)
+    parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    measurements = run_benchmarks(scenarios, args.repeats, not args.no_page)
+    for m in measurements:
+        print(f"{m.scenario:<8} {m.function:<28} {m.wall_ms:>10.2f} ms {m.peak_kib:>10.0f} KiB "
+              f"{m.retained_blocks:>8} blocks retained")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(to_json(measurements), f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(measurements, baseline, args.time_threshold, args.memory_threshold)
+        for scenario, function, message in regressions:
+            print(f"REGRESSION {scenario} {function}: {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
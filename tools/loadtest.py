@@ -0,0 +1,191 @@
+"""
+Load test of the page: many simulated organizer sessions on one server process.
+
+Every session is a Streamlit AppTest of scheduleGenerator() with its own
+session state, driven through a random but realistic sequence of widget
+interactions: picking events, changing the competitor count, days, scheduling
+mode, and each event's rounds, cutoff and advancement. Sessions take turns, one
+interaction each, the way reruns of many organizers interleave on a server, so
+they share the process-wide caches as they would in production.
+
+Reported are the rerun latency percentiles over all interactions, the growth
+of the process's resident memory per session (which includes what AppTest
+keeps of every session's last render, so it is an upper bound), and the memory
+of the session states themselves, with objects shared between sessions or with
+the rest of the process counted once.
+
+    python -m tools.loadtest --sessions 200 --steps 8 --output loadtest.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import types
+
+from tools.scheduling.constants import categories
+
+APPTEST_TIMEOUT = 120
+COMPETITOR_COUNTS = (40, 80, 120, 200, 350, 500, 800)
+CUTOFFS = ('None', '1:00', '2:00', '3:00')
+# Exact is left out: its reruns are bounded by the solver time budget, not by load
+SCHEDULING_MODES = ('Greedy', 'Parallel Stages')
+# Types whose objects belong to the process, not to a session
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                 types.CodeType)
+
+
+def rss_kib():
+    """Resident memory of this process in KiB; the peak where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def reachable_size(root, seen):
+    """Bytes of the objects reachable from root that are not in seen yet; adds them to seen"""
+    total = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+def process_objects():
+    """ids of everything reachable from the loaded modules, which sessions share rather than own"""
+    seen = set()
+    for module in list(sys.modules.values()):
+        for value in list(vars(module).values()):
+            reachable_size(value, seen)
+    return seen
+
+
+def _page():
+    from tools.scheduleGenerator import scheduleGenerator
+    scheduleGenerator()
+
+def select_events(at, rng):
+    at.multiselect(key='categories_select').set_value(rng.sample(categories, rng.randint(3, len(categories))))
+
+def set_competitors(at, rng):
+    at.number_input(key='competitor_count').set_value(rng.choice(COMPETITOR_COUNTS))
+
+def set_days(at, rng):
+    at.number_input(key='days_input').set_value(rng.randint(1, 3))
+
+def set_mode(at, rng):
+    at.radio(key='scheduling_mode').set_value(rng.choice(SCHEDULING_MODES))
+
+def _set_number(at, rng, prefixes):
+    """Set a random one of the number inputs whose key starts with prefixes, if any are shown"""
+    widgets = [widget for widget in at.number_input if widget.key and widget.key.startswith(prefixes)]
+    if widgets:
+        widget = rng.choice(widgets)
+        widget.set_value(rng.randint(int(widget.min), int(widget.max)))
+
+def set_rounds(at, rng):
+    _set_number(at, rng, 'rounds_')
+
+def set_cutoff(at, rng):
+    widgets = [widget for widget in at.text_input if widget.key and widget.key.startswith('cutoff_')]
+    if widgets:
+        rng.choice(widgets).set_value(rng.choice(CUTOFFS))
+
+def set_advancement(at, rng):
+    _set_number(at, rng, ('advance_r', 'final_size_'))
+
+def rerun(at, rng):
+    """A rerun with nothing changed, as after a click outside the settings"""
+
+# (interaction, weight); the first interaction of every session is select_events
+INTERACTIONS = (
+    (set_competitors, 3), (set_rounds, 4), (set_cutoff, 2), (set_advancement, 2), (set_days, 1),
+    (set_mode, 1), (select_events, 1), (rerun, 2),
+)
+
+
+def run_load_test(num_sessions=50, steps=8, seed=0):
+    """Drive num_sessions sessions through steps interactions each and return the results as a dict"""
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed)
+    # Load the page and its modules before measuring
+    warm = AppTest.from_function(_page, default_timeout=APPTEST_TIMEOUT).run()
+    del warm
+    gc.collect()
+    shared = process_objects()
+    rss_before = rss_kib()
+
+    sessions = [AppTest.from_function(_page, default_timeout=APPTEST_TIMEOUT) for _ in range(num_sessions)]
+    latencies = {}
+    errors = 0
+    for step in range(steps):
+        for at in sessions:
+            if step == 0:
+                at.run()
+                interaction = select_events
+            else:
+                interaction = rng.choices([i for i, _ in INTERACTIONS], [w for _, w in INTERACTIONS])[0]
+            started = time.perf_counter()
+            interaction(at, rng)
+            at.run()
+            latencies.setdefault(interaction.__name__, []).append((time.perf_counter() - started) * 1000)
+            errors += bool(at.exception)
+
+    gc.collect()
+    rss_after = rss_kib()
+    state_bytes = sum(reachable_size(at.session_state._state, shared) for at in sessions)
+    all_latencies = [ms for values in latencies.values() for ms in values]
+    return {
+        'python': platform.python_version(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sessions': num_sessions,
+        'reruns': len(all_latencies),
+        'errors': errors,
+        'latency_ms': percentiles(all_latencies),
+        'latency_ms_by_interaction': {name: percentiles(values) for name, values in sorted(latencies.items())},
+        'rss_kib_per_session': round((rss_after - rss_before) / num_sessions, 1),
+        'state_kib_per_session': round(state_bytes / 1024 / num_sessions, 1),
+    }
+
+def percentiles(values):
+    cuts = statistics.quantiles(values, n=100, method='inclusive') if len(values) > 1 else values * 99
+    return {'p50': round(cuts[49], 1), 'p90': round(cuts[89], 1), 'p99': round(cuts[98], 1),
+            'max': round(max(values), 1), 'count': len(values)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--steps', type=int, default=8, help="interactions per session")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_load_test(args.sessions, args.steps, args.seed)
+    latency = results['latency_ms']
+    print(f"{results['sessions']} sessions, {results['reruns']} reruns, {results['errors']} with errors")
+    print(f"rerun latency: p50 {latency['p50']} ms, p90 {latency['p90']} ms, p99 {latency['p99']} ms, "
+          f"max {latency['max']} ms")
+    for name, stats in results['latency_ms_by_interaction'].items():
+        print(f"  {name:<16} p50 {stats['p50']:>8} ms  p90 {stats['p90']:>8} ms  ({stats['count']} reruns)")
+    print(f"memory per session: {results['rss_kib_per_session']} KiB resident, "
+          f"{results['state_kib_per_session']} KiB of session state")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if results['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,42 @@
+import altair as alt
 import pandas as pd
 import streamlit as st
+import io
+import json
 import math
+import os
+from collections import Counter
+from dataclasses import replace
 from datetime import datetime, timedelta
+from functools import lru_cache, partial
+
+from tools.scheduling import Config, Event, estimate, schedule
+from tools.scheduling.solver import solve
+from tools.scheduling.stages import default_stages, schedule_stages
+from tools.scheduling.ordering import estimated_bitsets, optimize_order, registration_bitsets, schedule_ordered
+from tools.scheduling.ingest import INDEX_FILE, ParticipationRates
+from tools.scheduling.instrumentation import NULL_RECORDER, Recorder, profile
+from tools.scheduling.live import moves, reschedule
+from tools.scheduling.timeline import Timeline
+from tools.scheduling.priors import PRIORS_FILE, SolveTimePriors
+from tools.scheduling.simulation import simulate
+from tools.scheduling.tables import EstimateTables
+from tools.scheduling.sweep import sweep
+from tools.scheduling.tuner import suggest
+from tools.scheduling.stations import MAX_STATIONS, curve_counts, minimum_stations, trade_off
+from tools.scheduling.constants import categories, registration_percentages
+from tools.scheduling.export import ExportJob, bundle_key, bundle_path, prune_bundles
+from tools.scheduling.estimation import calculate_stations, round_up_to_5, validate_rounds
+from tools.scheduling.estimation import initial_competitors as initial_competitors_for
+from tools.scheduling.groups import assign_groups
+from tools.scheduling.staff import ROLES, assign_staff, task_sheets
+from tools.scheduling.wcif import export_wcif, read_wcif
+from tools.scheduling.timeutils import minutes_to_hhmm, parse_hhmm
+
+# Settings every session starts from; sessions keep references to these
+# rather than copies, and only replace what the organizer changes
+DEFAULT_EVENT = Event('')
+DEFAULT_DAY_SCHEDULES = (('08:00', '18:00'),) * 3
 
 # Initialize all session state variables at the start
 def initialize_session_state():
@@ -10,239 +45,138 @@ def initialize_session_state():
     if 'number_of_competitors' not in st.session_state:
         st.session_state.number_of_competitors = 1
     if 'rounds_cutoffs' not in st.session_state:
+        # Category -> Event, for the categories whose settings were changed
         st.session_state.rounds_cutoffs = {}
     if 'main_event' not in st.session_state:
         st.session_state.main_event = '3x3'
     if 'num_days' not in st.session_state:
         st.session_state.num_days = 2
     if 'day_schedules' not in st.session_state:
-        st.session_state.day_schedules = [('08:00', '18:00')] * 2
+        st.session_state.day_schedules = DEFAULT_DAY_SCHEDULES
         
 
-categories = ['3x3', '2x2', '4x4', '5x5', '6x6', '7x7', '3BLD', '3OH', 'FMC', 
-              'Megaminx', 'Pyraminx', 'Skewb', 'Square-1', 'Clock', '4BLD', 
-              '5BLD', 'MBLD']
-
-# Dictionary of registration percentages with exact values
-registration_percentages = {
-    '2x2': 83.92,
-    '3x3': 97.49,
-    '3BLD': 33.15,
-    'FMC': 71.45,
-    '3OH': 69.03,
-    '4x4': 69.17,
-    '4BLD': 19.94,
-    '5x5': 59.59,
-    '5BLD': 13.00,
-    '6x6': 44.54,
-    '7x7': 44.98,
-    'Clock': 53.57,
-    'Megaminx': 58.59,
-    'Pyraminx': 72.37,
-    'Skewb': 60.80,
-    'Square-1': 39.63,
-    'MBLD': 10.00
-}
+# Participation index built by `python -m tools.scheduling.ingest`, and solve-time
+# priors built by `python -m tools.scheduling.priors`
+RATES_INDEX_DIR = os.environ.get('QBOS_RATES_INDEX', os.path.join('data', 'wca_index'))
 
-# Format and attempts for each category
-event_details = {
-    '3x3': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30},
-    '2x2': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 20},
-    '4x4': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 40},
-    '5x5': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 50},
-    '6x6': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 50},
-    '7x7': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 50},
-    'Megaminx': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 60},
-    'Pyraminx': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30},
-    'Square-1': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30},
-    'Clock': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 40},
-    'Skewb': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 20},
-    '3OH': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30},
-    '3BLD': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 360},
-    'FMC': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 0},
-    '4BLD': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 0},
-    '5BLD': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 0},
-    'MBLD': {'format': 'Single', 'attempts': 1, 'scramble_time': 0}
-}
+# Precomputed estimate tables, built on first use or by `python -m tools.scheduling.tables`
+ESTIMATE_TABLES_DIR = os.environ.get('QBOS_ESTIMATE_TABLES', os.path.join('data', 'estimate_tables'))
 
-# Categories that need triple station capacity for groups
-small_categories = {'2x2', '3x3', '3OH', 'Skewb', 'Pyraminx'}
-# Categories that always have one group
-single_group_categories = {'FMC', '4BLD', '5BLD', 'MBLD'}
-# Categories with fixed time
-fixed_time_categories = {'FMC', '4BLD', '5BLD', 'MBLD'}
-
-def get_default_settings():
-    """Return default settings for a new category"""
-    return {
-        'rounds': 1,
-        'cutoff': 'None',
-        'advance_r1': 75,  # Default 75% advance from first round
-        'advance_r2': 50,  # Default 50% advance from second round
-        'advance_r3': 25,  # Default 25% advance from third round
-    }
-
-def round_up_to_15_minutes(minutes):
-    """Round up to nearest 15 minutes"""
-    return math.ceil(minutes / 15) * 15
-
-def minutes_to_hhmm(minutes):
-    """Convert minutes to HH:MM format"""
-    hours = minutes // 60
-    remaining_minutes = minutes % 60
-    return f"{int(hours):02d}:{int(remaining_minutes):02d}"
-
-def calculate_round_time(category, num_competitors, num_stations, cutoff=None, is_first_round=True):
-    """Calculate the estimated round time in minutes"""
-    
-    # Fixed time categories always take 75 minutes
-    if category in fixed_time_categories:
-        return 75
-    
-    # Get event details
-    details = event_details[category]
-    default_time = 35  # Default solving time in seconds
-    
-    if cutoff and cutoff != 'None':
-        # Convert cutoff string to seconds if it's in MM:SS format
-        if isinstance(cutoff, str) and ':' in cutoff:
-            minutes, seconds = map(int, cutoff.split(':'))
-            cutoff_seconds = minutes * 60 + seconds
-            # Use 70% of cutoff time for first round, 60% for subsequent rounds
-            solving_time = cutoff_seconds * (0.7 if is_first_round else 0.6)
-        else:
-            solving_time = default_time
-    else:
-        solving_time = default_time
-    
-    # Calculate total time per solve
-    total_time_per_solve = solving_time + details['scramble_time']
-    
-    # Calculate total round time in minutes
-    total_seconds = (total_time_per_solve * details['attempts'] * num_competitors) / (num_stations - 3)
-    total_minutes = total_seconds / 60
-    
-    # Round up to nearest 15 minutes
-    return round_up_to_15_minutes(total_minutes)
+# JSON lines of rerun timings, written when instrumentation is on
+TIMINGS_LOG = os.environ.get('QBOS_TIMINGS_LOG', os.path.join('data', 'timings.jsonl'))
 
-def round_up_to_5(number):
-    """Round up to nearest 5"""
-    return math.ceil(number / 5) * 5
+# Printable export bundles, cached by the hash of the schedule they are rendered from
+EXPORTS_DIR = os.environ.get('QBOS_EXPORTS', os.path.join('data', 'exports'))
+# Seconds between progress updates while a bundle renders
+EXPORT_POLL_SECONDS = 0.5
 
-def calculate_stations(total_competitors):
-    """Calculate the number of stations needed"""
-    # Calculate base number of stations (2 stations per 20 competitors)
-    base_stations = math.ceil(total_competitors / 20) * 2
-    
-    # Ensure minimum of 6 stations
-    if base_stations < 6:
-        return 6
-    
-    # Round up to nearest even number if necessary
-    return math.ceil(base_stations / 2) * 2
+# Replications of the Monte Carlo overrun analysis
+OVERRUN_REPLICATIONS = 10000
 
-def calculate_groups_and_size(category, competitors, num_stations):
-    """Calculate the number of groups and size per group"""
-    if category in single_group_categories:
-        return 1, competitors
-    
-    # Calculate max competitors per group based on category type
-    if category in small_categories:
-        max_per_group = num_stations * 3
-    else:
-        max_per_group = num_stations * 2
-    
-    # Calculate number of groups needed
-    num_groups = math.ceil(competitors / max_per_group)
-    # Calculate actual group size
-    group_size = math.ceil(competitors / num_groups)
-    
-    return num_groups, group_size
+# Entries of the page caches shared by all sessions; enough for every active
+# organizer's current settings, so one session's reruns do not evict another's
+PAGE_CACHE_SIZE = 256
+
+def event_settings(category, rounds_cutoffs=None):
+    """Saved settings of a category as an Event, the defaults when they were never changed"""
+    if rounds_cutoffs is None:
+        rounds_cutoffs = st.session_state.rounds_cutoffs
+    event = rounds_cutoffs.get(category)
+    return event if event is not None else replace(DEFAULT_EVENT, category=category)
+
+def build_config(number_of_competitors, selected_categories, rounds_cutoffs,
+                 num_days=2, day_schedules=(('08:00', '18:00'),) * 2, main_event='3x3',
+                 registration_rates=(), solve_times=(), registrations=()):
+    """Build a core Config from the sidebar state; rounds_cutoffs maps categories to Events"""
+    events = tuple(event_settings(category, rounds_cutoffs) for category in selected_categories)
+    return Config(number_of_competitors, events, num_days, tuple(day_schedules), main_event,
+                  registration_rates=registration_rates, solve_times=solve_times,
+                  registrations=registrations)
 
-def validate_rounds(num_competitors, proposed_rounds):
+@st.cache_resource
+def load_estimate_tables(directory):
     """
-    Validate if the number of rounds is allowed based on WCA regulations
-    Returns (is_valid, message)
+    Memory-map the estimate tables once per server process, rebuilding them
+    when event_details or registration_percentages changed; None if they cannot be written
     """
-    if num_competitors <= 7:
-        return (1, "7 or fewer competitors can only have 1 round")
-    elif num_competitors <= 15:
-        return (min(2, proposed_rounds), "15 or fewer competitors can have maximum 2 rounds")
-    elif num_competitors <= 99:
-        return (min(3, proposed_rounds), "99 or fewer competitors can have maximum 3 rounds")
-    return (proposed_rounds, "")
-
-def get_default_settings():
-    """Return default settings for a new category"""
-    return {
-        'rounds': 1,
-        'cutoff': 'None',
-        'advance_r1': 50,  # Default 75% advance from first round
-        'advance_r2': 50,  # Default 75% advance from second round
-        'advance_r3': 50,  # Default 75% advance from third round
-        'final_size': 8    # Default final size
-    }
-
-def calculate_estimated_competitors(total_competitors, selected_categories, rounds_cutoffs):
-    """Calculate estimated competitors and related metrics for each category"""
-    num_stations = calculate_stations(total_competitors)
-    estimates = []
-    
-    for category in selected_categories:
-        if category in registration_percentages:
-            settings = rounds_cutoffs[category]
-            initial_competitors = round_up_to_5((registration_percentages[category] / 100) * total_competitors)
-            
-            # Validate number of rounds based on initial competitors
-            allowed_rounds, message = validate_rounds(initial_competitors, settings.get('rounds', 1))
-            if allowed_rounds != settings.get('rounds', 1):
-                settings['rounds'] = allowed_rounds
-                st.sidebar.warning(f"{category}: {message}")
-            
-            num_rounds = settings.get('rounds', 1)
-            cutoff = settings.get('cutoff', 'None')
-            
-            # Calculate first round
-            num_groups, group_size = calculate_groups_and_size(category, initial_competitors, num_stations)
-            round1_time = calculate_round_time(category, initial_competitors, num_stations, cutoff, True)
-            
-            row_data = {
-                'Category': category,
-                'Percentage': f"{registration_percentages[category]}%",
-                'R1 Competitors': initial_competitors,
-                'R1 Groups': num_groups,
-                'R1 Time': minutes_to_hhmm(round1_time)
+    try:
+        return EstimateTables.load(directory, build=True)
+    except OSError:
+        return None
+
+def calculate_estimated_competitors(config):
+    """Estimate every round of the selected categories and show any round warnings"""
+    plan = estimate(config, load_estimate_tables(ESTIMATE_TABLES_DIR))
+    for warning in plan.warnings:
+        st.sidebar.warning(warning)
+    return plan
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def estimates_to_frame(plan, registration_rates=()):
+    """Format the estimated rounds of a plan as one display row per category"""
+    percentages = {**registration_percentages, **dict(registration_rates)}
+    estimates = {}
+    for rnd in plan.rounds:
+        if rnd.category not in estimates:
+            estimates[rnd.category] = {
+                'Category': rnd.category,
+                'Percentage': f"{percentages[rnd.category]}%",
             }
-            
-            current_competitors = initial_competitors
-            for round_num in range(2, num_rounds + 1):
-                is_final = (round_num == num_rounds and num_rounds > 1)
-                
-                if is_final:
-                    # For finals, use fixed number
-                    final_size = settings.get('final_size', 8)
-                    # Ensure final size is not too large (max 75% of previous round)
-                    max_final_size = math.floor(current_competitors * 0.75)
-                    current_competitors = min(final_size, max_final_size)
-                else:
-                    # For other rounds, use percentage
-                    advance_key = f'advance_r{round_num-1}'
-                    advance_percent = settings.get(advance_key, 75)
-                    # Ensure at least 25% are eliminated
-                    advance_percent = min(75, advance_percent)
-                    current_competitors = round_up_to_5(current_competitors * (advance_percent / 100))
-                
-                num_groups, group_size = calculate_groups_and_size(category, current_competitors, num_stations)
-                round_time = calculate_round_time(category, current_competitors, num_stations, cutoff, False)
-                
-                round_prefix = f'R{round_num}'
-                row_data[f'{round_prefix} Competitors'] = current_competitors
-                row_data[f'{round_prefix} Groups'] = num_groups
-                row_data[f'{round_prefix} Time'] = minutes_to_hhmm(round_time)
-            
-            estimates.append(row_data)
+        round_prefix = f'R{rnd.number}'
+        row_data = estimates[rnd.category]
+        row_data[f'{round_prefix} Competitors'] = rnd.competitors
+        row_data[f'{round_prefix} Groups'] = rnd.groups
+        row_data[f'{round_prefix} Time'] = minutes_to_hhmm(rnd.duration)
     
-    return pd.DataFrame(estimates)
+    return pd.DataFrame(list(estimates.values()))
+
+@st.cache_resource
+def load_participation_rates(index_dir):
+    """Load the participation index built by tools.scheduling.ingest, if there is one"""
+    if not os.path.exists(os.path.join(index_dir, INDEX_FILE)):
+        return None
+    return ParticipationRates.load(index_dir)
+
+def select_registration_rates(number_of_competitors):
+    """
+    Sidebar choice between the default registration percentages and rates from WCA history
+    Returns (category, percentage) pairs overriding the defaults
+    """
+    rates_index = load_participation_rates(RATES_INDEX_DIR)
+    if rates_index is None:
+        return ()
+    with st.sidebar.expander('Registration Rates'):
+        source = st.radio('Source', ['Default table', 'WCA history'], key='rates_source')
+        if source == 'Default table':
+            return ()
+        index = rates_index.index
+        countries = sorted(index['country_id'].unique())
+        country = st.selectbox('Country', countries, key='rates_country',
+                               index=countries.index('Mexico') if 'Mexico' in countries else 0)
+        states = ['Any'] + sorted(state for state in index.loc[index['country_id'] == country, 'state'].unique() if state)
+        state = st.selectbox('State', states, key='rates_state')
+        rates = rates_index.lookup(country, None if state == 'Any' else state, number_of_competitors)
+    return tuple(sorted(rates.items()))
+
+@st.cache_resource
+def load_solve_time_priors(index_dir):
+    """Memory-map the solve-time priors built by tools.scheduling.priors, if there are any"""
+    if not os.path.exists(os.path.join(index_dir, PRIORS_FILE)):
+        return None
+    return SolveTimePriors.load(index_dir)
+
+def select_solve_times(selected_categories):
+    """
+    Sidebar choice of historical solve times for events without a cutoff
+    Returns (category, seconds per round type) pairs for Config.solve_times
+    """
+    priors = load_solve_time_priors(RATES_INDEX_DIR)
+    if priors is None:
+        return ()
+    if not st.sidebar.checkbox('Use historical solve times', value=True, key='use_solve_priors',
+                               help="Events without a cutoff use WCA averages instead of 35 seconds per attempt"):
+        return ()
+    return priors.solve_times(selected_categories)
 
 def reset_settings():
     """Reset all settings to default values"""
@@ -250,335 +184,775 @@ def reset_settings():
     st.session_state.number_of_competitors = 1
     st.session_state.rounds_cutoffs = {}
 
+def import_wcif():
+    """Callback for the WCIF uploader: fill the sidebar from the uploaded competition"""
+    uploaded = st.session_state.wcif_upload
+    if uploaded is None:
+        return
+    text = io.TextIOWrapper(uploaded, encoding='utf-8')
+    try:
+        competition = read_wcif(text)
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        st.session_state.wcif_error = f"Could not read the WCIF file: {error}"
+        return
+    finally:
+        # Leave the uploaded file open for Streamlit
+        text.detach()
+    st.session_state.pop('wcif_error', None)
+    st.session_state.wcif = competition
+    
+    st.session_state.selected_categories = [event.category for event in competition.events]
+    st.session_state.rounds_cutoffs = {event.category: event for event in competition.events}
+    st.session_state.number_of_competitors = max(1, competition.number_of_competitors)
+    st.session_state.num_days = max(1, min(3, competition.num_days))
+    day_schedules = list(competition.day_schedules or st.session_state.day_schedules)
+    st.session_state.day_schedules = tuple(day_schedules + day_schedules[-1:] * (3 - len(day_schedules)))
+    # Inputs take their values from the settings above again
+    for key in list(st.session_state):
+        if key in ('categories_select', 'competitor_count', 'days_input') or \
+                key.startswith(('rounds_', 'cutoff_', 'advance_r', 'final_size_')) and key != 'rounds_cutoffs':
+            del st.session_state[key]
+
+def stop_using_wcif():
+    st.session_state.pop('wcif', None)
+
+def display_wcif_import():
+    """WCIF upload in the sidebar; returns the (category, competitors) registrations in use"""
+    with st.sidebar.expander('WCIF'):
+        st.file_uploader('Import WCIF', type='json', key='wcif_upload', on_change=import_wcif,
+                         help="Fills the events, rounds, cutoffs and advancement from a WCIF export "
+                              "and uses its actual registrations")
+        if 'wcif_error' in st.session_state:
+            st.error(st.session_state.wcif_error)
+        competition = st.session_state.get('wcif')
+        if competition is None:
+            return ()
+        st.caption(f"Using the {competition.number_of_competitors} registrations of "
+                   f"{competition.name or competition.id}.")
+        st.button('Stop Using Registrations', key='wcif_stop', on_click=stop_using_wcif)
+        return competition.registrations
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def group_assignment(plan, result, competition):
+    """First-round groups of the imported competitors for a schedule"""
+    return assign_groups(competition.competitors, plan.num_stations, result)
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def schedule_wcif(config, plan, result, competition=None):
+    """WCIF of a schedule as JSON, with the imported competitors' first-round groups when there are any"""
+    if competition is None:
+        wcif = export_wcif(config, plan, result)
+    else:
+        assignment = group_assignment(plan, result, competition)
+        wcif = export_wcif(config, plan, result, competition.id, competition.name, competition.start_date,
+                           competition.timezone, assignment)
+    return json.dumps(wcif, indent=2)
+
 def update_selected_categories():
     """Callback for multiselect to update session state"""
     st.session_state.selected_categories = st.session_state.categories_select
-    # Initialize settings for new categories
-    for category in st.session_state.selected_categories:
-        if category not in st.session_state.rounds_cutoffs:
-            st.session_state.rounds_cutoffs[category] = get_default_settings()
 
 def update_competitor_count():
     """Callback for number input to update session state"""
     st.session_state.number_of_competitors = st.session_state.competitor_count
 
+def update_setting(category, setting, key):
+    """
+    Save one settings input of a category; the category's Event is replaced,
+    and dropped again once it is back to the defaults
+    """
+    if key not in st.session_state:
+        return
+    event = replace(event_settings(category), **{setting: st.session_state[key]})
+    if event == replace(DEFAULT_EVENT, category=category):
+        st.session_state.rounds_cutoffs.pop(category, None)
+    else:
+        st.session_state.rounds_cutoffs[category] = event
+
 def on_rounds_change(category):
     """Callback for rounds number input"""
-    key = f'rounds_{category}'
-    if key in st.session_state:
-        if category not in st.session_state.rounds_cutoffs:
-            st.session_state.rounds_cutoffs[category] = get_default_settings()
-        st.session_state.rounds_cutoffs[category]['rounds'] = st.session_state[key]
+    update_setting(category, 'rounds', f'rounds_{category}')
 
 def on_cutoff_change(category):
     """Callback for cutoff text input"""
-    key = f'cutoff_{category}'
-    if key in st.session_state:
-        if category not in st.session_state.rounds_cutoffs:
-            st.session_state.rounds_cutoffs[category] = get_default_settings()
-        st.session_state.rounds_cutoffs[category]['cutoff'] = st.session_state[key]
+    update_setting(category, 'cutoff', f'cutoff_{category}')
 
 def on_advance_change(category, advance_key):
     """Callback for advancement percentage input"""
-    key = f'{advance_key}_{category}'
-    if key in st.session_state:
-        if category not in st.session_state.rounds_cutoffs:
-            st.session_state.rounds_cutoffs[category] = get_default_settings()
-        st.session_state.rounds_cutoffs[category][advance_key] = st.session_state[key]
+    update_setting(category, advance_key, f'{advance_key}_{category}')
         
 def on_final_size_change(category):
     """Callback for final round size input"""
-    key = f'final_size_{category}'
-    if key in st.session_state:
-        if category not in st.session_state.rounds_cutoffs:
-            st.session_state.rounds_cutoffs[category] = get_default_settings()
-        st.session_state.rounds_cutoffs[category]['final_size'] = st.session_state[key]
+    update_setting(category, 'final_size', f'final_size_{category}')
         
         
-def get_day_schedule(day_start, day_end):
-    """Convert time strings to minutes from midnight"""
-    start_h, start_m = map(int, day_start.split(':'))
-    end_h, end_m = map(int, day_end.split(':'))
-    return start_h * 60 + start_m, end_h * 60 + end_m
-
-def minutes_to_time(minutes):
-    """Convert minutes from midnight to HH:MM format"""
-    hours = minutes // 60
-    mins = minutes % 60
-    return f"{int(hours):02d}:{int(mins):02d}"
-
-def schedule_competition(estimates_df, num_days, day_schedules, main_event, rounds_cutoffs):
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def competitor_order(plan, number_of_competitors, competition=None):
+    """Round order that spaces out events with shared competitors, from the imported registrations or estimated ones"""
+    if competition is None:
+        registrations = estimated_bitsets(plan, number_of_competitors)
+    else:
+        registrations = registration_bitsets(competition.competitors)
+    return optimize_order(plan, registrations)
+
+def ordering_note(ordering):
+    before, after = ordering.initial, ordering.score
+    return (f"Competitor-aware order: {before.back_to_back:,.0f} → {after.back_to_back:,.0f} competitors back to "
+            f"back, {before.idle / 60:,.0f} → {after.idle / 60:,.0f} competitor-hours waiting "
+            f"({ordering.swaps:,} orderings in {ordering.elapsed:.2f} s)")
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def schedule_competition(plan, mode='Greedy', time_budget=1.0, ordering=None):
     """
-    Schedule all competition rounds across multiple days
+    Schedule all competition rounds across multiple days, in ordering's order
+    when given (the exact solver orders rounds itself)
+    Returns (schedule, solver note or None); memoized on the immutable plan so
+    reruns that do not change the estimates skip scheduling
     """
-    warnings = []
-    schedule = []
-    
-    # First, organize all events and rounds
-    all_events = []
-    
-    # Process round 1 for all events first
-    for _, row in estimates_df.iterrows():
-        category = row['Category']
-        if 'R1 Time' in row and pd.notna(row['R1 Time']):
-            time_str = row['R1 Time']
-            hours, minutes = map(int, time_str.split(':'))
-            duration = hours * 60 + minutes
-            
-            all_events.append({
-                'category': category,
-                'round': 1,
-                'duration': duration,
-                'competitors': row['R1 Competitors'],
-                'is_main': category == main_event,
-                'is_popular': category in {'2x2', '3x3', '4x4', '3OH', 'Pyraminx', 'Skewb'},
-                'is_fmc': category == 'FMC'
-            })
-    
-    # Then process round 2 for all events
-    for _, row in estimates_df.iterrows():
-        category = row['Category']
-        if 'R2 Time' in row and pd.notna(row['R2 Time']):
-            time_str = row['R2 Time']
-            hours, minutes = map(int, time_str.split(':'))
-            duration = hours * 60 + minutes
-            
-            all_events.append({
-                'category': category,
-                'round': 2,
-                'duration': duration,
-                'competitors': row['R2 Competitors'],
-                'is_main': category == main_event,
-                'is_popular': category in {'2x2', '3x3', '4x4', '3OH', 'Pyraminx', 'Skewb'},
-                'is_fmc': category == 'FMC'
-            })
-    
-    # Finally process round 3 for all events
-    for _, row in estimates_df.iterrows():
-        category = row['Category']
-        if 'R3 Time' in row and pd.notna(row['R3 Time']):
-            time_str = row['R3 Time']
-            hours, minutes = map(int, time_str.split(':'))
-            duration = hours * 60 + minutes
-            
-            # If this is the main event final, save it for last
-            if category == main_event:
-                main_final = {
-                    'category': category,
-                    'round': 3,
-                    'duration': duration,
-                    'competitors': row['R3 Competitors'],
-                    'is_main': True,
-                    'is_popular': category in {'2x2', '3x3', '4x4', '3OH', 'Pyraminx', 'Skewb'},
-                    'is_fmc': category == 'FMC'
-                }
-            else:
-                all_events.append({
-                    'category': category,
-                    'round': 3,
-                    'duration': duration,
-                    'competitors': row['R3 Competitors'],
-                    'is_main': category == main_event,
-                    'is_popular': category in {'2x2', '3x3', '4x4', '3OH', 'Pyraminx', 'Skewb'},
-                    'is_fmc': category == 'FMC'
-                })
-    
-    # Add main event final at the end if it exists
-    if 'main_final' in locals():
-        all_events.append(main_final)
+    if mode == 'Parallel Stages':
+        stages = default_stages(plan)
+        stage_note = ", ".join(f"{stage.name} ({stage.stations} stations)" for stage in stages)
+        if ordering is not None:
+            result = schedule_ordered(plan, ordering, partial(schedule_stages, stages=stages))
+            return result, f"Stages: {stage_note}. {ordering_note(ordering)}"
+        return schedule_stages(plan, stages), f"Stages: {stage_note}"
+    if mode != 'Exact':
+        if ordering is not None:
+            return schedule_ordered(plan, ordering), ordering_note(ordering)
+        return schedule(plan), None
     
-    # Sort popular events within each round group to be later
-    events_to_schedule = all_events
-    
-    # Initialize day schedules
-    current_day = 1
-    current_event_index = 0
-    
-    for day in range(1, num_days + 1):
-        day_start, day_end = get_day_schedule(*day_schedules[day - 1])
-        current_time = day_start
+    result = solve(plan, time_budget)
+    if result.fallback:
+        outcome = "no packing found within the lunch window rules, showing the greedy schedule"
+    elif result.optimal:
+        outcome = "earliest finish with lunch inside the midday window"
+    else:
+        outcome = "time budget reached, showing the best packing found"
+    return result.schedule, f"Exact solver: {outcome} ({result.nodes:,} nodes in {result.elapsed:.2f} s)"
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def schedule_to_frame(result):
+    """Format scheduled slots with HH:MM times for display"""
+    columns = ['Day', 'Start', 'End', 'Event', 'Round', 'Duration']
+    if any(slot.stage for slot in result.slots):
+        columns.append('Stage')
+    return pd.DataFrame([{
+        'Day': slot.day,
+        'Start': minutes_to_hhmm(slot.start),
+        'End': minutes_to_hhmm(slot.end),
+        'Event': slot.event,
+        'Round': '-' if slot.is_break else f"Round {slot.round}",
+        'Duration': minutes_to_hhmm(slot.duration),
+        'Stage': slot.stage or 'All'
+    } for slot in result.slots], columns=columns)
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def schedule_csv(result):
+    """The cached schedule frame as CSV, sent to the browser only when downloaded"""
+    return schedule_to_frame(result).to_csv(index=False)
+
+# Blocks that are not competition rounds, highlighted in the schedule
+BREAK_EVENTS = ('Registration', 'Lunch Break', 'Prize Giving')
+
+def schedule_day_table(day_schedule):
+    """One day of the schedule as a styled table, with breaks highlighted"""
+    events = day_schedule['Event']
+    if 'Stage' in day_schedule:
+        events = events.where(events.isin(BREAK_EVENTS), events + ' (' + day_schedule['Stage'] + ')')
+    table = pd.DataFrame({
+        'Time': day_schedule['Start'] + ' - ' + day_schedule['End'],
+        'Event': events,
+        'Round': day_schedule['Round'],
+        'Duration': day_schedule['Duration'],
+    })
+    is_break = day_schedule['Event'].isin(BREAK_EVENTS).to_numpy()
+    return table.style.apply(
+        lambda column: ['font-weight: bold; background-color: rgba(128, 128, 128, 0.15)' if b else ''
+                        for b in is_break])
+
+def schedule_day_chart(day_schedule):
+    """One day of the schedule as a Gantt chart"""
+    chart_df = day_schedule.assign(
+        Begin=pd.to_datetime(day_schedule['Start'], format='%H:%M'),
+        Finish=pd.to_datetime(day_schedule['End'], format='%H:%M'),
+        Block=day_schedule['Event'].where(day_schedule['Round'] == '-',
+                                          day_schedule['Event'] + ' ' + day_schedule['Round']),
+    )
+    has_stages = 'Stage' in chart_df
+    tooltip = ['Block', 'Start', 'End', 'Duration'] + (['Stage'] if has_stages else [])
+    return alt.Chart(chart_df).mark_bar(cornerRadius=3).encode(
+        x=alt.X('Begin:T', title=None, axis=alt.Axis(format='%H:%M')),
+        x2='Finish:T',
+        y=alt.Y('Block:N', title=None, sort=alt.SortField('Begin')),
+        color=alt.Color('Stage:N' if has_stages else 'Event:N', legend=None),
+        tooltip=tooltip
+    ).properties(height=alt.Step(22))
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def schedule_day_views(result):
+    """
+    (day, table, chart spec) per day of a schedule; the Vega-Lite spec is built
+    and validated once per schedule rather than on every rerun
+    """
+    schedule_df = schedule_to_frame(result)
+    return tuple((int(day), schedule_day_table(day_schedule), schedule_day_chart(day_schedule).to_dict())
+                 for day, day_schedule in schedule_df.groupby('Day', sort=True))
+
+def display_schedule(result):
+    """Each day as one table and one timeline, however many rounds it has"""
+    for day, table, chart_spec in schedule_day_views(result):
+        st.subheader(f"Day {day}")
+        st.dataframe(table, hide_index=True, use_container_width=True)
+        st.vega_lite_chart(chart_spec, use_container_width=True)
         
-        # Add registration period for day 1
-        if day == 1:
-            schedule.append({
-                'Day': day,
-                'Start': minutes_to_time(current_time),
-                'End': minutes_to_time(current_time + 45),
-                'Event': 'Registration',
-                'Round': '-',
-                'Duration': '00:45'
-            })
-            current_time += 45
         
-        # Calculate lunch break time (halfway through the day)
-        lunch_time = day_start + (day_end - day_start) // 2
-        lunch_added = False
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def simulate_overruns(plan, result, stages=None, registration_rates=()):
+    """Monte Carlo overrun tables for a schedule, memoized like the schedule itself"""
+    simulation = simulate(plan, result, OVERRUN_REPLICATIONS, stages, seed=0, registration_rates=registration_rates)
+    days_df = pd.DataFrame([{
+        'Day': day.day,
+        'Planned End': minutes_to_hhmm(day.planned_end),
+        'P50 End': minutes_to_hhmm(day.p50),
+        'P90 End': minutes_to_hhmm(day.p90),
+        'P99 End': minutes_to_hhmm(day.p99),
+        'Venue Close': minutes_to_hhmm(day.venue_close),
+        'Overrun Probability': f"{day.overrun_probability:.1%}",
+    } for day in simulation.days])
+    rounds_df = pd.DataFrame([{
+        'Day': rnd.day,
+        'Event': rnd.event,
+        'Round': f"Round {rnd.round}",
+        'Planned End': minutes_to_hhmm(rnd.planned_end),
+        'P50 End': minutes_to_hhmm(rnd.p50),
+        'P90 End': minutes_to_hhmm(rnd.p90),
+        'P99 End': minutes_to_hhmm(rnd.p99),
+    } for rnd in simulation.rounds])
+    return days_df, rounds_df
+
+SETTING_LABELS = {
+    'rounds': 'Rounds',
+    'cutoff': 'Cutoff',
+    'advance_r1': 'Advance to Round 2 (%)',
+    'advance_r2': 'Advance to Round 3 (%)',
+    'advance_r3': 'Advance to Round 4 (%)',
+    'final_size': 'Final Round Size',
+}
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def setting_suggestions(config, scheduling_mode):
+    """Lowered settings that fit the days, friendliest first"""
+    return tuple(suggest(config, mode='stages' if scheduling_mode == 'Parallel Stages' else 'greedy'))
+
+def apply_suggestion(events):
+    """Callback of a suggestion's button; the settings inputs take the suggested values on the rerun"""
+    for event in events:
+        st.session_state.rounds_cutoffs[event.category] = event
+        for key in (f'rounds_{event.category}', f'cutoff_{event.category}', f'final_size_{event.category}',
+                    *(f'advance_r{number}_{event.category}' for number in (1, 2, 3))):
+            st.session_state.pop(key, None)
+
+def display_setting_suggestions(config, scheduling_mode):
+    """Rounds, cutoffs and advancement that make every round fit, as changes to the current settings"""
+    with st.expander("Suggested Settings", expanded=True):
+        suggestions = setting_suggestions(config, scheduling_mode)
+        if not suggestions:
+            st.write("Even a single round of every event with the tightest cutoffs does not fit. "
+                     "Add a day, lengthen the days or remove events.")
+            return
+        st.write("These settings fit every round into the days while keeping as many rounds, "
+                 "advancing competitors and as loose cutoffs as possible.")
+        for number, suggestion in enumerate(suggestions, start=1):
+            st.write(f"**Suggestion {number}**: finishes on day {suggestion.days_used} "
+                     f"at {minutes_to_hhmm(suggestion.finish)}")
+            st.dataframe(pd.DataFrame([{
+                'Event': category,
+                'Setting': SETTING_LABELS[key],
+                'Current': str(current),
+                'Suggested': str(suggested),
+            } for category, key, current, suggested in suggestion.changes]), hide_index=True)
+            st.button('Apply', key=f'apply_suggestion_{number}', on_click=apply_suggestion,
+                      args=(suggestion.events,))
+
+def display_overrun_risk(plan, result, stages=None, registration_rates=()):
+    """Show how likely each day is to run past the venue close"""
+    with st.expander("Overrun Risk"):
+        st.write(f"Simulated {OVERRUN_REPLICATIONS:,} times with varying turnout, solve and scramble times.")
+        days_df, rounds_df = simulate_overruns(plan, result, stages, registration_rates)
+        st.dataframe(days_df, hide_index=True)
+        st.dataframe(rounds_df, hide_index=True)
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def live_schedule(plan, result, actuals):
+    """Rescheduled remaining rounds and the moved-rounds table for recorded (key, times) pairs"""
+    rescheduled = reschedule(plan, result, dict(actuals))
+    moves_df = pd.DataFrame([{
+        'Event': move.event,
+        'Round': f"Round {move.round}",
+        'Stage': move.stage,
+        'Planned': f"Day {move.old_day} {minutes_to_hhmm(move.old_start)}",
+        'Now': f"Day {move.new_day} {minutes_to_hhmm(move.new_start)}",
+        'Delay (min)': move.delay,
+    } for move in moves(result, rescheduled)])
+    return rescheduled, moves_df
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def schedule_timeline(plan, result):
+    """Group-level interval index of a schedule, built once per schedule"""
+    return Timeline.from_schedule(result, plan)
+
+@st.fragment
+def display_live_updates(plan, result):
+    """Record actual round times on the day and reschedule the rounds still to run"""
+    with st.expander("Live Day-of Updates"):
+        # Recorded times belong to the schedule they were recorded against
+        if st.session_state.get('live_schedule') != result:
+            st.session_state.live_schedule = result
+            st.session_state.live_actuals = {}
+        actuals = st.session_state.live_actuals
         
-        # Schedule events for the day
-        while current_event_index < len(events_to_schedule) and current_time < day_end:
-            # Check if it's time for lunch break
-            if not lunch_added and current_time >= lunch_time:
-                schedule.append({
-                    'Day': day,
-                    'Start': minutes_to_time(current_time),
-                    'End': minutes_to_time(current_time + 60),
-                    'Event': 'Lunch Break',
-                    'Round': '-',
-                    'Duration': '01:00'
-                })
-                current_time += 60
-                lunch_added = True
-                continue
-            
-            event = events_to_schedule[current_event_index]
-            
-            # Check if event can fit in remaining time
-            if current_time + event['duration'] <= day_end:
-                schedule.append({
-                    'Day': day,
-                    'Start': minutes_to_time(current_time),
-                    'End': minutes_to_time(current_time + event['duration']),
-                    'Event': event['category'],
-                    'Round': f"Round {event['round']}",
-                    'Duration': minutes_to_hhmm(event['duration'])
-                })
-                current_time += event['duration']
-                current_event_index += 1
+        rounds = [slot for slot in result.slots if not slot.is_break]
+        labels = {f"{slot.event} Round {slot.round}": slot for slot in rounds}
+        col1, col2, col3 = st.columns(3)
+        label = col1.selectbox('Round', list(labels), key='live_round')
+        actual_start = col2.text_input('Actual Start (HH:MM)', key='live_start')
+        actual_end = col3.text_input('Actual End (HH:MM, empty while running)', key='live_end')
+        
+        col1, col2 = st.columns(2)
+        if col1.button('Record', key='live_record') and label:
+            slot = labels[label]
+            try:
+                start = parse_hhmm(actual_start)
+                end = parse_hhmm(actual_end) if actual_end.strip() else None
+            except ValueError:
+                st.error("Times must be in HH:MM format.")
             else:
-                break
+                actuals[(slot.event, slot.round)] = (slot.day, start, end)
+        if col2.button('Clear Recorded Times', key='live_clear'):
+            actuals.clear()
         
-        # Add prize giving on last day if all events are scheduled
-        if day == num_days and current_event_index >= len(events_to_schedule):
-            if current_time + 30 <= day_end:
-                schedule.append({
-                    'Day': day,
-                    'Start': minutes_to_time(current_time),
-                    'End': minutes_to_time(current_time + 30),
-                    'Event': 'Prize Giving',
-                    'Round': '-',
-                    'Duration': '00:30'
-                })
+        if actuals:
+            st.dataframe(pd.DataFrame([{
+                'Event': event,
+                'Round': f"Round {number}",
+                'Day': day,
+                'Start': minutes_to_hhmm(start),
+                'End': minutes_to_hhmm(end) if end is not None else 'Running',
+            } for (event, number), (day, start, end) in actuals.items()]), hide_index=True)
+            
+            rescheduled, moves_df = live_schedule(plan, result, tuple(sorted(actuals.items())))
+            for warning in rescheduled.warnings:
+                st.warning(warning)
+            st.write(f"**{len(moves_df)} rounds moved**")
+            if len(moves_df):
+                st.dataframe(moves_df, hide_index=True)
+            display_schedule(rescheduled)
+        else:
+            st.write("Record the actual start and end of rounds as they run to reschedule the rest of the day.")
+            rescheduled = result
         
-        # Check if day is too long
-        day_duration = current_time - day_start
-        if day_duration > 540:  # 9 hours (8 hours + 1 hour lunch)
-            warnings.append(f"Day {day} is longer than recommended (9 hours). Consider removing some events or rounds.")
-    
-    # Check for unscheduled events
-    if current_event_index < len(events_to_schedule):
-        warnings.append("Not all events could be scheduled. Consider:")
-        warnings.append("- Removing some events")
-        warnings.append("- Adding more days")
-        warnings.append("- Reducing number of rounds")
-        warnings.append("- Adjusting cutoffs to reduce round durations")
-    
-    return pd.DataFrame(schedule), warnings
+        # What is running at a given time, group by group
+        st.write("**What's On**")
+        col1, col2 = st.columns(2)
+        day = col1.number_input('Day', min_value=1, max_value=len(plan.days), value=1, key='whats_on_day')
+        time_text = col2.text_input('Time (HH:MM)', value='10:00', key='whats_on_time')
+        try:
+            minute = parse_hhmm(time_text)
+        except ValueError:
+            st.error("Times must be in HH:MM format.")
+            return
+        blocks = schedule_timeline(plan, rescheduled).at(int(day), minute)
+        if not blocks:
+            st.write("Nothing is scheduled at that time.")
+            return
+        st.dataframe(pd.DataFrame([{
+            'Room': block.room or ('Venue' if block.is_break else 'Main Room'),
+            'Event': block.event,
+            'Round': f"Round {block.round}" if block.round else '',
+            'Group': block.group or '',
+            'Start': minutes_to_hhmm(block.start),
+            'End': minutes_to_hhmm(block.end),
+        } for block in blocks]), hide_index=True)
 
-def display_schedule(schedule_df):
-    # Group the schedule by days
-    days = schedule_df['Day'].unique()
-    
-    for day in days:
-        day_schedule = schedule_df[schedule_df['Day'] == day]
-        
-        st.subheader(f"Day {int(day)}")
+def fit_stations_to_days(config, scheduling_mode, stations_metric):
+    """Config with the fewest stations that fit its days, shown in the stations KPI"""
+    best = minimum_stations(config, 'stages' if scheduling_mode == 'Parallel Stages' else 'greedy')
+    if best is None:
+        st.warning(f"The selected rounds do not fit into {config.num_days} day(s) even with "
+                   f"{MAX_STATIONS} stations; using the usual station count")
+        return config
+    stations_metric.metric(
+        label="Solving Stations Required",
+        value=best.num_stations,
+        help="Fewest stations with which every round fits into the days and day hours"
+    )
+    return replace(config, num_stations=best.num_stations)
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def station_trade_off(config, scheduling_mode):
+    """
+    Fewest stations that fit (or None) and the chart of length against stations;
+    the chart takes longer to build than the probes, so it is shared across reruns and sessions
+    """
+    mode = 'stages' if scheduling_mode == 'Parallel Stages' else 'greedy'
+    best = minimum_stations(config, mode)
+    if best is None:
+        return None, None
+    options = trade_off(config, curve_counts(best.num_stations), mode)
+    curve = pd.DataFrame([{
+        'Stations': option.num_stations,
+        'Hours': round(option.length / 60, 2),
+        'Fits': option.fits,
+        'Days Used': option.days_used,
+        'Staff': option.total_staff,
+    } for option in options])
+    chart = alt.Chart(curve).mark_line(point=True, color='#9e9e9e').encode(
+        x=alt.X('Stations:Q'),
+        y=alt.Y('Hours:Q', title='Total competition length (hours)'),
+    ) + alt.Chart(curve).mark_point(filled=True, size=60).encode(
+        x='Stations:Q',
+        y='Hours:Q',
+        color=alt.Color('Fits:N', scale=alt.Scale(domain=[True, False], range=['#4caf50', '#e57373'])),
+        tooltip=['Stations', 'Hours', 'Fits', 'Days Used', 'Staff']
+    )
+    return best, chart
+
+@st.fragment
+def display_station_trade_off(config, scheduling_mode):
+    """Fewest stations that fit the days, the staff they need, and competition length against stations"""
+    with st.expander("Stations and Staff"):
+        best, chart = station_trade_off(config, scheduling_mode)
+        if best is None:
+            st.warning(f"The selected rounds do not fit into {config.num_days} day(s) with up to "
+                       f"{MAX_STATIONS} stations. Add a day, lengthen the days or remove rounds.")
+            return
+        staff = ", ".join(f"{count} {role}{'s' if count != 1 else ''}" for role, count in best.staff)
+        st.write(f"**{best.num_stations} stations** are the fewest that fit every round into "
+                 f"{config.num_days} day(s), with {staff} at the busiest time.")
+        st.altair_chart(chart, use_container_width=True)
+        st.caption("Hours are summed over the days, from each day's start to its last block; "
+                   "station counts that do not fit leave rounds unscheduled.")
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def staff_assignment(plan, result, competition):
+    """
+    Staff of every first-round group from the imported volunteers, as
+    (shortfalls frame, workload frame, {label: task sheet frame})
+    """
+    assignment = group_assignment(plan, result, competition)
+    staff = assign_staff(competition.competitors, assignment, plan.num_stations)
+    competitors = competition.competitors
+    shortfalls = pd.DataFrame([{'Event': category, 'Group': group, 'Role': role.capitalize(), 'Missing': missing}
+                               for category, group, role, missing in staff.shortfalls])
+    counts = {}
+    for task in staff.tasks:
+        counts.setdefault(task.person, dict.fromkeys(ROLES, 0))[task.role] += 1
+    minutes = staff.workload()
+    workload = pd.DataFrame([{'Name': competitors[person].name, **{role.capitalize(): n for role, n in roles.items()},
+                              'Minutes': minutes[person]} for person, roles in counts.items()])
+    if not workload.empty:
+        workload = workload.sort_values(['Minutes', 'Name'], ascending=[False, True])
+
+    # People are told apart by their index, since names can repeat
+    names = [competitor.name for competitor in competitors]
+    repeated = {name for name, count in Counter(names).items() if count > 1}
+    sheets = {}
+    for person, tasks in sorted(task_sheets(competitors, assignment, staff).items(),
+                                key=lambda item: (names[item[0]], item[0])):
+        label = f"{names[person]} (#{person + 1})" if names[person] in repeated else names[person]
+        sheets[label] = pd.DataFrame([{
+            'Day': task.day,
+            'Time': f"{minutes_to_hhmm(task.start)} - {minutes_to_hhmm(task.end)}",
+            'Event': task.category,
+            'Group': task.group,
+            'Task': 'Competing' if task.role == 'competitor' else task.role.capitalize(),
+        } for task in tasks])
+    return shortfalls, workload, sheets
+
+@st.fragment
+def display_staff_assignment(plan, result, competition):
+    """Judges, scramblers and runners for every group, and each person's task sheet"""
+    with st.expander("Staff Assignment"):
+        shortfalls, workload, sheets = staff_assignment(plan, result, competition)
+        st.write("Staff come from the imported WCIF's judge, scrambler and runner roles. Nobody staffs a group "
+                 "they compete in or that overlaps one of their groups, and work goes to whoever has done the least.")
+        if not shortfalls.empty:
+            st.warning(f"{shortfalls['Missing'].sum()} staff positions in {len(shortfalls)} group roles could not "
+                       f"be filled. Ask more people to volunteer or reduce the stations.")
+            st.dataframe(shortfalls, hide_index=True)
+        if not workload.empty:
+            st.write("**Workload**")
+            st.dataframe(workload, hide_index=True)
+        if not sheets:
+            st.info("No first-round groups are scheduled, so there is nobody to assign yet.")
+            return
+        person = st.selectbox('Task Sheet', list(sheets), key='staff_person')
+        st.dataframe(sheets[person], hide_index=True)
+        st.caption("Every task sheet is also in the printable bundle.")
+
+@st.cache_resource
+def export_jobs():
+    """Bundles being rendered, by key; shared so a bundle is rendered once for every session asking for it"""
+    return {}
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def export_key(config, plan, result, competition=None):
+    """Bundle key of a schedule, with the imported competitors when there are any"""
+    if competition is None:
+        return bundle_key(config, plan, result)
+    return bundle_key(config, plan, result, competition.competitors, competition.name or competition.id)
+
+def start_export(key, plan, result, competition=None):
+    """Callback of the prepare button: render the bundle in the background unless it is already under way"""
+    jobs = export_jobs()
+    if key not in jobs:
+        prune_bundles(EXPORTS_DIR)
+        jobs[key] = ExportJob(bundle_path(EXPORTS_DIR, key), plan, result,
+                              competition.competitors if competition else (),
+                              (competition.name or competition.id) if competition else '')
+
+@st.fragment(run_every=EXPORT_POLL_SECONDS)
+def display_export_progress(key):
+    """Progress of a bundle being rendered, polled without holding up the rest of the page"""
+    job = export_jobs().get(key)
+    if job is None or job.finished:
+        # The page shows the download button or the error from here on
+        st.rerun()
+    st.progress(job.fraction, text=f"Rendering {job.done} of {job.total or '?'} files")
+
+def display_exports(config, plan, result, competition=None):
+    """Printable schedules, group lists and scorecards, rendered in the background into a ZIP"""
+    with st.expander("Printable Exports"):
+        st.write("Schedules per day and room, first-round group lists and scorecards as print-ready HTML "
+                 "(print to PDF from the browser), with the schedule and groups as CSV.")
+        key = export_key(config, plan, result, competition)
+        path = bundle_path(EXPORTS_DIR, key)
+        jobs = export_jobs()
+        job = jobs.get(key)
+        if job is not None and not job.finished:
+            display_export_progress(key)
+            return
+        if job is not None:
+            jobs.pop(key, None)
+            if job.error:
+                st.error(f"The bundle could not be rendered: {job.error}")
+        if not os.path.exists(path):
+            st.button('Prepare Bundle', key='export_prepare', on_click=start_export,
+                      args=(key, plan, result, competition))
+            return
+        with open(path, 'rb') as bundle:
+            st.download_button(
+                'Download Bundle',
+                bundle,
+                file_name=f"{competition.id if competition else 'schedule'}-printables.zip",
+                mime='application/zip',
+                key='export_download'
+            )
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def sweep_to_frame(outcomes):
+    """Sweep outcomes as a DataFrame; sessions keep the compact outcomes and share the frame"""
+    return pd.DataFrame([{
+        'Competitors': outcome.number_of_competitors,
+        'Days': outcome.num_days,
+        'Settings': outcome.variant,
+        'Fits': outcome.feasible,
+        'Days Used': outcome.days_used,
+        'Finish': minutes_to_hhmm(outcome.finish),
+    } for outcome in outcomes])
+
+@st.fragment
+def display_capacity_sweep(config, scheduling_mode):
+    """Sweep competitor counts and days for the current events and show what fits"""
+    with st.expander("Capacity Sweep"):
+        st.write("How many competitors fit in each number of days, using the Day 1 hours for every day.")
+        col1, col2, col3 = st.columns(3)
+        min_competitors = col1.number_input('From', min_value=1, value=20, key='sweep_min')
+        max_competitors = col2.number_input('To', min_value=1, value=1000, key='sweep_max')
+        step = col3.number_input('Step', min_value=1, value=10, key='sweep_step')
         
-        # Create columns for each field we want to display
-        cols = st.columns([2, 3, 3, 4])
-        cols[0].markdown("**Time**")
-        cols[1].markdown("**Event**")
-        cols[2].markdown("**Round**")
-        cols[3].markdown("**Duration**")
+        if st.button('Run Sweep', key='sweep_run'):
+            first_rounds = tuple(Event(event.category) for event in config.events)
+            outcomes = sweep(
+                range(int(min_competitors), int(max_competitors) + 1, int(step)),
+                day_counts=(1, 2, 3),
+                day_schedules=(config.day_schedules[0],),
+                variants=(('Current settings', config.events), ('First rounds only', first_rounds)),
+                main_event=config.main_event,
+                mode='stages' if scheduling_mode == 'Parallel Stages' else 'greedy',
+                solve_times=config.solve_times
+            )
+            st.session_state.sweep_results = tuple(outcomes)
         
-        # Add a divider
-        st.markdown("---")
+        if 'sweep_results' not in st.session_state:
+            return
+        results = sweep_to_frame(st.session_state.sweep_results)
         
-        for _, row in day_schedule.iterrows():
-            cols = st.columns([2, 3, 3, 4])
-            
-            # Time column: combine start and end time
-            time_str = f"{row['Start']} - {row['End']}"
-            cols[0].write(time_str)
-            
-            # Event name
-            if row['Event'] in ['Registration', 'Lunch Break', 'Prize Giving']:
-                cols[1].markdown(f"**{row['Event']}**")
-            else:
-                cols[1].write(row['Event'])
-            
-            # Round number
-            cols[2].write(row['Round'])
-            
-            # Duration
-            cols[3].write(row['Duration'])
-            
-        # Add some spacing between days
-        st.markdown("\n")
+        frontier = (results[results['Fits']].groupby(['Settings', 'Days'])['Competitors'].max()
+                    .unstack('Days').reindex(columns=[1, 2, 3]))
+        st.write("**Maximum competitors that fit**")
+        st.dataframe(frontier)
         
+        heatmap = alt.Chart(results).mark_rect().encode(
+            x=alt.X('Competitors:O', axis=alt.Axis(labelOverlap=True)),
+            y=alt.Y('Days:O'),
+            color=alt.Color('Fits:N', scale=alt.Scale(domain=[True, False], range=['#4caf50', '#e57373'])),
+            row=alt.Row('Settings:N', title=None),
+            tooltip=['Competitors', 'Days', 'Settings', 'Fits', 'Days Used', 'Finish']
+        )
+        st.altair_chart(heatmap, use_container_width=True)
         
+
+def instrumentation_enabled():
+    """Timings are recorded with QBOS_DEBUG set or ?debug=1 in the page URL"""
+    return bool(os.environ.get('QBOS_DEBUG')) or st.query_params.get('debug') == '1'
+
+def request_profile():
+    """Callback of the profile button; the rerun it triggers is profiled"""
+    st.session_state.profile_next_rerun = True
+
+def display_debug_panel(recorder):
+    """Stage timings and counters of this rerun, and the last captured profile"""
+    with st.expander("Debug: Rerun Timings"):
+        st.write(f"Total: {recorder.total_ms():.1f} ms")
+        timings = pd.DataFrame({'Stage': list(recorder.timings),
+                                'Milliseconds': [round(ms, 2) for ms in recorder.timings.values()]})
+        st.dataframe(timings, hide_index=True)
+        if recorder.counters:
+            st.dataframe(pd.DataFrame({'Counter': list(recorder.counters),
+                                       'Value': list(recorder.counters.values())}), hide_index=True)
+        st.button('Profile Next Rerun', key='profile_rerun', on_click=request_profile)
+        if 'last_profile' in st.session_state:
+            st.code(st.session_state.last_profile)
+
 def scheduleGenerator():
+    if not instrumentation_enabled():
+        schedule_generator_page(NULL_RECORDER)
+        return
+    
+    recorder = Recorder()
+    if st.session_state.pop('profile_next_rerun', False):
+        with profile() as captured:
+            schedule_generator_page(recorder)
+        st.session_state.last_profile = captured['stats']
+    else:
+        schedule_generator_page(recorder)
+    recorder.write_jsonl(TIMINGS_LOG)
+    display_debug_panel(recorder)
+
+def schedule_generator_page(recorder):
+    """The page itself, with its stages timed by recorder"""
     # Initialize session state first
-    initialize_session_state()
+    with recorder.stage('session_state'):
+        initialize_session_state()
     
     st.title('Schedule Generator')
     st.write('Welcome to the Schedule Generator app')
     
-    # Add reset button in the sidebar
-    if st.sidebar.button('Reset All Settings'):
-        reset_settings()
-        st.experimental_rerun()
+    with recorder.stage('sidebar'):
+        # Add reset button in the sidebar
+        if st.sidebar.button('Reset All Settings'):
+            reset_settings()
+            st.experimental_rerun()
     
-    # Add number of days selection at the top of the sidebar
-    num_days = st.sidebar.number_input(
-        'Number of Competition Days', 
-        min_value=1, 
-        max_value=3, 
-        value=st.session_state.num_days,
-        key='days_input'
-    )
-    st.session_state.num_days = num_days
+        # Add number of days selection at the top of the sidebar
+        num_days = st.sidebar.number_input(
+            'Number of Competition Days', 
+            min_value=1, 
+            max_value=3, 
+            value=st.session_state.num_days,
+            key='days_input'
+        )
+        st.session_state.num_days = num_days
     
-    # Category selection
-    selected_categories = st.sidebar.multiselect(
-        'Select Categories',
-        categories,
-        key='categories_select',
-        default=st.session_state.selected_categories,
-        on_change=update_selected_categories
-    )
+        # Scheduling mode: greedy first-fit or exact packing
+        scheduling_mode = st.sidebar.radio(
+            'Scheduling Mode',
+            ['Greedy', 'Exact', 'Parallel Stages'],
+            key='scheduling_mode',
+            help="Exact searches for the earliest-finishing packing of rounds into days with lunch inside "
+                 "a window around midday, so it can finish later than Greedy, which breaks for lunch "
+                 "wherever midday falls. "
+                 "Parallel Stages runs FMC, the BLD events and less popular events in a side room "
+                 "while the main stage continues"
+        )
+        time_budget = 1.0
+        if scheduling_mode == 'Exact':
+            time_budget = st.sidebar.number_input(
+                'Solver Time Budget (seconds)',
+                min_value=0.1,
+                max_value=30.0,
+                value=1.0,
+                step=0.5,
+                key='solver_time_budget'
+            )
+        competitor_aware = scheduling_mode != 'Exact' and st.sidebar.checkbox(
+            'Competitor-Aware Order',
+            key='competitor_aware_order',
+            help="Order rounds so events with many shared competitors are close together but not back to "
+                 "back, with time between the rounds of an event, instead of all first rounds, then all "
+                 "second rounds and so on"
+        )
+        fit_stations = st.sidebar.checkbox(
+            'Fit Stations to Days',
+            key='fit_stations',
+            help="Use the fewest stations with which every round fits into the days and day hours"
+        )
     
-    # Main event selection (only show if categories are selected)
-    if selected_categories:
-        main_event = st.sidebar.selectbox(
-            'Main Event',
-            selected_categories,
-            index=selected_categories.index('3x3') if '3x3' in selected_categories else 0,
-            key='main_event_select'
+        # Category selection
+        selected_categories = st.sidebar.multiselect(
+            'Select Categories',
+            categories,
+            key='categories_select',
+            default=st.session_state.selected_categories,
+            on_change=update_selected_categories
         )
-        st.session_state.main_event = main_event
     
-    # Number of competitors input
-    number_of_competitors = st.sidebar.number_input(
-        'Number of Competitors',
-        min_value=1,
-        value=st.session_state.number_of_competitors,
-        key='competitor_count',
-        on_change=update_competitor_count
-    )
+        # Main event selection (only show if categories are selected)
+        if selected_categories:
+            main_event = st.sidebar.selectbox(
+                'Main Event',
+                selected_categories,
+                index=selected_categories.index('3x3') if '3x3' in selected_categories else 0,
+                key='main_event_select'
+            )
+            st.session_state.main_event = main_event
+    
+        # Number of competitors input
+        number_of_competitors = st.sidebar.number_input(
+            'Number of Competitors',
+            min_value=1,
+            value=st.session_state.number_of_competitors,
+            key='competitor_count',
+            on_change=update_competitor_count
+        )
+    
+        # Registration percentages: default table or WCA history
+        registration_rates = select_registration_rates(number_of_competitors)
+        registrations = display_wcif_import()
+        if registrations:
+            # Actual registrations replace the estimated percentages
+            registration_rates = tuple((category, round(100 * count / number_of_competitors, 2))
+                                       for category, count in registrations)
+        solve_times = select_solve_times(selected_categories)
     
-    # Add day schedule inputs
-    day_schedules = []
-    for day in range(num_days):
-        st.sidebar.subheader(f'Day {day + 1} Schedule')
-        col1, col2 = st.sidebar.columns(2)
-        with col1:
-            default_start = datetime.strptime(st.session_state.day_schedules[day][0], '%H:%M').time()
-            start_time = st.time_input(f'Day {day + 1} Start Time', value=default_start)
-        with col2:
-            default_end = datetime.strptime(st.session_state.day_schedules[day][1], '%H:%M').time()
-            end_time = st.time_input(f'Day {day + 1} End Time', value=default_end)
-        day_schedules.append((start_time.strftime('%H:%M'), end_time.strftime('%H:%M')))
-    st.session_state.day_schedules = day_schedules
+        # Add day schedule inputs
+        day_schedules = []
+        for day in range(num_days):
+            st.sidebar.subheader(f'Day {day + 1} Schedule')
+            col1, col2 = st.sidebar.columns(2)
+            with col1:
+                default_start = datetime.strptime(st.session_state.day_schedules[day][0], '%H:%M').time()
+                start_time = st.time_input(f'Day {day + 1} Start Time', value=default_start)
+            with col2:
+                default_end = datetime.strptime(st.session_state.day_schedules[day][1], '%H:%M').time()
+                end_time = st.time_input(f'Day {day + 1} End Time', value=default_end)
+            day_schedules.append((start_time.strftime('%H:%M'), end_time.strftime('%H:%M')))
+        # Hours of the days not shown are kept for when they are added back
+        day_schedules_state = tuple(day_schedules) + st.session_state.day_schedules[num_days:]
+        st.session_state.day_schedules = (DEFAULT_DAY_SCHEDULES if day_schedules_state == DEFAULT_DAY_SCHEDULES
+                                          else day_schedules_state)
+    recorder.note(competitors=number_of_competitors, events=len(selected_categories), mode=scheduling_mode)
 
     # Calculate stations
     num_stations = calculate_stations(number_of_competitors)
@@ -593,108 +967,120 @@ def scheduleGenerator():
             value=number_of_competitors
         )
     with col2:
-        st.metric(
-            label="Solving Stations Required",
-            value=num_stations,
-            help="2 stations per 20 competitors, minimum 6 stations"
-        )
+        # Filled in again below when the stations are fitted to the days
+        stations_metric = st.empty()
+    stations_metric.metric(
+        label="Solving Stations Required",
+        value=num_stations,
+        help="2 stations per 20 competitors, minimum 6 stations"
+    )
     
     # Add a divider
     st.markdown("---")
     
     # Settings for each category
-    for category in selected_categories:
-        if category not in st.session_state.rounds_cutoffs:
-            st.session_state.rounds_cutoffs[category] = get_default_settings()
+    with recorder.stage('category_settings'):
+        for category in selected_categories:
+            with st.sidebar.expander(f'{category} Settings'):
+                saved_settings = event_settings(category)
+                initial_competitors = dict(registrations).get(category) or initial_competitors_for(
+                    category, number_of_competitors, dict(registration_rates).get(category))
             
-        with st.sidebar.expander(f'{category} Settings'):
-            saved_settings = st.session_state.rounds_cutoffs[category]
-            initial_competitors = round_up_to_5((registration_percentages[category] / 100) * number_of_competitors)
+                # Calculate maximum allowed rounds
+                max_allowed_rounds, message = validate_rounds(initial_competitors, 4)
             
-            # Calculate maximum allowed rounds
-            max_allowed_rounds, message = validate_rounds(initial_competitors, 4)
-            
-            # Number of rounds input
-            rounds = st.number_input(
-                f'Number of Rounds for {category}',
-                min_value=1,
-                max_value=max_allowed_rounds,
-                value=min(saved_settings['rounds'], max_allowed_rounds),
-                key=f'rounds_{category}',
-                on_change=on_rounds_change,
-                args=(category,)
-            )
+                # Number of rounds input
+                rounds = st.number_input(
+                    f'Number of Rounds for {category}',
+                    min_value=1,
+                    max_value=max_allowed_rounds,
+                    value=min(saved_settings.rounds, max_allowed_rounds),
+                    key=f'rounds_{category}',
+                    on_change=on_rounds_change,
+                    args=(category,)
+                )
             
-            # Show message if rounds are restricted
-            if max_allowed_rounds < 4:
-                st.info(message)
+                # Show message if rounds are restricted
+                if max_allowed_rounds < 4:
+                    st.info(message)
             
-            # Cutoff input
-            cutoff = st.text_input(
-                f'Cutoff for {category} (MM:SS format, e.g., 2:00)',
-                value=saved_settings['cutoff'],
-                key=f'cutoff_{category}',
-                on_change=on_cutoff_change,
-                args=(category,)
-            )
+                # Cutoff input
+                cutoff = st.text_input(
+                    f'Cutoff for {category} (MM:SS format, e.g., 2:00)',
+                    value=saved_settings.cutoff,
+                    key=f'cutoff_{category}',
+                    on_change=on_cutoff_change,
+                    args=(category,)
+                )
             
-            # Add advancement settings
-            current_competitors = initial_competitors
-            for round_num in range(1, rounds):
-                if round_num == rounds - 1 and rounds > 1:
-                    # Final size input for the last round
-                    max_final_size = math.floor(current_competitors * 0.75)
-                    default_final_size = min(8, max_final_size)
+                # Add advancement settings
+                current_competitors = initial_competitors
+                for round_num in range(1, rounds):
+                    if round_num == rounds - 1 and rounds > 1:
+                        # Final size input for the last round
+                        max_final_size = math.floor(current_competitors * 0.75)
                     
-                    final_size = st.number_input(
-                        f'Final Round Size (competitors)',
-                        min_value=2,
-                        max_value=max_final_size,
-                        value=min(saved_settings.get('final_size', default_final_size), max_final_size),
-                        key=f'final_size_{category}',
-                        on_change=on_final_size_change,
-                        args=(category,),
-                        help=f"Maximum allowed: {max_final_size} competitors (75% of previous round)"
-                    )
-                else:
-                    # Percentage input for non-final rounds
-                    advance_key = f'advance_r{round_num}'
-                    default_advance = 75
-                    advance_percent = st.number_input(
-                        f'Advance to Round {round_num + 1} (%)',
-                        min_value=25,
-                        max_value=75,
-                        value=saved_settings.get(advance_key, default_advance),
-                        key=f'{advance_key}_{category}',
-                        on_change=on_advance_change,
-                        args=(category, advance_key),
-                        help="Between 25% and 75% of competitors must advance"
-                    )
-                    current_competitors = round_up_to_5(current_competitors * (advance_percent / 100))
+                        final_size = st.number_input(
+                            f'Final Round Size (competitors)',
+                            min_value=2,
+                            max_value=max_final_size,
+                            value=min(saved_settings.final_size, max_final_size),
+                            key=f'final_size_{category}',
+                            on_change=on_final_size_change,
+                            args=(category,),
+                            help=f"Maximum allowed: {max_final_size} competitors (75% of previous round)"
+                        )
+                    else:
+                        # Percentage input for non-final rounds
+                        advance_key = f'advance_r{round_num}'
+                        advance_percent = st.number_input(
+                            f'Advance to Round {round_num + 1} (%)',
+                            min_value=25,
+                            max_value=75,
+                            value=getattr(saved_settings, advance_key),
+                            key=f'{advance_key}_{category}',
+                            on_change=on_advance_change,
+                            args=(category, advance_key),
+                            help="Between 25% and 75% of competitors must advance"
+                        )
+                        current_competitors = round_up_to_5(current_competitors * (advance_percent / 100))
                     
-                    if round_num < rounds - 2:  # Show estimated competitors for next round if it's not the final
-                        st.info(f"Approximately {current_competitors} competitors will advance")
+                        if round_num < rounds - 2:  # Show estimated competitors for next round if it's not the final
+                            st.info(f"Approximately {current_competitors} competitors will advance")
+    recorder.count('category_expanders', len(selected_categories))
     
     # Display results if categories are selected
     if selected_categories:
         # Display estimated competitors table
-        st.subheader('Estimated Competitors per Category')
-        estimates_df = calculate_estimated_competitors(
-            number_of_competitors,
-            selected_categories,
-            st.session_state.rounds_cutoffs
-        )
-        st.dataframe(estimates_df)
+        with recorder.stage('estimation'):
+            st.subheader('Estimated Competitors per Category')
+            config = build_config(
+                number_of_competitors,
+                selected_categories,
+                st.session_state.rounds_cutoffs,
+                num_days,
+                day_schedules,
+                main_event,
+                registration_rates,
+                solve_times,
+                registrations
+            )
+            if fit_stations:
+                config = fit_stations_to_days(config, scheduling_mode, stations_metric)
+            plan = calculate_estimated_competitors(config)
+            st.dataframe(estimates_to_frame(plan, registration_rates))
+        recorder.count('rounds', len(plan.rounds))
         
         # Generate and display schedule
         st.subheader('Competition Schedule')
-        schedule_df, warnings = schedule_competition(
-            estimates_df, 
-            num_days, 
-            day_schedules, 
-            main_event,
-            st.session_state.rounds_cutoffs
-        )
+        with recorder.stage('scheduling'):
+            ordering = competitor_order(plan, number_of_competitors, st.session_state.get('wcif')) \
+                if competitor_aware else None
+            result, solver_note = schedule_competition(plan, scheduling_mode, time_budget, ordering)
+            warnings = result.warnings
+        recorder.count('schedule_slots', len(result.slots))
+        if solver_note:
+            st.caption(solver_note)
         
         # Display warnings if any
         if warnings:
@@ -702,9 +1088,53 @@ def scheduleGenerator():
                 for warning in warnings:
                     st.warning(warning)
         
+        if not result.is_complete:
+            with recorder.stage('setting_suggestions'):
+                display_setting_suggestions(config, scheduling_mode)
+        
         # Display the schedule in the enhanced format
-        display_schedule(schedule_df)
+        with recorder.stage('display_schedule'):
+            display_schedule(result)
         
         # Show raw schedule data in an expander
-        with st.expander("View Raw Schedule Data"):
-            st.dataframe(schedule_df)
\ No newline at end of file
+        with recorder.stage('raw_data'):
+            st.download_button(
+                'Download Schedule CSV',
+                schedule_csv(result),
+                file_name='schedule.csv',
+                mime='text/csv',
+                key='schedule_csv_download',
+                help="Every block of the schedule as shown in the tables above"
+            )
+        
+        with recorder.stage('wcif_export'):
+            competition = st.session_state.get('wcif')
+            st.download_button(
+                'Download WCIF',
+                schedule_wcif(config, plan, result, competition),
+                file_name=f"{competition.id if competition else 'schedule'}-wcif.json",
+                mime='application/json',
+                key='wcif_download',
+                help="The schedule as WCIF venues, rooms, activities and group activities"
+            )
+        
+        with recorder.stage('exports'):
+            display_exports(config, plan, result, st.session_state.get('wcif'))
+        
+        competition = st.session_state.get('wcif')
+        if competition is not None and any(competitor.staff_roles for competitor in competition.competitors):
+            with recorder.stage('staff_assignment'):
+                display_staff_assignment(plan, result, competition)
+        
+        with recorder.stage('overrun_risk'):
+            display_overrun_risk(plan, result, default_stages(plan) if scheduling_mode == 'Parallel Stages' else None,
+                                 config.registration_rates)
+        
+        with recorder.stage('live_updates'):
+            display_live_updates(plan, result)
+        
+        with recorder.stage('station_trade_off'):
+            display_station_trade_off(config, scheduling_mode)
+        
+        with recorder.stage('capacity_sweep'):
+            display_capacity_sweep(config, scheduling_mode)
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+Headless estimation and scheduling core for WCA competitions.
+
+Nothing in this package imports streamlit, so it can be used from scripts and
+services as well as from the Streamlit page in tools/scheduleGenerator.py:
+
+    from tools.scheduling import Config, Event, estimate, schedule
+
+    plan = estimate(Config(120, (Event('3x3', rounds=3), Event('2x2', rounds=2))))
+    result = schedule(plan)
+"""
+from .constants import categories, registration_percentages, event_details
+from .estimation import (calculate_groups_and_size, calculate_round_time, calculate_stations,
+                         estimate, validate_rounds)
+from .models import Config, Event, Plan, Round, Schedule, ScheduleSlot
+from .scheduler import schedule
+from .timeutils import minutes_to_hhmm
+
+__all__ = [
+    'Config', 'Event', 'Plan', 'Round', 'Schedule', 'ScheduleSlot',
+    'estimate', 'schedule',
+    'calculate_groups_and_size', 'calculate_round_time', 'calculate_stations', 'validate_rounds',
+    'categories', 'registration_percentages', 'event_details', 'minutes_to_hhmm',
+]
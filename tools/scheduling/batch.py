@@ -0,0 +1,158 @@
+"""
+Batch scheduling of many competitions from the command line.
+
+Reads one competition per line of JSON, estimates and schedules it in a
+process pool, and writes the schedules as JSON lines or CSV in input order:
+
+    {"id": "Example2025", "number_of_competitors": 120, "num_days": 2,
+     "day_schedules": [["08:00", "18:00"], ["09:00", "17:00"]], "main_event": "3x3",
+     "events": {"3x3": {"rounds": 3, "cutoff": "2:00", "advance_r1": 60}, "2x2": {}}}
+
+events may also be a list of category names. Optional keys are num_stations,
+registration_rates ({category: percentage}) and mode ("greedy", "exact" or
+"stages"). Only a fixed number of lines are in flight at any time, so memory
+does not grow with the length of the input.
+
+    python -m tools.scheduling.batch season.jsonl --format csv --output season.csv
+"""
+import argparse
+import collections
+import csv
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .estimation import estimate
+from .models import Config, Event
+from .scheduler import schedule
+from .solver import solve
+from .stages import schedule_stages
+from .timeutils import minutes_to_hhmm
+
+MODES = ('greedy', 'exact', 'stages')
+CSV_COLUMNS = ('id', 'day', 'start', 'end', 'event', 'round', 'stage')
+# Lines sent to a worker at a time, and chunks in flight per worker
+CHUNKSIZE = 32
+WINDOW_PER_WORKER = 4
+
+
+def config_from_record(record):
+    """Build a Config from one input record"""
+    events = record.get('events', ())
+    if isinstance(events, dict):
+        events = tuple(Event.from_settings(category, settings or {}) for category, settings in events.items())
+    else:
+        events = tuple(Event(category) for category in events)
+    num_days = int(record.get('num_days', 2))
+    day_schedules = tuple(tuple(day) for day in record.get('day_schedules', (('08:00', '18:00'),)))
+    if len(day_schedules) < num_days:
+        # The last day's hours carry over to any days without their own
+        day_schedules += (day_schedules[-1],) * (num_days - len(day_schedules))
+    return Config(int(record['number_of_competitors']), events, num_days, day_schedules,
+                  record.get('main_event', '3x3'), record.get('num_stations'),
+                  tuple(sorted(record.get('registration_rates', {}).items())))
+
+def schedule_record(record, mode='greedy', time_budget=1.0):
+    """Estimate and schedule one record; returns the output record"""
+    mode = record.get('mode', mode)
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+    plan = estimate(config_from_record(record))
+    if mode == 'exact':
+        result = solve(plan, time_budget).schedule
+    elif mode == 'stages':
+        result = schedule_stages(plan)
+    else:
+        result = schedule(plan)
+    return {
+        'id': record.get('id'),
+        'num_stations': plan.num_stations,
+        'complete': result.is_complete,
+        'warnings': list(plan.warnings + result.warnings),
+        'unscheduled': [f"{r.category} R{r.number}" for r in result.unscheduled],
+        'slots': [{'day': slot.day, 'start': minutes_to_hhmm(slot.start), 'end': minutes_to_hhmm(slot.end),
+                   'event': slot.event, 'round': slot.round, 'stage': slot.stage}
+                  for slot in result.slots],
+    }
+
+def _process(task):
+    """Worker: parse, schedule and format one input line"""
+    line_number, line, mode, time_budget, output_format = task
+    record_id = None
+    try:
+        record = json.loads(line)
+        record_id = record.get('id', line_number)
+        output = schedule_record(record, mode, time_budget)
+        output['id'] = record_id
+    except Exception as error:
+        return None, {'id': record_id if record_id is not None else line_number, 'line': line_number,
+                      'error': f"{type(error).__name__}: {error}"}
+    if output_format == 'csv':
+        return [[record_id, slot['day'], slot['start'], slot['end'], slot['event'], slot['round'], slot['stage']]
+                for slot in output['slots']], None
+    return json.dumps(output), None
+
+def _process_chunk(tasks):
+    return [_process(task) for task in tasks]
+
+def run(lines, mode='greedy', time_budget=1.0, output_format='jsonl', workers=None):
+    """
+    Yield (output, error) per non-blank input line, in input order; output is a
+    JSON line or a list of CSV rows, error a dict when the line failed
+    """
+    tasks = ((number, line, mode, time_budget, output_format)
+             for number, line in enumerate(lines, start=1) if line.strip())
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from map(_process, tasks)
+        return
+    chunks = iter(lambda: list(itertools.islice(tasks, CHUNKSIZE)), [])
+    with ProcessPoolExecutor(workers) as pool:
+        # Keep a bounded window of submitted chunks and hand results out from its head
+        pending = collections.deque(pool.submit(_process_chunk, chunk)
+                                    for chunk in itertools.islice(chunks, workers * WINDOW_PER_WORKER))
+        while pending:
+            results = pending.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(pool.submit(_process_chunk, chunk))
+            yield from results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('input', nargs='?', default='-', help="JSONL file of competitions, - for stdin")
+    parser.add_argument('--output', default='-', help="output file, - for stdout")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    parser.add_argument('--mode', choices=MODES, default='greedy', help="default scheduling mode")
+    parser.add_argument('--time-budget', type=float, default=1.0, help="seconds per competition in exact mode")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    failed = 0
+    try:
+        writer = csv.writer(target) if args.format == 'csv' else None
+        if writer:
+            writer.writerow(CSV_COLUMNS)
+        for output, error in run(source, args.mode, args.time_budget, args.format, args.workers):
+            if error:
+                failed += 1
+                print(json.dumps(error), file=sys.stderr)
+            elif writer:
+                writer.writerows(output)
+            else:
+                target.write(output + '\n')
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Static event data used by the estimation and scheduling core"""
+
+categories = ['3x3', '2x2', '4x4', '5x5', '6x6', '7x7', '3BLD', '3OH', 'FMC', 
+              'Megaminx', 'Pyraminx', 'Skewb', 'Square-1', 'Clock', '4BLD', 
+              '5BLD', 'MBLD']
+
+# Dictionary of registration percentages with exact values
+registration_percentages = {
+    '2x2': 83.92,
+    '3x3': 97.49,
+    '3BLD': 33.15,
+    'FMC': 71.45,
+    '3OH': 69.03,
+    '4x4': 69.17,
+    '4BLD': 19.94,
+    '5x5': 59.59,
+    '5BLD': 13.00,
+    '6x6': 44.54,
+    '7x7': 44.98,
+    'Clock': 53.57,
+    'Megaminx': 58.59,
+    'Pyraminx': 72.37,
+    'Skewb': 60.80,
+    'Square-1': 39.63,
+    'MBLD': 10.00
+}
+
+# Format and attempts for each category, and the time limit per attempt in seconds
+# for the timed ones
+event_details = {
+    '3x3': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30, 'time_limit': 600},
+    '2x2': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 20, 'time_limit': 600},
+    '4x4': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 40, 'time_limit': 600},
+    '5x5': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 50, 'time_limit': 600},
+    '6x6': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 50, 'time_limit': 900},
+    '7x7': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 50, 'time_limit': 1200},
+    'Megaminx': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 60, 'time_limit': 600},
+    'Pyraminx': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30, 'time_limit': 600},
+    'Square-1': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30, 'time_limit': 600},
+    'Clock': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 40, 'time_limit': 600},
+    'Skewb': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 20, 'time_limit': 600},
+    '3OH': {'format': 'Ao5', 'attempts': 5, 'scramble_time': 30, 'time_limit': 600},
+    '3BLD': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 360, 'time_limit': 600},
+    'FMC': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 0},
+    '4BLD': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 0},
+    '5BLD': {'format': 'Mo3', 'attempts': 3, 'scramble_time': 0},
+    'MBLD': {'format': 'Single', 'attempts': 1, 'scramble_time': 0}
+}
+# Attempts a first-round cutoff has to be beaten within, per format
+cutoff_attempts = {'Ao5': 2, 'Mo3': 1}
+
+# Categories that need triple station capacity for groups
+small_categories = {'2x2', '3x3', '3OH', 'Skewb', 'Pyraminx'}
+# Categories that always have one group
+single_group_categories = {'FMC', '4BLD', '5BLD', 'MBLD'}
+# Categories with fixed time
+fixed_time_categories = {'FMC', '4BLD', '5BLD', 'MBLD'}
+# Categories most competitors register for
+popular_categories = {'2x2', '3x3', '4x4', '3OH', 'Pyraminx', 'Skewb'}
+
+# Default solving time in seconds when an event has no cutoff
+DEFAULT_SOLVE_TIME = 35
+# Fixed length in minutes of FMC and the multi-attempt BLD events
+FIXED_ROUND_TIME = 75
+# Stations kept free of competitors for scrambling and running
+RESERVED_STATIONS = 3
+
+# Fixed blocks of the day, in minutes
+REGISTRATION_TIME = 45
+LUNCH_TIME = 60
+PRIZE_GIVING_TIME = 30
+# Recommended maximum length of a day (8 hours + 1 hour lunch)
+MAX_DAY_LENGTH = 540
+# Lunch has to start within this many minutes before/after the middle of the day
+LUNCH_WINDOW_BEFORE = 60
+LUNCH_WINDOW_AFTER = 90
@@ -0,0 +1,171 @@
+"""Pure estimation of competitors, groups and round times"""
+import math
+from functools import lru_cache
+
+from .constants import (registration_percentages, event_details, small_categories,
+                        single_group_categories, fixed_time_categories, DEFAULT_SOLVE_TIME,
+                        FIXED_ROUND_TIME, RESERVED_STATIONS)
+from .models import Event, Plan, Round
+from .timeutils import get_day_schedule, parse_cutoff
+
+
+def round_up_to_15_minutes(minutes):
+    """Round up to nearest 15 minutes"""
+    return math.ceil(minutes / 15) * 15
+
+def round_up_to_5(number):
+    """Round up to nearest 5"""
+    return math.ceil(number / 5) * 5
+
+def calculate_round_time(category, num_competitors, num_stations, cutoff=None, is_first_round=True,
+                         solve_time=None):
+    """Calculate the estimated round time in minutes"""
+    
+    # Fixed time categories always take 75 minutes
+    if category in fixed_time_categories:
+        return FIXED_ROUND_TIME
+    
+    # Get event details
+    details = event_details[category]
+    
+    cutoff_seconds = parse_cutoff(cutoff)
+    if cutoff_seconds is not None:
+        # Use 70% of cutoff time for first round, 60% for subsequent rounds
+        solving_time = cutoff_seconds * (0.7 if is_first_round else 0.6)
+    else:
+        # Historical solve time of the event if known
+        solving_time = solve_time or DEFAULT_SOLVE_TIME
+    
+    # Calculate total time per solve
+    total_time_per_solve = solving_time + details['scramble_time']
+    
+    # Calculate total round time in minutes
+    total_seconds = (total_time_per_solve * details['attempts'] * num_competitors) / (num_stations - RESERVED_STATIONS)
+    total_minutes = total_seconds / 60
+    
+    # Round up to nearest 15 minutes
+    return round_up_to_15_minutes(total_minutes)
+
+def calculate_stations(total_competitors):
+    """Calculate the number of stations needed"""
+    # Calculate base number of stations (2 stations per 20 competitors)
+    base_stations = math.ceil(total_competitors / 20) * 2
+    
+    # Ensure minimum of 6 stations
+    if base_stations < 6:
+        return 6
+    
+    # Round up to nearest even number if necessary
+    return math.ceil(base_stations / 2) * 2
+
+def calculate_groups_and_size(category, competitors, num_stations):
+    """Calculate the number of groups and size per group"""
+    if category in single_group_categories:
+        return 1, competitors
+    
+    # Calculate max competitors per group based on category type
+    if category in small_categories:
+        max_per_group = num_stations * 3
+    else:
+        max_per_group = num_stations * 2
+    
+    # Calculate number of groups needed
+    num_groups = math.ceil(competitors / max_per_group)
+    # Calculate actual group size
+    group_size = math.ceil(competitors / num_groups) if num_groups else 0
+    
+    return num_groups, group_size
+
+def validate_rounds(num_competitors, proposed_rounds):
+    """
+    Validate if the number of rounds is allowed based on WCA regulations
+    Returns (allowed_rounds, message)
+    """
+    if num_competitors <= 7:
+        return (1, "7 or fewer competitors can only have 1 round")
+    elif num_competitors <= 15:
+        return (min(2, proposed_rounds), "15 or fewer competitors can have maximum 2 rounds")
+    elif num_competitors <= 99:
+        return (min(3, proposed_rounds), "99 or fewer competitors can have maximum 3 rounds")
+    return (proposed_rounds, "")
+
+def initial_competitors(category, total_competitors, percentage=None):
+    """Estimated first round competitors for a category"""
+    if percentage is None:
+        percentage = registration_percentages[category]
+    return round_up_to_5((percentage / 100) * total_competitors)
+
+def next_round_competitors(event, round_num, num_rounds, current_competitors):
+    """Competitors in round_num, given the competitors of the previous round"""
+    if round_num == num_rounds and num_rounds > 1:
+        # For finals, use fixed number
+        # Ensure final size is not too large (max 75% of previous round)
+        max_final_size = math.floor(current_competitors * 0.75)
+        return min(event.final_size, max_final_size)
+    # For other rounds, use percentage
+    # Ensure at least 25% are eliminated
+    advance_percent = min(75, event.advance_percent(round_num - 1))
+    return round_up_to_5(current_competitors * (advance_percent / 100))
+
+@lru_cache(maxsize=4096)
+def estimate_event(event, total_competitors, num_stations, percentage=None, solve_times=None, registered=None):
+    """
+    Estimate every round of one event
+    solve_times gives seconds per attempt for the first, second, semi and final round types,
+    and registered is the actual number of registrations for the event when known
+    Returns (rounds, warning) where warning is None unless the rounds were reduced.
+    Results are memoized on the event settings, competitors and stations, so a
+    rerun only recomputes the events whose inputs changed.
+    """
+    if registered is not None:
+        competitors = registered
+    else:
+        competitors = initial_competitors(event.category, total_competitors, percentage)
+    
+    # Validate number of rounds based on initial competitors
+    num_rounds, message = validate_rounds(competitors, event.rounds)
+    warning = f"{event.category}: {message}" if num_rounds != event.rounds else None
+    
+    rounds = []
+    for round_num in range(1, num_rounds + 1):
+        if round_num > 1:
+            competitors = next_round_competitors(event, round_num, num_rounds, competitors)
+        num_groups, group_size = calculate_groups_and_size(event.category, competitors, num_stations)
+        is_final = round_num == num_rounds and num_rounds > 1
+        solve_time = solve_times[3 if is_final else min(round_num, 3) - 1] if solve_times else None
+        duration = calculate_round_time(event.category, competitors, num_stations, event.cutoff, round_num == 1,
+                                        solve_time)
+        rounds.append(Round(event.category, round_num, competitors, num_groups, group_size,
+                            duration, is_final, event.cutoff, solve_time))
+    return tuple(rounds), warning
+
+def estimate(config, tables=None):
+    """
+    Estimate all selected events of a competition and return a Plan
+    tables are EstimateTables (see tables.py) used for the events they cover
+    """
+    num_stations = config.num_stations or calculate_stations(config.number_of_competitors)
+    rates = dict(config.registration_rates)
+    solve_times = dict(config.solve_times)
+    registrations = dict(config.registrations)
+    rounds = []
+    warnings = []
+    
+    for event in config.events:
+        if isinstance(event, str):
+            event = Event(event)
+        if event.category not in registration_percentages:
+            continue
+        looked_up = None
+        if tables is not None and config.num_stations is None and event.category not in rates \
+                and event.category not in solve_times and event.category not in registrations:
+            looked_up = tables.lookup(event, config.number_of_competitors)
+        event_rounds, warning = looked_up or estimate_event(
+            event, config.number_of_competitors, num_stations, rates.get(event.category),
+            solve_times.get(event.category), registrations.get(event.category))
+        rounds.extend(event_rounds)
+        if warning:
+            warnings.append(warning)
+    
+    days = tuple(get_day_schedule(*day) for day in config.day_schedules[:config.num_days])
+    return Plan(tuple(rounds), num_stations, days, config.main_event, tuple(warnings))
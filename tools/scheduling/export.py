@@ -0,0 +1,394 @@
+"""
+Printable exports of a schedule, rendered in the background into a ZIP on disk.
+
+A bundle holds:
+
+    schedule/day-1.html, schedule/day-1-side-room.html   each day's blocks and groups, per room
+    schedule.csv                                         every block and group
+    groups/3x3.html, groups.csv                          first-round group lists, with competitors
+    scorecards/3x3-group-1.html                          scorecards of every first-round group
+    tasks/sheets-001.html, tasks.csv                     task sheets, with staff volunteers
+
+The HTML pages are styled for printing, one day, event or group per printed
+page and four scorecards to a sheet, so the browser's Print to PDF gives the
+PDFs. Without competitors, each first-round group gets blank scorecards for its
+estimated size. When competitors volunteered for staff roles, staff are
+assigned as in staff.py, and everyone's task sheet lists their own groups and
+staff tasks, TASK_SHEETS_PER_FILE people to a file.
+
+Bundles of thousands of pages are rendered by worker processes, which get the
+schedule once through the pool initializer and then render a few artifacts
+per task. Only a bounded window of artifacts is in flight, and each is written into
+the ZIP as soon as it is its turn, so memory holds a few pages at a time. A
+bundle is named after a hash of everything it is rendered from, and a bundle
+that exists already is reused.
+
+    python -m tools.scheduling.export competition.json --output bundle.zip
+"""
+import argparse
+import collections
+import csv
+import hashlib
+import html
+import io
+import itertools
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .constants import cutoff_attempts, event_details
+from .estimation import estimate
+from .groups import assign_groups
+from .staff import assign_staff, task_sheets
+from .scheduler import schedule
+from .timeline import Timeline
+from .timeutils import minutes_to_hhmm
+
+# Bumped whenever the rendered output changes, so older cached bundles are not reused
+EXPORT_VERSION = 3
+# Artifacts sent to a worker at a time, and chunks in flight per worker
+CHUNKSIZE = 8
+WINDOW_PER_WORKER = 4
+# Bundles with fewer artifacts are rendered in the calling thread
+SMALL_BUNDLE = 64
+SCORECARDS_PER_PAGE = 4
+TASK_SHEETS_PER_FILE = 50
+# Bundles kept in an export directory, newest first
+MAX_BUNDLES = 32
+
+STYLE = """
+body { font-family: sans-serif; font-size: 11pt; margin: 1cm; }
+h1 { font-size: 16pt; margin: 0 0 0.2cm; }
+h2 { font-size: 12pt; margin: 0 0 0.5cm; color: #555; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #999; padding: 3px 6px; text-align: left; }
+tr.break td { background: #eee; font-style: italic; }
+.sheet { display: grid; grid-template-columns: 1fr 1fr; gap: 0.5cm; page-break-after: always; }
+.card { border: 1px solid #000; padding: 0.3cm; height: 12.5cm; }
+.card td { height: 0.9cm; }
+.cutoff td { border-top: 3px double #000; }
+@media print { body { margin: 0; } .page { page-break-after: always; } }
+"""
+
+_shared = {}
+
+
+def bundle_key(config, plan, result, competitors=(), name=''):
+    """Hash of everything a bundle is rendered from"""
+    people = [(competitor.name, sorted(competitor.events), competitor.seed_times, sorted(competitor.staff_roles))
+              for competitor in competitors]
+    content = repr((EXPORT_VERSION, name, config, plan, result, people))
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+def bundle_path(directory, key):
+    return os.path.join(directory, f'{key}.zip')
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+def _page(title, body):
+    return (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<style>{STYLE}</style></head><body>\n{body}\n</body></html>\n')
+
+class _Context:
+    """What the renderers need, built once per process"""
+
+    def __init__(self, name, plan, result, competitors, assignment, staff=None):
+        self.name = name
+        self.plan = plan
+        self.competitors = competitors
+        self.assignment = assignment
+        self.sheets = task_sheets(competitors, assignment, staff) if staff is not None else {}
+        self.timeline = Timeline.from_schedule(result, plan, assignment)
+        self.first_rounds = {rnd.category: rnd for rnd in plan.rounds if rnd.number == 1}
+        self.groups = {event.category: event for event in assignment.events} if assignment else {}
+
+
+def artifacts(plan, result, assignment=None, staff=None, competitors=()):
+    """
+    (name, kind, args) of every artifact of a bundle, in ZIP order; group lists
+    need an assignment, and task sheets a StaffAssignment and the competitors
+    """
+    timeline = Timeline.from_schedule(result, plan)
+    specs = []
+    for day in sorted({block.day for block in timeline.blocks}):
+        for room in timeline.rooms or ('',):
+            suffix = f'-{_slug(room)}' if room else ''
+            specs.append((f'schedule/day-{day}{suffix}.html', 'schedule', (day, room)))
+    specs.append(('schedule.csv', 'schedule_csv', ()))
+
+    scheduled = {slot.event for slot in result.slots if slot.round == 1}
+    if assignment is not None:
+        events = [event for event in assignment.events if event.category in scheduled]
+        specs.extend((f'groups/{_slug(event.category)}.html', 'groups', (event.category,)) for event in events)
+        specs.append(('groups.csv', 'groups_csv', ()))
+        group_counts = [(event.category, len(event.groups)) for event in events]
+    else:
+        group_counts = [(rnd.category, max(1, rnd.groups)) for rnd in plan.rounds
+                        if rnd.number == 1 and rnd.category in scheduled]
+    for category, count in group_counts:
+        specs.extend((f'scorecards/{_slug(category)}-group-{number}.html', 'scorecards', (category, number))
+                     for number in range(1, count + 1))
+
+    if staff is not None:
+        people = {person for event in assignment.events if event.times for members in event.groups
+                  for person in members}
+        people.update(task.person for task in staff.tasks)
+        people = sorted(people, key=lambda person: (competitors[person].name, person))
+        specs.extend((f'tasks/sheets-{number:03}.html', 'tasks', (tuple(people[i:i + TASK_SHEETS_PER_FILE]),))
+                     for number, i in enumerate(range(0, len(people), TASK_SHEETS_PER_FILE), start=1))
+        specs.append(('tasks.csv', 'tasks_csv', ()))
+    return specs
+
+
+def _init(*args):
+    _shared['context'] = _Context(*args)
+
+def _render_schedule(context, day, room):
+    rows = []
+    for block in context.timeline.overlapping(day, 0, 24 * 60, room):
+        if block.is_break:
+            rows.append(f'<tr class="break"><td>{minutes_to_hhmm(block.start)} - {minutes_to_hhmm(block.end)}</td>'
+                        f'<td colspan="3">{html.escape(block.event)}</td></tr>')
+        else:
+            rows.append(f'<tr><td>{minutes_to_hhmm(block.start)} - {minutes_to_hhmm(block.end)}</td>'
+                        f'<td>{html.escape(block.event)}</td><td>Round {block.round}</td><td>Group {block.group}</td></tr>')
+    title = f"{context.name or 'Competition'}: Day {day}"
+    return _page(title, f'<h1>{html.escape(title)}</h1><h2>{html.escape(room or "Schedule")}</h2>'
+                        f'<table><tr><th>Time</th><th>Event</th><th>Round</th><th>Group</th></tr>'
+                        f'{"".join(rows)}</table>')
+
+def _render_schedule_csv(context):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(('day', 'start', 'end', 'room', 'event', 'round', 'group'))
+    for block in context.timeline.blocks:
+        writer.writerow((block.day, minutes_to_hhmm(block.start), minutes_to_hhmm(block.end), block.room,
+                         block.event, block.round or '', block.group or ''))
+    return out.getvalue()
+
+def _render_groups(context, category):
+    competitors = context.competitors
+    event = context.groups[category]
+    pages = []
+    for number, members in enumerate(event.groups, start=1):
+        when = ''
+        if event.times:
+            start, end = event.times[number - 1]
+            when = f'Day {event.day}, {minutes_to_hhmm(start)} - {minutes_to_hhmm(end)}'
+        names = sorted(competitors[member].name for member in members)
+        rows = ''.join(f'<tr><td>{position}</td><td>{html.escape(name)}</td></tr>'
+                       for position, name in enumerate(names, start=1))
+        pages.append(f'<div class="page"><h1>{html.escape(category)} Group {number}</h1><h2>{when}</h2>'
+                     f'<table><tr><th>#</th><th>Competitor</th></tr>{rows}</table></div>')
+    return _page(f'{category} groups', ''.join(pages))
+
+def _render_groups_csv(context):
+    competitors = context.competitors
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(('competitor', 'event', 'group', 'day', 'start', 'end'))
+    for event in context.assignment.events:
+        for number, members in enumerate(event.groups, start=1):
+            start, end = event.times[number - 1] if event.times else ('', '')
+            for member in members:
+                writer.writerow((competitors[member].name, event.category, number, event.day or '',
+                                 minutes_to_hhmm(start) if start != '' else '',
+                                 minutes_to_hhmm(end) if end != '' else ''))
+    return out.getvalue()
+
+def _scorecard(context, category, number, competitor, cutoff):
+    details = event_details[category]
+    attempts = details['attempts']
+    # Competitors go on to the remaining attempts only if they beat the cutoff in the
+    # first two of an average of five or the first of a mean of three
+    within = cutoff_attempts.get(details['format']) if cutoff != 'None' else None
+    cells = '<td></td>' * 3
+    rows = ''.join(f'<tr class="cutoff"><td>{attempt}</td>{cells}</tr>' if within and attempt == within + 1
+                   else f'<tr><td>{attempt}</td>{cells}</tr>' for attempt in range(1, attempts + 1))
+    cutoff_note = (f'<p>Cutoff: {html.escape(cutoff)} in the first {"attempt" if within == 1 else "two attempts"}</p>'
+                   if within else '')
+    return (f'<div class="card"><strong>{html.escape(context.name)}</strong>'
+            f'<p>{html.escape(category)}, Round 1, Group {number}</p>'
+            f'<p>Competitor: {html.escape(competitor) if competitor else "_" * 30}</p>{cutoff_note}'
+            f'<table><tr><th>#</th><th>Result</th><th>Judge</th><th>Competitor</th></tr>{rows}</table></div>')
+
+def _render_scorecards(context, category, number):
+    rnd = context.first_rounds[category]
+    if context.assignment is not None:
+        members = context.groups[category].groups[number - 1]
+        names = sorted(context.competitors[member].name for member in members)
+    else:
+        # Blank cards for the group's share of the estimated competitors
+        groups = max(1, rnd.groups)
+        names = [''] * (rnd.competitors // groups + (number <= rnd.competitors % groups))
+    cards = [_scorecard(context, category, number, name, rnd.cutoff) for name in names]
+    sheets = ''.join(f'<div class="sheet">{"".join(cards[i:i + SCORECARDS_PER_PAGE])}</div>'
+                     for i in range(0, len(cards), SCORECARDS_PER_PAGE))
+    return _page(f'{category} group {number} scorecards', sheets)
+
+def _task_role(task):
+    return 'Competing' if task.role == 'competitor' else task.role.capitalize()
+
+def _render_tasks(context, people):
+    pages = []
+    for person in people:
+        rows = ''.join(f'<tr><td>Day {task.day}</td><td>{minutes_to_hhmm(task.start)} - {minutes_to_hhmm(task.end)}'
+                       f'</td><td>{html.escape(task.category)}</td><td>Group {task.group}</td>'
+                       f'<td>{_task_role(task)}</td></tr>' for task in context.sheets.get(person, ()))
+        pages.append(f'<div class="page"><h1>{html.escape(context.competitors[person].name)}</h1>'
+                     f'<h2>{html.escape(context.name or "Competition")}</h2>'
+                     f'<table><tr><th>Day</th><th>Time</th><th>Event</th><th>Group</th><th>Task</th></tr>'
+                     f'{rows}</table></div>')
+    return _page('Task sheets', ''.join(pages))
+
+def _render_tasks_csv(context):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(('person', 'name', 'day', 'start', 'end', 'event', 'group', 'task'))
+    for person, tasks in sorted(context.sheets.items()):
+        for task in tasks:
+            writer.writerow((person, context.competitors[person].name, task.day, minutes_to_hhmm(task.start),
+                             minutes_to_hhmm(task.end), task.category, task.group, _task_role(task)))
+    return out.getvalue()
+
+_RENDERERS = {
+    'schedule': _render_schedule,
+    'schedule_csv': _render_schedule_csv,
+    'groups': _render_groups,
+    'groups_csv': _render_groups_csv,
+    'scorecards': _render_scorecards,
+    'tasks': _render_tasks,
+    'tasks_csv': _render_tasks_csv,
+}
+
+def _render(spec, context=None):
+    _, kind, args = spec
+    return _RENDERERS[kind](context or _shared['context'], *args).encode('utf-8')
+
+def _render_chunk(specs):
+    return [_render(spec) for spec in specs]
+
+def _rendered(specs, initargs, workers):
+    """Rendered artifacts in order, from a bounded window of chunks in flight"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(specs) <= SMALL_BUNDLE:
+        context = _Context(*initargs)
+        for spec in specs:
+            yield _render(spec, context)
+        return
+    chunks = iter(lambda it=iter(specs): list(itertools.islice(it, CHUNKSIZE)), [])
+    # Spawned rather than forked: the page's server is multithreaded
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init,
+                             initargs=initargs) as pool:
+        pending = collections.deque(pool.submit(_render_chunk, chunk)
+                                    for chunk in itertools.islice(chunks, workers * WINDOW_PER_WORKER))
+        while pending:
+            results = pending.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(pool.submit(_render_chunk, chunk))
+            yield from results
+
+def write_bundle(path, plan, result, competitors=(), name='', workers=None, progress=None):
+    """
+    Render every artifact into a ZIP at path; progress(done, total) is called
+    after each one. The ZIP is written aside and moved into place when complete.
+    """
+    competitors = tuple(competitors)
+    assignment = assign_groups(competitors, plan.num_stations, result) if competitors else None
+    staff = assign_staff(competitors, assignment, plan.num_stations) \
+        if any(competitor.staff_roles for competitor in competitors) else None
+    initargs = (name, plan, result, competitors, assignment, staff)
+    specs = artifacts(plan, result, assignment, staff, competitors)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial = f'{path}.{threading.get_ident()}.partial'
+    try:
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            for done, (spec, data) in enumerate(zip(specs, _rendered(specs, initargs, workers)), start=1):
+                bundle.writestr(spec[0], data)
+                if progress:
+                    progress(done, len(specs))
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path
+
+
+class ExportJob:
+    """
+    A bundle written by a background thread; done and total count artifacts,
+    and error holds the exception if rendering failed
+    """
+
+    def __init__(self, path, plan, result, competitors=(), name='', workers=None):
+        self.path = path
+        self.done = 0
+        self.total = 0
+        self.error = None
+        if os.path.exists(path):
+            self._thread = None
+            return
+        self._thread = threading.Thread(target=self._run, args=(plan, result, competitors, name, workers),
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, plan, result, competitors, name, workers):
+        try:
+            write_bundle(self.path, plan, result, competitors, name, workers, self._progress)
+        except Exception as error:
+            self.error = error
+
+    def _progress(self, done, total):
+        self.done, self.total = done, total
+
+    @property
+    def finished(self):
+        return self._thread is None or not self._thread.is_alive()
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else float(self.finished)
+
+
+def prune_bundles(directory, keep=MAX_BUNDLES):
+    """Delete all but the keep most recently written bundles"""
+    try:
+        bundles = [entry for entry in os.scandir(directory) if entry.name.endswith('.zip')]
+    except OSError:
+        return
+    bundles.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in bundles[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    from .wcif import load_wcif
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('input', help="WCIF file of the competition")
+    parser.add_argument('--output', default='bundle.zip', help="ZIP file to write")
+    parser.add_argument('--main-event', default='3x3')
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    competition = load_wcif(args.input)
+    plan = estimate(competition.config(main_event=args.main_event))
+    result = schedule(plan)
+
+    def report(done, total):
+        if done == total or done % 100 == 0:
+            print(f"{done}/{total} artifacts", flush=True)
+
+    write_bundle(args.output, plan, result, competition.competitors, competition.name or competition.id,
+                 args.workers, report)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
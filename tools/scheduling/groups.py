@@ -0,0 +1,186 @@
+"""
+Assignment of registered competitors to the groups of every first round.
+
+Group counts come from calculate_groups_and_size with the actual number of
+registrations, and group sizes differ by at most one. Competitors are dealt
+into groups fastest first in snake order (1, 2, 3, 3, 2, 1, ...), so the
+fastest competitors are spread over the groups. When a schedule is given,
+each group gets its share of the round's slot, and nobody is put in a group
+that overlaps or directly follows a group they are already in; competitors
+with no other choice are placed anyway and reported as conflicts.
+
+Competitors are indexed per event once, and each placement only checks the
+few groups a competitor already has, so a registration list of thousands of
+competitors in all 17 events is assigned in a fraction of a second.
+"""
+from dataclasses import dataclass
+
+from .constants import categories
+from .estimation import calculate_groups_and_size
+
+# Minutes a competitor needs between two of their groups
+MIN_GAP = 1
+
+
+@dataclass(frozen=True, slots=True)
+class Competitor:
+    """A registered competitor; seed_times are (category, seconds) pairs, lower is faster"""
+    name: str
+    events: frozenset
+    seed_times: tuple = ()
+    # Staff roles the competitor volunteered for, see staff.py
+    staff_roles: frozenset = frozenset()
+
+
+@dataclass(frozen=True, slots=True)
+class EventGroups:
+    """
+    Groups of the first round of one event; groups hold competitor indices and
+    times the (start, end) minutes of each group on day, empty without a schedule
+    """
+    category: str
+    groups: tuple
+    times: tuple = ()
+    day: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class GroupAssignment:
+    """Groups of every event in schedule order, and the placements that could not avoid a clash"""
+    events: tuple
+    conflicts: tuple = ()
+
+    def by_competitor(self):
+        """Competitor index -> ((category, group number), ...) in schedule order"""
+        groups = {}
+        for event in self.events:
+            for number, members in enumerate(event.groups, start=1):
+                for competitor in members:
+                    groups.setdefault(competitor, []).append((event.category, number))
+        return {competitor: tuple(assigned) for competitor, assigned in groups.items()}
+
+
+def group_times(slot, num_groups):
+    """Split a round's slot evenly between its groups"""
+    length = (slot.end - slot.start) / num_groups
+    return tuple((slot.start + i * length, slot.start + (i + 1) * length) for i in range(num_groups))
+
+def _event_order(registered, result):
+    """Events with registrations, in the order their first rounds are scheduled"""
+    first_rounds = {}
+    if result is not None:
+        for slot in result.slots:
+            if slot.round == 1:
+                first_rounds.setdefault(slot.event, slot)
+    rank = {category: i for i, category in enumerate(categories)}
+    order = sorted(registered, key=lambda c: ((first_rounds[c].day, first_rounds[c].start) if c in first_rounds
+                                              else (float('inf'), 0), rank.get(c, len(rank))))
+    return order, first_rounds
+
+def _seeded_order(members, category, seeds):
+    """Competitor indices fastest first; unseeded competitors follow in registration order"""
+    return sorted(members, key=lambda i: (seeds[i].get(category, float('inf')), i))
+
+def _snake(position, num_groups):
+    cycle, index = divmod(position, num_groups)
+    return num_groups - 1 - index if cycle % 2 else index
+
+def assign_groups(competitors, num_stations, result=None):
+    """
+    Assign every competitor to one group of the first round of each of their events
+    result is the Schedule used for group times; without it no clashes are checked
+    """
+    registered = {}
+    for i, competitor in enumerate(competitors):
+        for category in competitor.events:
+            registered.setdefault(category, []).append(i)
+    seeds = [dict(competitor.seed_times) for competitor in competitors]
+    # (category, day, start, end) of the groups each competitor is in
+    busy = [[] for _ in competitors]
+    order, first_rounds = _event_order(registered, result)
+    num_groups = {category: max(1, calculate_groups_and_size(category, len(registered[category]), num_stations)[0])
+                  for category in order}
+    # Events with one group leave no choice, so their times are known before anyone is placed
+    for category in order:
+        if num_groups[category] == 1 and category in first_rounds:
+            slot = first_rounds[category]
+            for competitor in registered[category]:
+                busy[competitor].append((category, slot.day, slot.start, slot.end))
+
+    events = []
+    conflicts = []
+    for category in order:
+        members = _seeded_order(registered[category], category, seeds)
+        count = num_groups[category]
+        capacity = [len(members) // count + (g < len(members) % count) for g in range(count)]
+        slot = first_rounds.get(category)
+        times = group_times(slot, count) if slot else ()
+        if count == 1:
+            if times:
+                conflicts.extend((competitor, category) for competitor in members
+                                 if _clashes(busy[competitor], category, slot.day, times[0]))
+            events.append(EventGroups(category, (tuple(members),), tuple((round(a), round(b)) for a, b in times),
+                                      slot.day if slot else 0))
+            continue
+
+        # Bit g is set when group g clashes with the competitor's other groups
+        clash_masks = {competitor: sum(1 << g for g, interval in enumerate(times)
+                                       if _clashes(busy[competitor], category, slot.day, interval))
+                       for competitor in members} if times else dict.fromkeys(members, 0)
+
+        groups = [[] for _ in range(count)]
+        clashing = []
+        for position, competitor in enumerate(members):
+            preferred = _snake(position, count)
+            mask = clash_masks[competitor]
+            chosen = None
+            fallback = None
+            for offset in range(count):
+                g = (preferred + offset) % count
+                if len(groups[g]) >= capacity[g]:
+                    continue
+                if fallback is None:
+                    fallback = g
+                if not mask >> g & 1:
+                    chosen = g
+                    break
+            if chosen is None:
+                chosen = fallback
+                clashing.append((competitor, chosen))
+            groups[chosen].append(competitor)
+
+        for competitor, g in clashing:
+            if not _swap(groups, g, competitor, clash_masks):
+                conflicts.append((competitor, category))
+        if times:
+            for g, group in enumerate(groups):
+                for competitor in group:
+                    busy[competitor].append((category, slot.day, *times[g]))
+
+        events.append(EventGroups(category, tuple(tuple(group) for group in groups),
+                                  tuple((round(start), round(end)) for start, end in times),
+                                  slot.day if slot else 0))
+    return GroupAssignment(tuple(events), tuple(conflicts))
+
+def _clashes(busy, category, day, interval):
+    """Whether a group overlaps or directly follows another event's group in busy"""
+    start, end = interval
+    return any(busy_day == day and busy_category != category
+               and start < busy_end + MIN_GAP and busy_start < end + MIN_GAP
+               for busy_category, busy_day, busy_start, busy_end in busy)
+
+def _swap(groups, g, competitor, clash_masks):
+    """
+    Move a clashing competitor out of group g by swapping with someone in a
+    group they fit, who also fits group g; returns whether a swap was found
+    """
+    fits = ~clash_masks[competitor]
+    for h, group in enumerate(groups):
+        if h == g or not fits >> h & 1:
+            continue
+        for i, other in enumerate(group):
+            if not clash_masks[other] >> g & 1:
+                group[i] = competitor
+                groups[g][groups[g].index(competitor)] = other
+                return True
+    return False
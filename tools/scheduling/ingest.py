@@ -0,0 +1,239 @@
+"""
+Offline ingestion of the WCA results export into per-event participation rates.
+
+Streams WCA_export_Results.tsv in chunks, counting first-round results per
+competition and event, and distinct competitors per competition, then joins
+them with WCA_export_Competitions.tsv for country, state and year. The export
+lists each competition's results together, so a competition's distinct
+competitors are counted as soon as the next one starts, and only the people of
+the competition a chunk ends in are carried over. Competitions whose results
+turn up again later are recounted in a second pass over just their rows.
+Memory is bounded by the number of competitions and the chunk size rather than
+the size of the results file.
+
+An event's rate is its first-round participants over the competitors of the
+competitions that held it, the share of competitors who enter an event when it
+is offered, like registration_percentages.
+
+The output directory holds:
+    competition_events.parquet   one row per competition and event (the incremental base)
+    participation_rates.parquet  the lookup index by country, state, size bucket and year
+Competitions already in the base are skipped, so a new export only processes
+the competitions added since the last run.
+
+    python -m tools.scheduling.ingest path/to/WCA_export path/to/index
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .constants import registration_percentages
+
+# WCA event ids of the categories used by the scheduler
+WCA_EVENTS = {
+    '333': '3x3', '222': '2x2', '444': '4x4', '555': '5x5', '666': '6x6', '777': '7x7',
+    '333bf': '3BLD', '333oh': '3OH', '333fm': 'FMC', 'minx': 'Megaminx', 'pyram': 'Pyraminx',
+    'skewb': 'Skewb', 'sq1': 'Square-1', 'clock': 'Clock', '444bf': '4BLD', '555bf': '5BLD',
+    '333mbf': 'MBLD',
+}
+# Round types a competitor takes part in once per event: first round and combined first round
+FIRST_ROUND_TYPES = {'1', 'd'}
+
+SIZE_BUCKETS = (50, 100, 200, 400)
+SIZE_LABELS = ('1-50', '51-100', '101-200', '201-400', '400+')
+
+# Competitions needed before a group's rate is trusted over a broader one
+MIN_COMPETITIONS = 5
+
+CHUNKSIZE = 500_000
+
+BASE_FILE = 'competition_events.parquet'
+INDEX_FILE = 'participation_rates.parquet'
+
+
+def _snake_case(name):
+    """Exports have used both competitionId and competition_id style headers"""
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+def export_path(export_dir, table):
+    for name in (f'WCA_export_{table}.tsv', f'{table}.tsv', f'{table.lower()}.tsv'):
+        path = os.path.join(export_dir, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {table} table found in {export_dir}")
+
+def read_tsv(path, columns, **kwargs):
+    header = pd.read_csv(path, sep='\t', nrows=0).columns
+    usecols = [column for column in header if _snake_case(column) in columns]
+    reader = pd.read_csv(path, sep='\t', usecols=usecols, dtype=str, keep_default_na=False,
+                         quoting=3, **kwargs)
+    rename = lambda frame: frame.rename(columns=_snake_case)
+    if 'chunksize' in kwargs:
+        return (rename(chunk) for chunk in reader)
+    return rename(reader)
+
+def size_bucket(competitors):
+    """Label of the competition size bucket"""
+    return SIZE_LABELS[int(np.searchsorted(SIZE_BUCKETS, competitors))]
+
+def read_competitions(export_dir):
+    """Competition id -> country, state and year"""
+    competitions = read_tsv(export_path(export_dir, 'Competitions'),
+                             {'id', 'city_name', 'country_id', 'year', 'cancelled'})
+    if 'cancelled' in competitions:
+        competitions = competitions[competitions['cancelled'] != '1']
+    # Cities are written as "City, State" where a state is known
+    state = competitions['city_name'].str.rpartition(',')[2].str.strip()
+    competitions = competitions.assign(
+        state=state.where(competitions['city_name'].str.contains(','), ''),
+        year=competitions['year'].astype(int),
+    )
+    return competitions.set_index('id')[['country_id', 'state', 'year']]
+
+def _result_chunks(export_dir, skip_competitions=frozenset()):
+    """Chunks of the results table for the scheduler's events"""
+    for chunk in read_tsv(export_path(export_dir, 'Results'),
+                           {'competition_id', 'event_id', 'round_type_id', 'person_id'},
+                           chunksize=CHUNKSIZE):
+        chunk = chunk[chunk['event_id'].isin(WCA_EVENTS.keys())]
+        if skip_competitions:
+            chunk = chunk[~chunk['competition_id'].isin(skip_competitions)]
+        if not chunk.empty:
+            yield chunk
+
+def count_results(export_dir, skip_competitions=frozenset()):
+    """
+    Stream the results table and count, per competition, first-round results per
+    event and distinct competitors
+    Returns (event_counts, competitor_counts) as Series indexed by competition id
+    """
+    event_counts = []
+    competitors = {}
+    # Competitions whose results are not listed together, counted again at the end
+    scattered = set()
+    # People of the competition the last chunk ended in, which the next chunk may continue
+    carried = None
+    for chunk in _result_chunks(export_dir, skip_competitions):
+        first_rounds = chunk[chunk['round_type_id'].isin(FIRST_ROUND_TYPES)]
+        event_counts.append(first_rounds.groupby(['competition_id', 'event_id']).size())
+
+        people = chunk[['competition_id', 'person_id']]
+        if carried is not None:
+            people = pd.concat([carried, people])
+        ongoing = people['competition_id'] == people['competition_id'].iat[-1]
+        _count_competitors(people[~ongoing], competitors, scattered)
+        carried = people[ongoing].drop_duplicates()
+    if carried is not None:
+        _count_competitors(carried, competitors, scattered)
+    if scattered:
+        competitors.update(_count_scattered(export_dir, scattered).items())
+
+    if not event_counts:
+        empty = pd.Series(dtype='int64')
+        return empty, empty
+    event_counts = pd.concat(event_counts).groupby(level=[0, 1]).sum()
+    return event_counts, pd.Series(competitors, dtype='int64')
+
+def _count_competitors(people, competitors, scattered):
+    """Add the distinct people of finished competitions to competitors, noting those seen before in scattered"""
+    counts = people.drop_duplicates().groupby('competition_id').size()
+    scattered.update(competition for competition in counts.index if competition in competitors)
+    competitors.update(counts.items())
+
+def _count_scattered(export_dir, competitions):
+    """Distinct competitors of the given competitions, from a second pass over their results"""
+    people = [chunk.loc[chunk['competition_id'].isin(competitions), ['competition_id', 'person_id']]
+              .drop_duplicates() for chunk in _result_chunks(export_dir)]
+    return pd.concat(people).drop_duplicates().groupby('competition_id').size()
+
+def build_rows(event_counts, competitors, competitions):
+    """One row per competition and event with its participants and competitors"""
+    rows = event_counts.rename('participants').reset_index()
+    rows['event'] = rows['event_id'].map(WCA_EVENTS)
+    rows['competitors'] = rows['competition_id'].map(competitors)
+    rows = rows.join(competitions, on='competition_id', how='inner')
+    rows['size_bucket'] = [size_bucket(n) for n in rows['competitors']]
+    return rows[['competition_id', 'country_id', 'state', 'year', 'size_bucket', 'competitors',
+                 'event', 'participants']]
+
+def build_index(base):
+    """
+    Participation rate in percent per (country, state, size bucket, year, event), with
+    the competitors and number of the competitions that held the event
+    """
+    groups = ['country_id', 'state', 'size_bucket', 'year', 'event']
+    index = base.groupby(groups).agg(participants=('participants', 'sum'), competitors=('competitors', 'sum'),
+                                     competitions=('competition_id', 'count')).reset_index()
+    index['rate'] = (100 * index['participants'] / index['competitors']).round(2)
+    return index
+
+def ingest(export_dir, index_dir):
+    """
+    Add the competitions of an export that are not in the index yet
+    Returns the number of competitions added
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    base_path = os.path.join(index_dir, BASE_FILE)
+    base = pd.read_parquet(base_path) if os.path.exists(base_path) else None
+    processed = frozenset(base['competition_id']) if base is not None else frozenset()
+
+    event_counts, competitors = count_results(export_dir, processed)
+    if competitors.empty:
+        return 0
+    rows = build_rows(event_counts, competitors, read_competitions(export_dir))
+    base = rows if base is None else pd.concat([base, rows], ignore_index=True)
+    base.to_parquet(base_path, index=False)
+    build_index(base).to_parquet(os.path.join(index_dir, INDEX_FILE), index=False)
+    return rows['competition_id'].nunique()
+
+
+class ParticipationRates:
+    """Lookup of participation rates, falling back per event to broader groups with too few competitions"""
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def load(cls, index_dir):
+        return cls(pd.read_parquet(os.path.join(index_dir, INDEX_FILE)))
+
+    def _rates(self, rows):
+        """Pooled rate per event over the given index rows, for events held at enough competitions"""
+        totals = rows.groupby('event')[['participants', 'competitors', 'competitions']].sum()
+        totals = totals[totals['competitions'] >= MIN_COMPETITIONS]
+        return (100 * totals['participants'] / totals['competitors']).round(2).to_dict()
+
+    def lookup(self, country=None, state=None, competitors=None, year=None):
+        """
+        Registration percentage per category for the most specific matching group that
+        held it at MIN_COMPETITIONS competitions or more
+        Categories no group has enough data for keep the default registration_percentages
+        """
+        filters = [('country_id', country), ('state', state),
+                   ('size_bucket', size_bucket(competitors) if competitors else None), ('year', year)]
+        filters = [(column, value) for column, value in filters if value is not None]
+        # Drop the most specific filters first until an event has enough competitions
+        found = {}
+        for used in range(len(filters), -1, -1):
+            rows = self.index
+            for column, value in filters[:used]:
+                rows = rows[rows[column] == value]
+            for category, rate in self._rates(rows).items():
+                found.setdefault(category, rate)
+        return {category: found.get(category, default) for category, default in registration_percentages.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('export_dir', help="directory with the WCA export TSV files")
+    parser.add_argument('index_dir', help="directory for the Parquet index")
+    args = parser.parse_args(argv)
+    added = ingest(args.export_dir, args.index_dir)
+    print(f"Added {added} competitions to {args.index_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Timers and counters for the stages of a page run.
+
+A Recorder collects wall times per stage and named counters, and writes them
+as one JSON line per run. When instrumentation is off the page uses
+NULL_RECORDER instead, whose stage() returns a shared no-op context manager and
+whose count() does nothing, so the hooks can stay in place at almost no cost.
+
+    recorder = Recorder()
+    with recorder.stage('estimation'):
+        plan = estimate(config)
+    recorder.count('rounds', len(plan.rounds))
+    recorder.write_jsonl('timings.jsonl')
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager, nullcontext
+
+_NULL_CONTEXT = nullcontext()
+
+
+class Recorder:
+    """Stage timings in milliseconds and counters of one run"""
+    enabled = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.counters = {}
+        self.context = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # A stage entered more than once adds up
+            self.timings[name] = self.timings.get(name, 0) + (time.perf_counter() - started) * 1000
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def note(self, **values):
+        """Describe the run, e.g. with its competitor count"""
+        self.context.update(values)
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_record(self):
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total_ms': round(self.total_ms(), 3),
+            'stages': {name: round(ms, 3) for name, ms in self.timings.items()},
+            'counters': dict(self.counters),
+            **self.context,
+        }
+
+    def write_jsonl(self, path):
+        """Append the run as one JSON line"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.to_record()) + '\n')
+
+
+class _NullRecorder:
+    """Recorder used when instrumentation is off"""
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_CONTEXT
+
+    def count(self, name, amount=1):
+        pass
+
+    def note(self, **values):
+        pass
+
+
+NULL_RECORDER = _NullRecorder()
+
+
+@contextmanager
+def profile(sort='cumulative', limit=40):
+    """
+    cProfile the block; the yielded dict gets the formatted statistics under
+    'stats' when the block ends
+    """
+    captured = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield captured
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+        captured['stats'] = output.getvalue()
@@ -0,0 +1,165 @@
+"""
+Live rescheduling on the day from the actual times of the rounds already run.
+
+Rounds with recorded times keep them. Everything else is replayed around them
+in its planned order: a block starts at its announced time, or later if the
+block before it on its stage (or the previous round of its event) ends later,
+and rounds that have not started are not put before the current time. Lunch
+and prize giving are venue-wide as in the other schedulers, a day that would
+otherwise run past its lunch time without a break gets one, a break pushed
+past the end of its day is dropped, and rounds that no longer fit before the
+end of a day move to the start of the next day in the same order. The result
+changes as few start times as the drift allows, and moves() lists the rounds
+whose day or start changed.
+"""
+from dataclasses import dataclass
+
+from .constants import LUNCH_TIME, PRIZE_GIVING_TIME, MAX_DAY_LENGTH
+from .models import Schedule, ScheduleSlot
+from .scheduler import UNSCHEDULED_WARNINGS
+
+
+@dataclass(frozen=True, slots=True)
+class Move:
+    """A round whose day or start changed; delay is in minutes when the day did not change"""
+    event: str
+    round: int
+    stage: str
+    old_day: int
+    old_start: int
+    new_day: int
+    new_start: int
+
+    @property
+    def delay(self):
+        return self.new_start - self.old_start if self.new_day == self.old_day else None
+
+
+def _now(actuals):
+    """Latest recorded (day, minute)"""
+    return max(((day, end if end is not None else start) for day, start, end in actuals.values()),
+               default=(1, 0))
+
+def _after_recorded(start, intervals):
+    """
+    Earliest venue-wide start from start on: recorded rounds that had started by
+    then run to their end, whatever their place in the planned order
+    """
+    for round_start, round_end in intervals:
+        if round_start <= start < round_end:
+            start = round_end
+    return start
+
+def reschedule(plan, current, actuals, now=None):
+    """
+    Reschedule the rounds of a plan that have not started yet
+    current is the Schedule being run; actuals maps (event, round) to
+    (day, start, end) for rounds that have started, with end None while a round
+    is running; now is (day, minute) and defaults to the latest recorded time
+    """
+    now_day, now_minute = now or _now(actuals)
+    durations = {(slot.event, slot.round): slot.duration for slot in current.slots if not slot.is_break}
+    slots = []
+    finished_at = {}
+    recorded = {}
+    for slot in current.slots:
+        key = (slot.event, slot.round)
+        if not slot.is_break and key in actuals:
+            day, start, end = actuals[key]
+            if end is None:
+                # Still running: it ends as planned, or now if that is later
+                end = max(start + slot.duration, now_minute if day == now_day else 0)
+            slots.append(ScheduleSlot(day, start, end, slot.event, slot.round, slot.stage))
+            finished_at[key] = (day, end)
+            recorded.setdefault(day, []).append((start, end))
+
+    for intervals in recorded.values():
+        intervals.sort()
+    stages = {slot.stage for slot in current.slots if slot.stage}
+    warnings = []
+    carried = []
+    last_round_day = max((day for day, _ in finished_at.values()), default=0)
+    for day, (day_start, day_end) in enumerate(plan.days, start=1):
+        queue = carried + [slot for slot in current.slots if slot.day == day and slot.event != 'Prize Giving']
+        carried = []
+        # Rounds that have not started cannot start before now
+        earliest = now_minute if day == now_day else day_end if day < now_day else day_start
+        cursors = dict.fromkeys(stages or {''}, day_start)
+        lunch_time = day_start + (day_end - day_start) // 2
+        has_lunch = any(slot.event == 'Lunch Break' for slot in queue)
+
+        for i, slot in enumerate(queue):
+            key = (slot.event, slot.round)
+            if not slot.is_break and key in actuals:
+                actual_day, actual_end = finished_at[key]
+                if actual_day > day:
+                    # Ran on a later day, so everything after it did too
+                    carried = [later for later in queue[i:] if not later.is_break]
+                    break
+                if actual_day == day:
+                    for stage in ([slot.stage] if slot.stage else cursors):
+                        cursors[stage] = max(cursors[stage], actual_end)
+                continue
+
+            announced = slot.start if slot.day == day else day_start
+            if slot.is_break:
+                start = _after_recorded(max(announced, *cursors.values()), recorded.get(day, ()))
+                if start + slot.duration > day_end:
+                    # Pushed past the end of the day, so it is not held
+                    continue
+                slots.append(ScheduleSlot(day, start, start + slot.duration, slot.event))
+                cursors = dict.fromkeys(cursors, start + slot.duration)
+                continue
+
+            if not has_lunch and lunch_time <= max(cursors.values()) <= day_end - LUNCH_TIME:
+                lunch_start = _after_recorded(max(cursors.values()), recorded.get(day, ()))
+                slots.append(ScheduleSlot(day, lunch_start, lunch_start + LUNCH_TIME, 'Lunch Break'))
+                cursors = dict.fromkeys(cursors, lunch_start + LUNCH_TIME)
+                has_lunch = True
+
+            ready = cursors[slot.stage] if slot.stage else max(cursors.values())
+            previous_day, previous_end = finished_at.get((slot.event, slot.round - 1), (0, 0))
+            start = max(announced, ready, earliest, previous_end if previous_day == day else 0)
+            if previous_day > day or start + durations[key] > day_end:
+                # This round and the rest of the day's rounds move to the next day
+                carried = [later for later in queue[i:] if not later.is_break]
+                break
+            slots.append(ScheduleSlot(day, start, start + durations[key], slot.event, slot.round, slot.stage))
+            finished_at[key] = (day, start + durations[key])
+            for stage in ([slot.stage] if slot.stage else cursors):
+                cursors[stage] = start + durations[key]
+            last_round_day = max(last_round_day, day)
+
+        day_slots = [slot for slot in slots if slot.day == day and not slot.is_break]
+        if day_slots and max(slot.end for slot in day_slots) - day_start > MAX_DAY_LENGTH:
+            warnings.append(f"Day {day} is longer than recommended (9 hours). Consider removing some events or rounds.")
+
+    unscheduled = tuple(rnd for rnd in plan.rounds if (rnd.category, rnd.number) in
+                        {(slot.event, slot.round) for slot in carried} - actuals.keys())
+    if not unscheduled and last_round_day:
+        # Prize giving follows the last round, keeping its announced time if that is still later
+        planned = next((slot for slot in current.slots if slot.event == 'Prize Giving'), None)
+        day = last_round_day
+        end = max(slot.end for slot in slots if slot.day == day)
+        if planned is not None and planned.day > day:
+            day, end = planned.day, planned.start
+        elif planned is not None and planned.day == day:
+            end = max(end, planned.start)
+        if end + PRIZE_GIVING_TIME <= plan.days[day - 1][1]:
+            slots.append(ScheduleSlot(day, end, end + PRIZE_GIVING_TIME, 'Prize Giving'))
+
+    if unscheduled:
+        warnings.extend(UNSCHEDULED_WARNINGS)
+    slots.sort(key=lambda slot: (slot.day, slot.start, slot.stage))
+    return Schedule(tuple(slots), tuple(warnings), unscheduled)
+
+def moves(before, after):
+    """Rounds whose day or start differ between two schedules, in the order of the new one"""
+    planned = {(slot.event, slot.round): slot for slot in before.slots if not slot.is_break}
+    changed = []
+    for slot in after.slots:
+        old = planned.get((slot.event, slot.round))
+        if slot.is_break or old is None or (old.day, old.start) == (slot.day, slot.start):
+            continue
+        changed.append(Move(slot.event, slot.round, slot.stage, old.day, old.start, slot.day, slot.start))
+    return tuple(changed)
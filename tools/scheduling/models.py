@@ -0,0 +1,105 @@
+"""Compact value types passed between the estimation and scheduling stages"""
+from dataclasses import dataclass
+
+# Keys of a rounds_cutoffs settings dict that map onto Event fields
+SETTING_KEYS = ('rounds', 'cutoff', 'advance_r1', 'advance_r2', 'advance_r3', 'final_size')
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    """Organizer settings for one selected event"""
+    category: str
+    rounds: int = 1
+    cutoff: str = 'None'
+    advance_r1: int = 50
+    advance_r2: int = 50
+    advance_r3: int = 50
+    final_size: int = 8
+
+    @classmethod
+    def from_settings(cls, category, settings):
+        """Build an event from a rounds_cutoffs settings dict"""
+        return cls(category, **{key: settings[key] for key in SETTING_KEYS if key in settings})
+
+    def to_settings(self):
+        """Return the event as a rounds_cutoffs settings dict"""
+        return {key: getattr(self, key) for key in SETTING_KEYS}
+
+    def advance_percent(self, round_num):
+        """Percentage of competitors advancing out of the given round"""
+        return getattr(self, f'advance_r{round_num}', 75)
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Everything needed to estimate a competition"""
+    number_of_competitors: int
+    events: tuple = ()
+    num_days: int = 2
+    day_schedules: tuple = (('08:00', '18:00'),) * 2
+    main_event: str = '3x3'
+    # Overrides calculate_stations when set
+    num_stations: int = None
+    # (category, percentage) pairs overriding registration_percentages
+    registration_rates: tuple = ()
+    # (category, seconds per round type) pairs replacing DEFAULT_SOLVE_TIME, see priors.py
+    solve_times: tuple = ()
+    # (category, competitors) pairs of actual registrations, used as is for first rounds, see wcif.py
+    registrations: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Round:
+    """One estimated round; duration is in minutes"""
+    category: str
+    number: int
+    competitors: int
+    groups: int
+    group_size: int
+    duration: int
+    is_final: bool = False
+    cutoff: str = 'None'
+    # Expected seconds per attempt when there is no cutoff; None uses DEFAULT_SOLVE_TIME
+    solve_time: float = None
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    """Estimated rounds plus the day layout they have to be scheduled into"""
+    rounds: tuple
+    num_stations: int
+    days: tuple
+    main_event: str
+    warnings: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleSlot:
+    """One block of the schedule; start and end are minutes from midnight"""
+    day: int
+    start: int
+    end: int
+    event: str
+    round: int = 0
+    stage: str = ''
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    @property
+    def is_break(self):
+        """Registration, lunch and prize giving are not competition rounds"""
+        return self.round == 0
+
+
+@dataclass(frozen=True, slots=True)
+class Schedule:
+    """Result of scheduling a plan"""
+    slots: tuple
+    warnings: tuple = ()
+    unscheduled: tuple = ()
+
+    @property
+    def is_complete(self):
+        return not self.unscheduled
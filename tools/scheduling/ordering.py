@@ -0,0 +1,336 @@
+"""
+Competitor-aware ordering of rounds, as an alternative to order_rounds.
+
+Registrations are bitsets, one int per event with a bit per competitor, taken
+from a registration list or dealt at random to the estimated first-round
+counts. Two events share the popcount of their intersection, and later rounds
+are taken to keep their share of it, so rounds i and j share
+
+    shared(event i, event j) * competitors i / first round i * competitors j / first round j
+
+competitors (the later round's competitors for two rounds of one event). An
+order is scored in competitor-minutes:
+
+    BACK_TO_BACK_MINUTES per competitor in two consecutive rounds
+    SHORT_GAP_WEIGHT per competitor and minute that a round starts less than
+        MIN_ROUND_GAP after the end of the previous round of its event
+    a minute per competitor and minute between the starts of two rounds they
+        share, divided by the other events the average competitor is in
+
+so events with many competitors in common are drawn together, but not back to
+back. Starts follow from the order alone, each round after the one before, so
+days and breaks are left out of the score and the scheduler places them
+afterwards. Rounds of an event stay in order and the main event's final last.
+
+Simulated annealing swaps neighbouring rounds. A swap only moves the two
+rounds, so its change in score is computed from their own terms: each round
+keeps the sum of what it shares with the rounds before it, and every round
+before a pair moves equally far from both. A swap is evaluated in O(1), a few
+hundred thousand orderings a second. The search tries a fixed number of swaps
+from a seeded generator, so an order is reproducible, and the temperature
+falls geometrically from the typical change of a swap to near zero over them;
+the time budget only cuts the search short on a slow machine.
+
+    python -m tools.scheduling.ordering 300 3x3:3 2x2:2 4x4:2 3OH:2 Skewb --days 2
+"""
+import argparse
+import math
+import random
+import time
+from dataclasses import dataclass
+
+from .estimation import estimate
+from .models import Config, Event
+from .scheduler import order_rounds, schedule
+from .timeutils import minutes_to_hhmm
+
+# Competitor-minutes a competitor going straight from one round into the next costs
+BACK_TO_BACK_MINUTES = 60
+# Minutes between the end of a round and the next round of its event, to post
+# results and call the competitors advancing
+MIN_ROUND_GAP = 30
+SHORT_GAP_WEIGHT = 4
+# Swaps tried per search, and the seconds it may take at most
+MAX_SWAPS = 30000
+TIME_BUDGET = 1.0
+# How often the time budget is checked and the temperature lowered
+_CLOCK_EVERY = 256
+# Swaps sampled for the starting temperature, and the final one relative to it
+_SAMPLE_SWAPS = 200
+_FINAL_TEMPERATURE = 1e-3
+
+
+@dataclass(frozen=True, slots=True)
+class OrderScore:
+    """
+    Terms of an order's score: competitors in consecutive rounds, competitor-minutes
+    short of MIN_ROUND_GAP, and competitor-minutes between the starts of shared rounds
+    """
+    back_to_back: float
+    short_gaps: float
+    idle: float
+
+    @property
+    def total(self):
+        return BACK_TO_BACK_MINUTES * self.back_to_back + SHORT_GAP_WEIGHT * self.short_gaps + self.idle
+
+
+@dataclass(frozen=True, slots=True)
+class Ordering:
+    """Rounds in the order found, its score and that of order_rounds, and the swaps tried"""
+    rounds: tuple
+    score: OrderScore
+    initial: OrderScore
+    swaps: int
+    elapsed: float
+
+
+def _bitset(indices, size):
+    bits = bytearray((size + 7) // 8)
+    for i in indices:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+def registration_bitsets(competitors):
+    """category -> bitset of the indices of the competitors registered for it"""
+    registered = {}
+    for i, competitor in enumerate(competitors):
+        for category in competitor.events:
+            registered.setdefault(category, []).append(i)
+    return {category: _bitset(indices, len(competitors)) for category, indices in registered.items()}
+
+def estimated_bitsets(plan, number_of_competitors, seed=0):
+    """Bitsets of each event's estimated first-round competitors, dealt at random among number_of_competitors"""
+    rng = random.Random(seed)
+    population = range(max(1, number_of_competitors))
+    return {rnd.category: _bitset(rng.sample(population, min(rnd.competitors, len(population))), len(population))
+            for rnd in plan.rounds if rnd.number == 1}
+
+def co_registration(registrations):
+    """(category, category) -> competitors registered for both, for every pair of events"""
+    matrix = {}
+    for a, bits in registrations.items():
+        for b, other in registrations.items():
+            matrix[a, b] = (bits & other).bit_count()
+    return matrix
+
+
+class _Problem:
+    """Rounds of a plan with their shared competitors, indexed by position in order_rounds"""
+
+    def __init__(self, plan, registrations):
+        self.rounds = order_rounds(plan)
+        n = len(self.rounds)
+        self.durations = [rnd.duration for rnd in self.rounds]
+        self.categories = [rnd.category for rnd in self.rounds]
+        self.competitors = [rnd.competitors for rnd in self.rounds]
+        first = {rnd.category: rnd.competitors for rnd in self.rounds if rnd.number == 1}
+        share = [rnd.competitors / first[rnd.category] if first.get(rnd.category) else 0 for rnd in self.rounds]
+        matrix = co_registration(registrations)
+        self.shared = [[0.0] * n for _ in range(n)]
+        for i, a in enumerate(self.rounds):
+            for j, b in enumerate(self.rounds):
+                if i == j:
+                    continue
+                if a.category == b.category:
+                    self.shared[i][j] = min(a.competitors, b.competitors)
+                else:
+                    self.shared[i][j] = matrix.get((a.category, b.category), 0) * share[i] * share[j]
+        self.row_sums = [sum(row) for row in self.shared]
+        # The starts of a competitor's rounds are compared pairwise, which counts
+        # their idle time about once for every other event they are in
+        registered = sum(bits.bit_count() for bits in registrations.values())
+        everyone = 0
+        for bits in registrations.values():
+            everyone |= bits
+        self.idle_weight = 1 / max(1.0, registered / max(1, everyone.bit_count()) - 1)
+
+        # Previous and next round of the same event
+        self.previous = [-1] * n
+        self.next = [-1] * n
+        last = {}
+        for i, category in enumerate(self.categories):
+            if category in last:
+                self.previous[i] = last[category]
+                self.next[last[category]] = i
+            last[category] = i
+        # The main event's final is never moved
+        self.movable = n - 1 if n and self.rounds[-1].category == plan.main_event and self.rounds[-1].is_final else n
+
+    def starts(self, order):
+        starts = [0] * len(order)
+        time_at = 0
+        for i in order:
+            starts[i] = time_at
+            time_at += self.durations[i]
+        return starts
+
+    def short_gap(self, i, j, starts):
+        """Competitor-minutes that round j, the next of i's event, starts short of MIN_ROUND_GAP"""
+        gap = starts[j] - starts[i] - self.durations[i]
+        return self.competitors[j] * max(0, MIN_ROUND_GAP - gap)
+
+    def gaps_of(self, i, starts):
+        total = 0
+        if self.previous[i] >= 0:
+            total += self.short_gap(self.previous[i], i, starts)
+        if self.next[i] >= 0:
+            total += self.short_gap(i, self.next[i], starts)
+        return total
+
+    def score(self, order):
+        starts = self.starts(order)
+        back_to_back = sum(self.shared[a][b] for a, b in zip(order, order[1:]))
+        short_gaps = sum(self.short_gap(self.previous[i], i, starts) for i in order if self.previous[i] >= 0)
+        idle = self.idle_weight * sum(self.shared[i][j] * abs(starts[i] - starts[j])
+                                      for k, i in enumerate(order) for j in order[k + 1:])
+        return OrderScore(round(back_to_back, 1), round(short_gaps, 1), round(idle, 1))
+
+
+class _Annealer:
+    """An order being improved by swaps of neighbouring rounds, with what each swap needs kept up to date"""
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.order = list(range(len(problem.rounds)))
+        self.starts = problem.starts(self.order)
+        # Competitors each round shares with the rounds before it
+        self.before = [sum(problem.shared[i][j] for j in self.order[:k]) for k, i in enumerate(self.order)]
+
+    def _neighbours(self, k):
+        problem, order = self.problem, self.order
+        total = 0.0
+        if k > 0:
+            total += problem.shared[order[k - 1]][order[k]]
+        if k + 1 < len(order):
+            total += problem.shared[order[k]][order[k + 1]]
+        return total
+
+    def delta(self, k):
+        """Change in total score of swapping the rounds at k and k + 1, None if the swap is not allowed"""
+        problem, order, starts = self.problem, self.order, self.starts
+        a, b = order[k], order[k + 1]
+        if problem.categories[a] == problem.categories[b]:
+            return None
+        da, db = problem.durations[a], problem.durations[b]
+        shared = problem.shared[a][b]
+
+        # Rounds before the pair are db further from a and da closer to b, and the other way round after it
+        a_before = self.before[a]
+        a_after = problem.row_sums[a] - a_before - shared
+        b_before = self.before[b] - shared
+        b_after = problem.row_sums[b] - self.before[b]
+        idle = db * (a_before - a_after) + da * (b_after - b_before) + shared * (db - da)
+
+        # Only the pairs around k - 1 .. k + 2 change neighbours
+        old_pairs = (problem.shared[order[k - 1]][a] if k > 0 else 0) + \
+            (problem.shared[b][order[k + 2]] if k + 2 < len(order) else 0)
+        new_pairs = (problem.shared[order[k - 1]][b] if k > 0 else 0) + \
+            (problem.shared[a][order[k + 2]] if k + 2 < len(order) else 0)
+
+        old_gaps = problem.gaps_of(a, starts) + problem.gaps_of(b, starts)
+        start = starts[a]
+        starts[a], starts[b] = start + db, start
+        new_gaps = problem.gaps_of(a, starts) + problem.gaps_of(b, starts)
+        starts[a], starts[b] = start, start + da
+
+        return (BACK_TO_BACK_MINUTES * (new_pairs - old_pairs) + SHORT_GAP_WEIGHT * (new_gaps - old_gaps)
+                + problem.idle_weight * idle)
+
+    def swap(self, k):
+        problem, order, starts = self.problem, self.order, self.starts
+        a, b = order[k], order[k + 1]
+        order[k], order[k + 1] = b, a
+        starts[b] = starts[a]
+        starts[a] = starts[b] + problem.durations[b]
+        self.before[a] += problem.shared[a][b]
+        self.before[b] -= problem.shared[a][b]
+
+
+def optimize_order(plan, registrations, max_swaps=MAX_SWAPS, seed=0, time_budget=TIME_BUDGET):
+    """
+    Order plan's rounds by simulated annealing over max_swaps swaps, or for at most
+    time_budget seconds, and return an Ordering; registrations are category -> bitset,
+    see registration_bitsets and estimated_bitsets
+    """
+    started = time.perf_counter()
+    problem = _Problem(plan, registrations)
+    initial = problem.score(list(range(len(problem.rounds))))
+    annealer = _Annealer(problem)
+    positions = problem.movable - 1
+    if not any(annealer.delta(k) is not None for k in range(positions)):
+        return Ordering(tuple(problem.rounds), initial, initial, 0, time.perf_counter() - started)
+
+    rng = random.Random(seed)
+    sampled = [annealer.delta(rng.randrange(positions)) for _ in range(_SAMPLE_SWAPS)]
+    sampled = [abs(delta) for delta in sampled if delta]
+    start_temperature = sum(sampled) / len(sampled) if sampled else 1.0
+    temperature = start_temperature
+    deadline = started + time_budget
+
+    cost = best_cost = 0.0
+    best_order = annealer.order[:]
+    swaps = 0
+    for tried in range(max_swaps):
+        if tried % _CLOCK_EVERY == 0:
+            if time.perf_counter() >= deadline:
+                break
+            temperature = start_temperature * _FINAL_TEMPERATURE ** (tried / max_swaps)
+        k = rng.randrange(positions)
+        delta = annealer.delta(k)
+        if delta is None:
+            continue
+        swaps += 1
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            annealer.swap(k)
+            cost += delta
+            if cost < best_cost - 1e-6:
+                best_cost = cost
+                best_order = annealer.order[:]
+
+    return Ordering(tuple(problem.rounds[i] for i in best_order), problem.score(best_order), initial, swaps,
+                    time.perf_counter() - started)
+
+def schedule_ordered(plan, ordering, scheduler=schedule):
+    """
+    Schedule plan in ordering's order with scheduler (schedule or schedule_stages),
+    or in order_rounds' when that leaves fewer rounds unscheduled
+    """
+    result = scheduler(plan, order=ordering.rounds)
+    if result.unscheduled:
+        default = scheduler(plan)
+        if len(default.unscheduled) < len(result.unscheduled):
+            return default
+    return result
+
+
+def _event(argument):
+    category, _, rounds = argument.partition(':')
+    return Event(category, int(rounds or 1))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('competitors', type=int)
+    parser.add_argument('events', nargs='+', type=_event, help="category or category:rounds, e.g. 3x3:3")
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--swaps', type=int, default=MAX_SWAPS, help="swaps to try")
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET, help="seconds of search at most")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = Config(args.competitors, tuple(args.events), args.days, (('08:00', '18:00'),) * args.days,
+                    args.events[0].category)
+    plan = estimate(config)
+    ordering = optimize_order(plan, estimated_bitsets(plan, args.competitors, args.seed), args.swaps, args.seed,
+                              args.budget)
+    print(f"{ordering.swaps:,} swaps in {ordering.elapsed:.2f} s")
+    print("                   By round  Optimized")
+    for label, field in (('Back to back', 'back_to_back'), ('Short gaps', 'short_gaps'), ('Idle', 'idle')):
+        print(f"{label:<16} {getattr(ordering.initial, field):>10,.0f} {getattr(ordering.score, field):>10,.0f}")
+    for slot in schedule_ordered(plan, ordering).slots:
+        print(f"Day {slot.day} {minutes_to_hhmm(slot.start)} {slot.event}"
+              f"{f' Round {slot.round}' if slot.round else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Per-event solve-time priors from the WCA results export.
+
+Streams WCA_export_Results.tsv in chunks and adds every competitor's result
+(their average, or their best single where a round has no average) to a
+histogram per event and round type. The histograms use fixed log-spaced bins,
+so memory does not grow with the size of the export. Their quantiles by
+competitor percentile are saved as one float32 array of seconds:
+
+    solve_time_priors.npy   shape (events, round types, percentiles)
+
+The table is memory-mapped when loaded, so opening it costs nothing until a
+value is read.
+
+    python -m tools.scheduling.priors path/to/WCA_export path/to/index
+"""
+import argparse
+import os
+
+import numpy as np
+
+from .constants import fixed_time_categories
+from .ingest import WCA_EVENTS, CHUNKSIZE, export_path, read_tsv
+
+PRIORS_FILE = 'solve_time_priors.npy'
+
+# Axes of the table
+PRIOR_EVENTS = tuple(event_id for event_id, category in WCA_EVENTS.items()
+                     if category not in fixed_time_categories)
+PRIOR_CATEGORIES = tuple(WCA_EVENTS[event_id] for event_id in PRIOR_EVENTS)
+ROUND_TYPES = ('first', 'second', 'semi', 'final')
+PERCENTILES = np.arange(1, 100)
+
+# WCA round type ids: qualification and combined rounds count with the round they stand for;
+# B finals are left out
+ROUND_TYPE_INDEX = {'0': 0, 'h': 0, '1': 0, 'd': 0, '2': 1, 'e': 1, '3': 2, 'g': 2, 'c': 3, 'f': 3}
+
+# Histogram bins in centiseconds, about 0.5% wide from 0.5 seconds to an hour
+BIN_EDGES = np.geomspace(50, 360_000, 1793)
+# Results needed before the quantiles of an event and round type are trusted
+MIN_RESULTS = 100
+
+
+def round_type_index(round_num, num_rounds):
+    """Index into ROUND_TYPES of a round of an event with num_rounds rounds"""
+    if round_num == num_rounds and num_rounds > 1:
+        return 3
+    return min(round_num, 3) - 1
+
+def count_times(export_dir):
+    """
+    Stream the results table into histograms of competitor times
+    Returns counts of shape (events, round types, bins + 2), with the first and
+    last bins holding times outside BIN_EDGES
+    """
+    event_index = {event_id: i for i, event_id in enumerate(PRIOR_EVENTS)}
+    num_bins = len(BIN_EDGES) + 1
+    counts = np.zeros(len(PRIOR_EVENTS) * len(ROUND_TYPES) * num_bins, dtype=np.int64)
+    for chunk in read_tsv(export_path(export_dir, 'Results'),
+                           {'event_id', 'round_type_id', 'best', 'average'}, chunksize=CHUNKSIZE):
+        events = chunk['event_id'].map(event_index)
+        round_types = chunk['round_type_id'].map(ROUND_TYPE_INDEX)
+        average = chunk['average'].astype(np.int64)
+        # Negative values are DNF and DNS, zero means no result
+        times = np.where(average > 0, average, chunk['best'].astype(np.int64))
+        keep = events.notna().to_numpy() & round_types.notna().to_numpy() & (times > 0)
+        bins = np.searchsorted(BIN_EDGES, times[keep], side='right')
+        cells = (events[keep].to_numpy(dtype=np.int64) * len(ROUND_TYPES)
+                 + round_types[keep].to_numpy(dtype=np.int64))
+        counts += np.bincount(cells * num_bins + bins, minlength=counts.size)
+    return counts.reshape(len(PRIOR_EVENTS), len(ROUND_TYPES), num_bins)
+
+def quantiles(counts):
+    """
+    Seconds at each of PERCENTILES per histogram row, NaN for rows with fewer
+    than MIN_RESULTS results; times are placed at the geometric middle of their bin
+    """
+    edges = np.concatenate(([BIN_EDGES[0]], BIN_EDGES, [BIN_EDGES[-1]]))
+    middles = np.sqrt(edges[:-1] * edges[1:]) / 100
+    cumulative = np.cumsum(counts, axis=-1)
+    totals = cumulative[..., -1:]
+    targets = totals * (PERCENTILES / 100)
+    table = np.empty(counts.shape[:-1] + (len(PERCENTILES),), dtype=np.float32)
+    for index in np.ndindex(counts.shape[:-1]):
+        table[index] = middles[np.searchsorted(cumulative[index], targets[index])]
+    table[(totals[..., 0] < MIN_RESULTS)] = np.nan
+    return table
+
+def build_priors(export_dir, index_dir):
+    """Build the priors table from an export; returns the number of results counted"""
+    counts = count_times(export_dir)
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, PRIORS_FILE), quantiles(counts))
+    return int(counts.sum())
+
+
+class SolveTimePriors:
+    """Lookup of historical solve times, falling back to earlier round types without enough data"""
+
+    def __init__(self, table):
+        self.table = table
+        self.category_index = {category: i for i, category in enumerate(PRIOR_CATEGORIES)}
+
+    @classmethod
+    def load(cls, index_dir):
+        table = np.load(os.path.join(index_dir, PRIORS_FILE), mmap_mode='r')
+        expected = (len(PRIOR_CATEGORIES), len(ROUND_TYPES), len(PERCENTILES))
+        if table.shape != expected:
+            raise ValueError(f"{PRIORS_FILE} has shape {table.shape}, expected {expected}; rebuild it")
+        return cls(table)
+
+    def quantile(self, category, round_type, percentile):
+        """Seconds of the competitor at a percentile (1-99, fastest first), or None"""
+        i = self.category_index.get(category)
+        if i is None:
+            return None
+        for r in range(round_type, -1, -1):
+            value = self.table[i, r, percentile - 1]
+            if not np.isnan(value):
+                return float(value)
+        return None
+
+    def mean_solve_time(self, category, round_type):
+        """Average time of the field of a round type, or None"""
+        i = self.category_index.get(category)
+        if i is None:
+            return None
+        for r in range(round_type, -1, -1):
+            row = self.table[i, r]
+            if not np.isnan(row[0]):
+                return round(float(np.mean(row)), 1)
+        return None
+
+    def solve_times(self, categories):
+        """
+        (category, per-round-type seconds) pairs for Config.solve_times, skipping
+        categories without data
+        """
+        pairs = []
+        for category in categories:
+            times = tuple(self.mean_solve_time(category, r) for r in range(len(ROUND_TYPES)))
+            if times[0] is not None:
+                pairs.append((category, times))
+        return tuple(pairs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('export_dir', help="directory with the WCA export TSV files")
+    parser.add_argument('index_dir', help="directory for the priors table")
+    args = parser.parse_args(argv)
+    counted = build_priors(args.export_dir, args.index_dir)
+    print(f"Counted {counted} results into {os.path.join(args.index_dir, PRIORS_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
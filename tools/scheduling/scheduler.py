@@ -0,0 +1,81 @@
+"""Pure day-by-day scheduling of estimated rounds"""
+from .constants import REGISTRATION_TIME, LUNCH_TIME, PRIZE_GIVING_TIME, MAX_DAY_LENGTH
+from .models import Schedule, ScheduleSlot
+
+UNSCHEDULED_WARNINGS = (
+    "Not all events could be scheduled. Consider:",
+    "- Removing some events",
+    "- Adding more days",
+    "- Reducing number of rounds",
+    "- Adjusting cutoffs to reduce round durations",
+)
+
+
+def order_rounds(plan):
+    """
+    Order rounds for scheduling: all first rounds, then all second rounds and so on
+    for any number of rounds, with the main event's final saved for last
+    """
+    def key(rnd):
+        is_main_final = rnd.category == plan.main_event and rnd.is_final
+        return is_main_final, rnd.number
+    return sorted(plan.rounds, key=key)
+
+def schedule(plan, order=None):
+    """
+    Schedule all competition rounds of a plan across its days
+    order is the rounds in the order to schedule them, order_rounds' by default
+    """
+    warnings = []
+    slots = []
+    events_to_schedule = list(order or order_rounds(plan))
+    num_days = len(plan.days)
+    current_event_index = 0
+    
+    for day, (day_start, day_end) in enumerate(plan.days, start=1):
+        current_time = day_start
+        
+        # Add registration period for day 1
+        if day == 1:
+            slots.append(ScheduleSlot(day, current_time, current_time + REGISTRATION_TIME, 'Registration'))
+            current_time += REGISTRATION_TIME
+        
+        # Calculate lunch break time (halfway through the day)
+        lunch_time = day_start + (day_end - day_start) // 2
+        lunch_added = False
+        
+        # Schedule events for the day
+        while current_event_index < len(events_to_schedule) and current_time < day_end:
+            # Check if it's time for lunch break
+            if not lunch_added and current_time >= lunch_time:
+                slots.append(ScheduleSlot(day, current_time, current_time + LUNCH_TIME, 'Lunch Break'))
+                current_time += LUNCH_TIME
+                lunch_added = True
+                continue
+            
+            event = events_to_schedule[current_event_index]
+            
+            # Check if event can fit in remaining time
+            if current_time + event.duration <= day_end:
+                slots.append(ScheduleSlot(day, current_time, current_time + event.duration,
+                                          event.category, event.number))
+                current_time += event.duration
+                current_event_index += 1
+            else:
+                break
+        
+        # Add prize giving on last day if all events are scheduled
+        if day == num_days and current_event_index >= len(events_to_schedule):
+            if current_time + PRIZE_GIVING_TIME <= day_end:
+                slots.append(ScheduleSlot(day, current_time, current_time + PRIZE_GIVING_TIME, 'Prize Giving'))
+        
+        # Check if day is too long
+        if current_time - day_start > MAX_DAY_LENGTH:
+            warnings.append(f"Day {day} is longer than recommended (9 hours). Consider removing some events or rounds.")
+    
+    # Check for unscheduled events
+    unscheduled = tuple(events_to_schedule[current_event_index:])
+    if unscheduled:
+        warnings.extend(UNSCHEDULED_WARNINGS)
+    
+    return Schedule(tuple(slots), tuple(warnings), unscheduled)
@@ -0,0 +1,150 @@
+"""
+Monte Carlo overrun analysis of a generated schedule.
+
+Each replication samples every event's first-round turnout around the
+estimate, like a binomial draw at the event's registration rate; later rounds
+other than the final keep the same share of that turnout, as the same
+advancement percentages apply, and finals are fixed. Per round, the average
+solve and scramble times are sampled around the values calculate_round_time
+assumes. The schedule is then replayed: a block starts at
+its planned time or when the previous block on its stage ends, whichever is
+later, and venue-wide blocks (registration, lunch, prize giving) wait for every
+stage. All replications are computed together as NumPy arrays, one schedule
+slot at a time.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .constants import (registration_percentages, event_details, fixed_time_categories,
+                        DEFAULT_SOLVE_TIME, FIXED_ROUND_TIME, RESERVED_STATIONS)
+from .timeutils import parse_cutoff
+
+# Coefficients of variation of the sampled times
+SOLVE_TIME_CV = 0.2
+SCRAMBLE_TIME_CV = 0.25
+FIXED_TIME_CV = 0.05
+
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass(frozen=True, slots=True)
+class DayRisk:
+    """Simulated end of a day in minutes from midnight"""
+    day: int
+    planned_end: int
+    venue_close: int
+    p50: int
+    p90: int
+    p99: int
+    overrun_probability: float
+
+
+@dataclass(frozen=True, slots=True)
+class RoundRisk:
+    """Simulated end of a round in minutes from midnight"""
+    day: int
+    event: str
+    round: int
+    stage: str
+    planned_end: int
+    p50: int
+    p90: int
+    p99: int
+
+
+@dataclass(frozen=True, slots=True)
+class SimulationResult:
+    replications: int
+    days: tuple
+    rounds: tuple
+
+
+def _lognormal(rng, mean, cv, size):
+    """Lognormal samples with the given mean and coefficient of variation"""
+    sigma = np.sqrt(np.log1p(cv ** 2))
+    return mean * rng.lognormal(-sigma ** 2 / 2, sigma, size)
+
+def _sample_turnout(rng, plan, rates, replications):
+    """Category -> sampled first-round competitors, a binomial spread at the event's registration rate"""
+    turnout = {}
+    for rnd in plan.rounds:
+        if rnd.number == 1 and rnd.category not in fixed_time_categories:
+            share = min(1.0, rates.get(rnd.category, registration_percentages[rnd.category]) / 100)
+            spread = np.sqrt(rnd.competitors * (1 - share))
+            turnout[rnd.category] = np.maximum(1, rng.normal(rnd.competitors, spread, replications))
+    return turnout
+
+def _sample_durations(rng, rnd, first_round, turnout, stations, replications):
+    """Sampled round lengths in minutes; first_round is the event's estimated first round"""
+    if rnd.category in fixed_time_categories:
+        return _lognormal(rng, FIXED_ROUND_TIME, FIXED_TIME_CV, replications)
+
+    # Later rounds other than the final advance the same share of the sampled turnout
+    competitors = np.full(replications, float(rnd.competitors))
+    if not rnd.is_final and rnd.category in turnout:
+        competitors = np.maximum(1, np.rint(turnout[rnd.category] * rnd.competitors / first_round.competitors))
+
+    details = event_details[rnd.category]
+    cutoff_seconds = parse_cutoff(rnd.cutoff)
+    if cutoff_seconds is not None:
+        solving_time = cutoff_seconds * (0.7 if rnd.number == 1 else 0.6)
+    else:
+        solving_time = rnd.solve_time or DEFAULT_SOLVE_TIME
+    solve = _lognormal(rng, solving_time, SOLVE_TIME_CV, replications)
+    scramble = _lognormal(rng, details['scramble_time'], SCRAMBLE_TIME_CV, replications) \
+        if details['scramble_time'] else 0
+    total_seconds = (solve + scramble) * details['attempts'] * competitors / (stations - RESERVED_STATIONS)
+    return total_seconds / 60
+
+def _quantiles(values):
+    return tuple(int(round(q)) for q in np.percentile(values, PERCENTILES))
+
+def simulate(plan, result, replications=10000, stages=None, seed=None, registration_rates=()):
+    """
+    Replay a schedule of a plan many times with sampled round lengths
+    stages gives the Stage objects of a parallel schedule, for their station counts,
+    and registration_rates the (category, percentage) pairs the plan was estimated with
+    """
+    rng = np.random.default_rng(seed)
+    rounds = {(r.category, r.number): r for r in plan.rounds}
+    turnout = _sample_turnout(rng, plan, dict(registration_rates), replications)
+    stations = {stage.name: stage.stations for stage in stages or ()}
+
+    day_risks = []
+    round_risks = []
+    for day, (_, venue_close) in enumerate(plan.days, start=1):
+        slots = [slot for slot in result.slots if slot.day == day]
+        if not slots:
+            continue
+        venue_ready = np.zeros(replications)
+        free_at = {}
+        day_end = np.zeros(replications)
+        for slot in slots:
+            if slot.stage:
+                ready = free_at.get(slot.stage, venue_ready)
+            else:
+                # Venue-wide blocks, and every block of a single-stage schedule, wait for every stage
+                ready = np.maximum.reduce([venue_ready, *free_at.values()])
+            start = np.maximum(slot.start, ready)
+
+            rnd = rounds.get((slot.event, slot.round))
+            if slot.is_break or rnd is None:
+                end = start + slot.duration
+            else:
+                end = start + _sample_durations(rng, rnd, rounds[(rnd.category, 1)], turnout,
+                                                stations.get(slot.stage, plan.num_stations), replications)
+                round_risks.append(RoundRisk(day, slot.event, slot.round, slot.stage, slot.end,
+                                             *_quantiles(end)))
+
+            if slot.stage:
+                free_at[slot.stage] = end
+            else:
+                venue_ready = end
+                free_at = {}
+            day_end = np.maximum(day_end, end)
+
+        planned_end = max(slot.end for slot in slots)
+        day_risks.append(DayRisk(day, planned_end, venue_close, *_quantiles(day_end),
+                                 float(np.mean(day_end > venue_close))))
+    return SimulationResult(replications, tuple(day_risks), tuple(round_risks))
@@ -0,0 +1,226 @@
+"""
+Exact multi-day packing of rounds, as an alternative to the greedy first-fit.
+
+Every day is split by lunch into a morning and an afternoon session. Lunch
+starts when the morning rounds end, but not before the lunch window opens, and
+the morning has to end before the window closes; a day without an afternoon
+has to end before the window opens. Rounds are assigned to
+sessions by a depth-first branch and bound that keeps rounds of the same event
+in order and the main event's final last. Because the finish time of a day only
+depends on how many minutes each of its sessions holds, states with the same
+session loads are explored once.
+
+The objective is the earliest finish under these lunch rules: fewest days
+first, then the earliest end of prize giving on the last day. The greedy
+scheduler breaks for lunch after whichever round passes midday instead, so it
+can finish earlier than the solver on the same plan.
+"""
+import time
+from dataclasses import dataclass
+
+from .constants import (REGISTRATION_TIME, LUNCH_TIME, PRIZE_GIVING_TIME, MAX_DAY_LENGTH,
+                        LUNCH_WINDOW_BEFORE, LUNCH_WINDOW_AFTER)
+from .models import Schedule, ScheduleSlot
+from .scheduler import schedule as greedy_schedule
+
+# How often the time budget is checked
+_CLOCK_EVERY = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class SolveResult:
+    """Schedule found by the solver and how it was found"""
+    schedule: Schedule
+    optimal: bool
+    fallback: bool
+    nodes: int
+    elapsed: float
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class _Search:
+    """Branch and bound over (round -> session) assignments"""
+
+    def __init__(self, plan, time_budget):
+        self.rounds = sorted(plan.rounds, key=lambda r: (r.category == plan.main_event and r.is_final,
+                                                         r.number, -r.duration))
+        self.main_final = bool(self.rounds) and self.rounds[-1].category == plan.main_event \
+            and self.rounds[-1].is_final
+        self.days = []
+        for day, (day_start, day_end) in enumerate(plan.days):
+            registration = REGISTRATION_TIME if day == 0 else 0
+            middle = day_start + (day_end - day_start) // 2
+            self.days.append((day_start, day_end, registration,
+                              middle - LUNCH_WINDOW_BEFORE, middle + LUNCH_WINDOW_AFTER))
+        self.num_sessions = 2 * len(self.days)
+
+        self.suffix = [0] * (len(self.rounds) + 1)
+        for i in range(len(self.rounds) - 1, -1, -1):
+            self.suffix[i] = self.suffix[i + 1] + self.rounds[i].duration
+        last_index = {}
+        for i, rnd in enumerate(self.rounds):
+            last_index[rnd.category] = i
+        self.last_index = last_index
+
+        self.deadline = time.perf_counter() + time_budget
+        self.nodes = 0
+        self.best_key = None
+        self.best_assignment = None
+        self.seen = set()
+
+    def day_finish(self, day, morning, afternoon, prize):
+        """End of the day for the given session loads, or None if they do not fit"""
+        day_start, day_end, registration, window_start, window_end = self.days[day]
+        morning_end = day_start + registration + morning
+        if morning and morning_end > window_end:
+            return None
+        if afternoon:
+            finish = max(morning_end, window_start) + LUNCH_TIME + afternoon + prize
+        else:
+            finish = morning_end + prize
+        return finish if finish <= day_end else None
+
+    def has_lunch(self, day, loads):
+        """A day whose rounds run into the lunch window needs an afternoon after lunch"""
+        day_start, _, registration, window_start, _ = self.days[day]
+        morning, afternoon = loads[2 * day], loads[2 * day + 1]
+        return afternoon > 0 or day_start + registration + morning <= window_start
+
+    def free_minutes(self, day, loads):
+        """Upper bound on the minutes of rounds a day can still take"""
+        day_start, day_end, registration, window_start, _ = self.days[day]
+        morning, afternoon = loads[2 * day], loads[2 * day + 1]
+        morning_end = day_start + registration + morning
+        with_lunch = day_end - morning_end - LUNCH_TIME - afternoon
+        if afternoon:
+            return with_lunch
+        # A day can also skip lunch if it ends before the lunch window opens
+        return max(with_lunch, window_start - morning_end)
+
+    def earliest_finish(self, day, loads, extra):
+        """Earliest end of prize giving if a day takes extra more minutes of rounds"""
+        day_start, _, registration, window_start, _ = self.days[day]
+        morning, afternoon = loads[2 * day], loads[2 * day + 1]
+        content_end = day_start + registration + morning + afternoon + extra
+        if afternoon or content_end > window_start:
+            content_end = max(content_end, window_start) + LUNCH_TIME
+        return content_end + PRIZE_GIVING_TIME
+
+    def lower_bound(self, loads, remaining, last_day):
+        """Earliest (day, finish) any completion of this state could reach"""
+        need = remaining
+        for day in range(last_day):
+            need -= max(0, self.free_minutes(day, loads))
+        for day in range(last_day, len(self.days)):
+            free = self.free_minutes(day, loads) - PRIZE_GIVING_TIME
+            if need <= free:
+                return day, self.earliest_finish(day, loads, max(0, need))
+            need -= max(0, self.free_minutes(day, loads))
+        return None
+
+    def run(self):
+        loads = [0] * self.num_sessions
+        self.search(0, loads, {}, [0] * len(self.rounds))
+
+    def search(self, i, loads, last_session, assignment):
+        self.nodes += 1
+        if self.nodes % _CLOCK_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise _BudgetExceeded
+
+        used = [s for s in range(self.num_sessions) if loads[s]]
+        last_day = used[-1] // 2 if used else 0
+
+        if i == len(self.rounds):
+            if not all(self.has_lunch(day, loads) for day in range(last_day + 1)):
+                return
+            finish = self.day_finish(last_day, loads[2 * last_day], loads[2 * last_day + 1], PRIZE_GIVING_TIME)
+            if finish is not None and (self.best_key is None or (last_day, finish) < self.best_key):
+                self.best_key = (last_day, finish)
+                self.best_assignment = list(assignment)
+            return
+
+        bound = self.lower_bound(loads, self.suffix[i], last_day)
+        if bound is None or (self.best_key is not None and bound >= self.best_key):
+            return
+
+        key = (i, tuple(loads), tuple(sorted((c, s) for c, s in last_session.items() if self.last_index[c] >= i)))
+        if key in self.seen:
+            return
+        self.seen.add(key)
+
+        rnd = self.rounds[i]
+        first_session = last_session.get(rnd.category, 0)
+        if self.main_final and i == len(self.rounds) - 1:
+            # The main event final closes the competition
+            first_session = max(first_session, used[-1] if used else 0)
+
+        previous = last_session.get(rnd.category)
+        for session in range(first_session, self.num_sessions):
+            day = session // 2
+            loads[session] += rnd.duration
+            if self.day_finish(day, loads[2 * day], loads[2 * day + 1], 0) is not None:
+                last_session[rnd.category] = session
+                assignment[i] = session
+                self.search(i + 1, loads, last_session, assignment)
+            loads[session] -= rnd.duration
+        if previous is None:
+            last_session.pop(rnd.category, None)
+        else:
+            last_session[rnd.category] = previous
+
+    def build_schedule(self):
+        """Turn the best assignment into schedule slots"""
+        sessions = [[] for _ in range(self.num_sessions)]
+        for rnd, session in zip(self.rounds, self.best_assignment):
+            sessions[session].append(rnd)
+        last_day = self.best_key[0]
+
+        slots = []
+        warnings = []
+        for day in range(last_day + 1):
+            day_start, _, registration, window_start, _ = self.days[day]
+            current_time = day_start
+            if registration:
+                slots.append(ScheduleSlot(day + 1, current_time, current_time + registration, 'Registration'))
+                current_time += registration
+            morning, afternoon = sessions[2 * day], sessions[2 * day + 1]
+            for rnd in morning:
+                slots.append(ScheduleSlot(day + 1, current_time, current_time + rnd.duration,
+                                          rnd.category, rnd.number))
+                current_time += rnd.duration
+            if afternoon:
+                current_time = max(current_time, window_start)
+                slots.append(ScheduleSlot(day + 1, current_time, current_time + LUNCH_TIME, 'Lunch Break'))
+                current_time += LUNCH_TIME
+            for rnd in afternoon:
+                slots.append(ScheduleSlot(day + 1, current_time, current_time + rnd.duration,
+                                          rnd.category, rnd.number))
+                current_time += rnd.duration
+            if day == last_day:
+                slots.append(ScheduleSlot(day + 1, current_time, current_time + PRIZE_GIVING_TIME, 'Prize Giving'))
+            if current_time - day_start > MAX_DAY_LENGTH:
+                warnings.append(f"Day {day + 1} is longer than recommended (9 hours). Consider removing some events or rounds.")
+        return Schedule(tuple(slots), tuple(warnings))
+
+
+def solve(plan, time_budget=1.0):
+    """
+    Find the earliest-finishing packing of a plan's rounds into its days
+    Falls back to the greedy schedule if no packing is found within time_budget seconds
+    """
+    started = time.perf_counter()
+    search = _Search(plan, time_budget)
+    optimal = True
+    try:
+        search.run()
+    except _BudgetExceeded:
+        optimal = False
+    elapsed = time.perf_counter() - started
+
+    if search.best_assignment is not None:
+        return SolveResult(search.build_schedule(), optimal, False, search.nodes, elapsed)
+
+    return SolveResult(greedy_schedule(plan), False, True, search.nodes, elapsed)
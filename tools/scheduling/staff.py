@@ -0,0 +1,126 @@
+"""
+Staff assignment: judges, scramblers and runners for every group.
+
+Each group needs a judge per station in use and scramblers and runners per
+few stations. Staff are picked only from people who volunteered for the role
+and are free for the whole group: not competing in it or in any group that
+overlaps it, and not already staffing an overlapping group. Among those, the
+people with the fewest minutes of staff work so far are picked, so the work is
+spread evenly.
+
+Groups are numbered in time order, and every person's competing and staffing
+groups are kept as integer bitsets. Each group's overlapping groups are
+precomputed as a bitset too, so checking whether someone is free is a single
+AND however many groups there are.
+"""
+import heapq
+import math
+from dataclasses import dataclass
+
+from .constants import RESERVED_STATIONS
+
+ROLES = ('scrambler', 'runner', 'judge')
+STATIONS_PER_SCRAMBLER = 8
+STATIONS_PER_RUNNER = 8
+
+
+@dataclass(frozen=True, slots=True)
+class Task:
+    """One entry of a task sheet; role is 'competitor' for a person's own groups"""
+    person: int
+    day: int
+    start: int
+    end: int
+    category: str
+    group: int
+    role: str
+
+
+@dataclass(frozen=True, slots=True)
+class StaffAssignment:
+    """Staff tasks in time order, and the (category, group, role, missing) staff that could not be found"""
+    tasks: tuple
+    shortfalls: tuple = ()
+
+    def workload(self):
+        """Person -> minutes of staff work"""
+        minutes = {}
+        for task in self.tasks:
+            minutes[task.person] = minutes.get(task.person, 0) + task.end - task.start
+        return minutes
+
+
+def staff_needed(group_size, num_stations):
+    """(role, count) pairs needed to run a group"""
+    stations = max(1, min(group_size, num_stations - RESERVED_STATIONS))
+    return (('scrambler', math.ceil(stations / STATIONS_PER_SCRAMBLER)),
+            ('runner', math.ceil(stations / STATIONS_PER_RUNNER)),
+            ('judge', stations))
+
+def _groups(assignment):
+    """
+    (category, group number, day, start, end, members) of every group in time
+    order; groups of events that are not scheduled have no time and are left out
+    """
+    groups = []
+    for event in assignment.events:
+        for number, (members, (start, end)) in enumerate(zip(event.groups, event.times), start=1):
+            groups.append((event.category, number, event.day, start, end, members))
+    groups.sort(key=lambda group: (group[2], group[3], group[1]))
+    return groups
+
+def _overlap_masks(groups):
+    """Bitset per group of the groups running at the same time, itself included"""
+    masks = []
+    for j, (_, _, day, start, end, _) in enumerate(groups):
+        mask = 1 << j
+        for i, (_, _, other_day, other_start, other_end, _) in enumerate(groups):
+            if other_day == day and other_start < end and start < other_end:
+                mask |= 1 << i
+        masks.append(mask)
+    return masks
+
+def assign_staff(competitors, assignment, num_stations):
+    """
+    Staff every group of a GroupAssignment from the competitors' volunteered staff_roles
+    competitors may include staff who do not compete (with no events)
+    """
+    groups = _groups(assignment)
+    overlaps = _overlap_masks(groups)
+    competing = [0] * len(competitors)
+    for j, group in enumerate(groups):
+        for person in group[5]:
+            competing[person] |= 1 << j
+    volunteers = {role: [p for p, competitor in enumerate(competitors) if role in competitor.staff_roles]
+                  for role in ROLES}
+
+    busy = list(competing)
+    load = [0] * len(competitors)
+    tasks = []
+    shortfalls = []
+    for j, (category, number, day, start, end, members) in enumerate(groups):
+        duration = max(1, end - start)
+        for role, needed in staff_needed(len(members), num_stations):
+            available = [p for p in volunteers[role] if not busy[p] & overlaps[j]]
+            picked = heapq.nsmallest(needed, available, key=lambda p: (load[p], p))
+            for person in picked:
+                busy[person] |= 1 << j
+                load[person] += duration
+                tasks.append(Task(person, day, start, end, category, number, role))
+            if len(picked) < needed:
+                shortfalls.append((category, number, role, needed - len(picked)))
+    return StaffAssignment(tuple(tasks), tuple(shortfalls))
+
+def task_sheets(competitors, assignment, staff):
+    """
+    Person index -> their competing groups and staff tasks in time order, for
+    everyone with at least one; indexed rather than named, as names can repeat
+    """
+    entries = [[] for _ in competitors]
+    for category, number, day, start, end, members in _groups(assignment):
+        for person in members:
+            entries[person].append(Task(person, day, start, end, category, number, 'competitor'))
+    for task in staff.tasks:
+        entries[task.person].append(task)
+    return {person: tuple(sorted(person_entries, key=lambda task: (task.day, task.start)))
+            for person, person_entries in enumerate(entries) if person_entries}
@@ -0,0 +1,139 @@
+"""
+Resource-aware list scheduling of rounds over several stages running in parallel.
+
+Each stage (a stage or a side room) has its own station count and may be
+limited to some categories, e.g. FMC and the BLD events in a side room while
+speed events continue on the main stage. Rounds are taken in the usual order
+and each free stage starts the first round it can run, as soon as the previous
+round of the same event has finished. Registration, lunch and prize giving are
+venue-wide.
+"""
+from dataclasses import dataclass
+
+from .constants import (fixed_time_categories, popular_categories, REGISTRATION_TIME, LUNCH_TIME, PRIZE_GIVING_TIME,
+                        MAX_DAY_LENGTH, LUNCH_WINDOW_AFTER)
+from .estimation import calculate_round_time, calculate_stations
+from .models import Schedule, ScheduleSlot
+from .scheduler import UNSCHEDULED_WARNINGS, order_rounds
+
+
+@dataclass(frozen=True, slots=True)
+class Stage:
+    """A stage or room; categories limits what it runs, None means anything"""
+    name: str
+    stations: int
+    categories: frozenset = None
+
+    def runs(self, category):
+        return self.categories is None or category in self.categories
+
+    def round_time(self, rnd):
+        """Length of a round when run with this stage's stations"""
+        return calculate_round_time(rnd.category, rnd.competitors, self.stations, rnd.cutoff, rnd.number == 1,
+                                    rnd.solve_time)
+
+
+def default_stages(plan):
+    """
+    A main stage for everything but FMC and the BLD attempts, plus a side room
+    for those and any of the less popular events
+    """
+    categories = frozenset(r.category for r in plan.rounds)
+    stages = [Stage('Main Stage', plan.num_stations, categories - fixed_time_categories)]
+    side_categories = categories - popular_categories
+    if side_categories:
+        side_competitors = max(r.competitors for r in plan.rounds if r.category in side_categories)
+        stages.append(Stage('Side Room', calculate_stations(side_competitors), side_categories))
+    return tuple(stages)
+
+def timelines(result):
+    """Split a schedule into one timeline per stage; venue-wide blocks go into every timeline"""
+    stages = {}
+    for slot in result.slots:
+        if slot.stage:
+            stages.setdefault(slot.stage, [])
+    for slot in result.slots:
+        for name, slots in stages.items():
+            if slot.stage in ('', name):
+                slots.append(slot)
+    return stages
+
+def _fill_session(day, stages, free_at, pending, finished_at, last_start, session_end, slots):
+    """
+    List-schedule pending rounds: repeatedly start the round that can start
+    earliest on any stage, until nothing can start before last_start and end
+    by session_end. Ties go to rounds that fewer stages can run, then to the
+    usual round order.
+    """
+    while pending:
+        best = None
+        for stage_idx, stage in enumerate(stages):
+            for i, rnd in enumerate(pending):
+                if not stage.runs(rnd.category):
+                    continue
+                previous = (rnd.category, rnd.number - 1)
+                if rnd.number > 1 and previous not in finished_at:
+                    continue
+                start = max(free_at[stage_idx], finished_at.get(previous, 0))
+                rank = (start, sum(s.runs(rnd.category) for s in stages), i)
+                if best is not None and rank >= best[0]:
+                    continue
+                duration = stage.round_time(rnd)
+                if start < last_start and start + duration <= session_end:
+                    best = (rank, duration, stage_idx)
+        if best is None:
+            return
+        (start, _, i), duration, stage_idx = best
+        rnd = pending.pop(i)
+        slots.append(ScheduleSlot(day, start, start + duration, rnd.category, rnd.number, stages[stage_idx].name))
+        finished_at[(rnd.category, rnd.number)] = start + duration
+        free_at[stage_idx] = start + duration
+
+def schedule_stages(plan, stages=None, order=None):
+    """
+    Schedule a plan's rounds on several stages in parallel
+    order is the rounds in the order to schedule them, order_rounds' by default
+    """
+    stages = tuple(stages or default_stages(plan))
+    pending = [r for r in order or order_rounds(plan) if any(stage.runs(r.category) for stage in stages)]
+    unplaceable = [r for r in plan.rounds if not any(stage.runs(r.category) for stage in stages)]
+    finished_at = {}
+    slots = []
+    warnings = []
+    num_days = len(plan.days)
+
+    for day, (day_start, day_end) in enumerate(plan.days, start=1):
+        current_time = day_start
+        if day == 1:
+            slots.append(ScheduleSlot(day, current_time, current_time + REGISTRATION_TIME, 'Registration'))
+            current_time += REGISTRATION_TIME
+        # Rounds of earlier days count as finished at the start of this one
+        finished_at = {key: min(end, current_time) for key, end in finished_at.items()}
+
+        # Morning: rounds start before the middle of the day and end within the lunch window
+        lunch_time = day_start + (day_end - day_start) // 2
+        free_at = [current_time] * len(stages)
+        _fill_session(day, stages, free_at, pending, finished_at, lunch_time,
+                      lunch_time + LUNCH_WINDOW_AFTER, slots)
+        day_end_time = max(free_at)
+
+        if pending:
+            lunch_start = max(lunch_time, day_end_time)
+            slots.append(ScheduleSlot(day, lunch_start, lunch_start + LUNCH_TIME, 'Lunch Break'))
+            free_at = [lunch_start + LUNCH_TIME] * len(stages)
+            _fill_session(day, stages, free_at, pending, finished_at, day_end, day_end, slots)
+            day_end_time = max(free_at)
+
+        if not pending and day_end_time + PRIZE_GIVING_TIME <= day_end:
+            slots.append(ScheduleSlot(day, day_end_time, day_end_time + PRIZE_GIVING_TIME, 'Prize Giving'))
+
+        if day_end_time - day_start > MAX_DAY_LENGTH:
+            warnings.append(f"Day {day} is longer than recommended (9 hours). Consider removing some events or rounds.")
+        if not pending:
+            break
+
+    slots.sort(key=lambda slot: (slot.day, slot.start, slot.stage))
+    unscheduled = tuple(pending) + tuple(unplaceable)
+    if unscheduled:
+        warnings.extend(UNSCHEDULED_WARNINGS)
+    return Schedule(tuple(slots), tuple(warnings), unscheduled)
@@ -0,0 +1,150 @@
+"""
+Fewest stations that fit: the smallest station count with which every round
+of a competition can be scheduled into its days and day hours, and the staff
+that station count needs.
+
+Round times only shrink as stations are added (calculate_round_time divides by
+the competitor stations), so whether the schedule fits is treated as monotone
+in the station count: the upper bound doubles until the schedule fits, then
+the gap is halved. List scheduling is not strictly monotone, so in rare cases
+a smaller count than the one found fits too; the one found always fits.
+
+Each probe estimates and schedules the competition once and is memoized on the
+immutable Config, so the search, the trade-off curve around its answer and
+later reruns with the same settings share their probes.
+
+    python -m tools.scheduling.stations 300 3x3:3 2x2:2 4x4:2 --days 2
+"""
+import argparse
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from .constants import RESERVED_STATIONS
+from .estimation import estimate
+from .models import Config, Event
+from .scheduler import schedule
+from .stages import default_stages, schedule_stages
+from .staff import ROLES, staff_needed
+
+MODES = ('greedy', 'stages')
+# Every station but the reserved ones seats a competitor, so fewer than this seats nobody
+MIN_STATIONS = RESERVED_STATIONS + 1
+MAX_STATIONS = 256
+
+
+@dataclass(frozen=True, slots=True)
+class StationOption:
+    """
+    Outcome of scheduling with num_stations; length is the minutes from the start
+    to the last block of every day used, summed, and staff are the (role, count)
+    pairs needed at the busiest moment
+    """
+    num_stations: int
+    fits: bool
+    days_used: int
+    length: int
+    staff: tuple
+    unscheduled: int = 0
+
+    @property
+    def total_staff(self):
+        return sum(count for _, count in self.staff)
+
+
+def _peak_staff(plan, result, mode):
+    """(role, count) pairs of the most staff needed at once over the schedule"""
+    rounds = {(rnd.category, rnd.number): rnd for rnd in plan.rounds}
+    stage_stations = {stage.name: stage.stations for stage in default_stages(plan)} if mode == 'stages' else {}
+    needs = []
+    for slot in result.slots:
+        rnd = rounds.get((slot.event, slot.round))
+        if rnd is None:
+            continue
+        counts = dict(staff_needed(rnd.group_size, stage_stations.get(slot.stage, plan.num_stations)))
+        needs.append((slot.day, slot.start, slot.end, counts))
+
+    # Staff needed at the start of every block, summed over the blocks running then
+    peak = dict.fromkeys(ROLES, 0)
+    best = -1
+    for day, start, _, _ in needs:
+        running = [counts for other_day, other_start, other_end, counts in needs
+                   if other_day == day and other_start <= start < other_end]
+        total = {role: sum(counts[role] for counts in running) for role in ROLES}
+        if sum(total.values()) > best:
+            best, peak = sum(total.values()), total
+    return tuple((role, peak[role]) for role in ROLES)
+
+@lru_cache(maxsize=4096)
+def probe(config, num_stations, mode='greedy'):
+    """Estimate and schedule config with num_stations and return a StationOption"""
+    plan = estimate(replace(config, num_stations=num_stations))
+    result = schedule_stages(plan) if mode == 'stages' else schedule(plan)
+    length = 0
+    for day, (day_start, _) in enumerate(plan.days, start=1):
+        ends = [slot.end for slot in result.slots if slot.day == day]
+        if ends:
+            length += max(ends) - day_start
+    days_used = max((slot.day for slot in result.slots if not slot.is_break), default=0)
+    return StationOption(num_stations, result.is_complete, days_used, length,
+                         _peak_staff(plan, result, mode), len(result.unscheduled))
+
+def minimum_stations(config, mode='greedy', max_stations=MAX_STATIONS):
+    """
+    StationOption of the fewest stations with which config fits its days, or
+    None when it does not fit even with max_stations; config.num_stations is ignored
+    """
+    config = replace(config, num_stations=None)
+    low, high = MIN_STATIONS - 1, MIN_STATIONS
+    # Double the upper bound until the schedule fits; low never fits
+    while not probe(config, high, mode).fits:
+        if high >= max_stations:
+            return None
+        low, high = high, min(2 * high, max_stations)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if probe(config, middle, mode).fits:
+            high = middle
+        else:
+            low = middle
+    return probe(config, high, mode)
+
+def trade_off(config, station_counts, mode='greedy'):
+    """StationOption for every station count, for a curve of stations against competition length"""
+    config = replace(config, num_stations=None)
+    return [probe(config, num_stations, mode) for num_stations in station_counts]
+
+def curve_counts(minimum, points=20):
+    """About points station counts from half the minimum to three times it, the minimum included"""
+    low = max(MIN_STATIONS, minimum // 2)
+    step = max(1, (3 * minimum - low) // (points - 1))
+    return sorted(set(range(low, 3 * minimum + 1, step)) | {minimum})
+
+
+def _event(argument):
+    category, _, rounds = argument.partition(':')
+    return Event(category, int(rounds or 1))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('competitors', type=int)
+    parser.add_argument('events', nargs='+', type=_event, help="category or category:rounds, e.g. 3x3:3")
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--hours', nargs=2, default=('08:00', '18:00'), metavar=('START', 'END'))
+    parser.add_argument('--mode', choices=MODES, default='greedy')
+    args = parser.parse_args(argv)
+
+    config = Config(args.competitors, tuple(args.events), args.days, (tuple(args.hours),) * args.days,
+                    args.events[0].category)
+    best = minimum_stations(config, args.mode)
+    if best is None:
+        print(f"Does not fit in {args.days} days with up to {MAX_STATIONS} stations")
+        return
+    staff = ", ".join(f"{count} {role}{'s' if count != 1 else ''}" for role, count in best.staff)
+    print(f"Minimum stations: {best.num_stations} ({staff} at the busiest time)")
+    print("Stations  Length  Days used")
+    for option in trade_off(config, curve_counts(best.num_stations), args.mode):
+        print(f"{option.num_stations:8}  {option.length:6}  {option.days_used if option.fits else '-':>9}")
+
+
+if __name__ == '__main__':
+    main()
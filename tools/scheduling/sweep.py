@@ -0,0 +1,99 @@
+"""
+Scenario sweeps: estimate and schedule every combination of competitor count,
+number of days, day hours, station count and event settings, fanned out over a
+process pool.
+
+Only the small per-case parameters travel to the workers; the settings that are
+shared by every case are sent once through the pool initializer.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from .estimation import estimate
+from .models import Config
+from .scheduler import schedule
+from .stages import schedule_stages
+
+# Cases per task sent to a worker
+CHUNKSIZE = 256
+
+_shared = {}
+
+
+@dataclass(frozen=True, slots=True)
+class Outcome:
+    """
+    Result of one sweep case; station_setting is the swept station count (None
+    for calculate_stations) and finish is minutes from midnight on the last day used
+    """
+    number_of_competitors: int
+    num_days: int
+    day_schedule: tuple
+    station_setting: int
+    variant: str
+    num_stations: int
+    feasible: bool
+    days_used: int
+    finish: int
+    unscheduled: int
+
+
+def _init(variants, day_schedules, main_event, mode, solve_times=()):
+    _shared.update(variants=variants, day_schedules=day_schedules, main_event=main_event, mode=mode,
+                   solve_times=solve_times)
+
+def _evaluate(case):
+    """Estimate and schedule one case given as (competitors, days, day hours index, stations, variant index)"""
+    number_of_competitors, num_days, day_idx, num_stations, variant_idx = case
+    day_schedule = _shared['day_schedules'][day_idx]
+    _, events = _shared['variants'][variant_idx]
+    config = Config(number_of_competitors, events, num_days, (day_schedule,) * num_days,
+                    _shared['main_event'], num_stations, solve_times=_shared['solve_times'])
+    plan = estimate(config)
+    result = schedule_stages(plan) if _shared['mode'] == 'stages' else schedule(plan)
+    rounds = [slot for slot in result.slots if not slot.is_break]
+    last = max(rounds, key=lambda slot: (slot.day, slot.end), default=None)
+    return (plan.num_stations, not result.unscheduled, last.day if last else 0,
+            last.end if last else 0, len(result.unscheduled))
+
+def sweep(competitor_counts, day_counts=(1, 2, 3), day_schedules=(('08:00', '18:00'),),
+          station_counts=(None,), variants=(), main_event='3x3', mode='greedy', workers=None,
+          solve_times=()):
+    """
+    Evaluate every combination of the given parameters
+    variants is a sequence of (name, events) pairs; a station count of None uses calculate_stations
+    mode is 'greedy' or 'stages'; workers=1 runs in this process
+    solve_times are (category, seconds per round type) pairs as in Config.solve_times
+    """
+    variants = tuple((name, tuple(events)) for name, events in variants)
+    day_schedules = tuple(tuple(day) for day in day_schedules)
+    cases = list(itertools.product(competitor_counts, day_counts, range(len(day_schedules)),
+                                   station_counts, range(len(variants))))
+    initargs = (variants, day_schedules, main_event, mode, tuple(solve_times))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(cases) <= CHUNKSIZE:
+        _init(*initargs)
+        results = map(_evaluate, cases)
+        return _outcomes(cases, results, variants, day_schedules)
+    with ProcessPoolExecutor(workers, initializer=_init, initargs=initargs) as pool:
+        results = pool.map(_evaluate, cases, chunksize=CHUNKSIZE)
+        return _outcomes(cases, results, variants, day_schedules)
+
+def _outcomes(cases, results, variants, day_schedules):
+    return [Outcome(number_of_competitors, num_days, day_schedules[day_idx], station_setting,
+                    variants[variant_idx][0], *result)
+            for (number_of_competitors, num_days, day_idx, station_setting, variant_idx), result
+            in zip(cases, results)]
+
+def frontier(outcomes):
+    """Largest competitor count that fits, for each (days, day hours, stations, variant)"""
+    best = {}
+    for outcome in outcomes:
+        key = (outcome.num_days, outcome.day_schedule, outcome.station_setting, outcome.variant)
+        best.setdefault(key, 0)
+        if outcome.feasible:
+            best[key] = max(best[key], outcome.number_of_competitors)
+    return best
@@ -0,0 +1,190 @@
+"""
+Precomputed estimate tables for the common settings, memory-mapped from disk.
+
+The rounds estimate_event returns for the default registration percentages
+and stations depend only on the event, the total competitors, the rounds, the
+advancement, the final size and the cutoff. For 1 to MAX_COMPETITORS
+competitors and the settings in SETTINGS and CUTOFFS they are computed once
+with the vectorized model and saved as uint16 arrays:
+
+    estimate_competitors.npy, estimate_groups.npy   (events, settings, competitors, rounds)
+    estimate_minutes.npy                            (events, settings, cutoffs, competitors, rounds)
+    estimate_tables.json                            fingerprint of the data the tables came from
+
+Loading memory-maps the arrays, so every process serving the page shares the
+same pages and a lookup reads a few bytes. The tables are rebuilt when the
+fingerprint of event_details, registration_percentages and the other inputs
+changes. Events outside the tables' domain are estimated as before.
+
+    python -m tools.scheduling.tables data/estimate_tables
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .constants import (categories, registration_percentages, event_details, small_categories,
+                        single_group_categories, fixed_time_categories, DEFAULT_SOLVE_TIME,
+                        FIXED_ROUND_TIME, RESERVED_STATIONS)
+from .estimation import validate_rounds
+from .models import Event, Round
+from .vectorized import MAX_ROUNDS, estimate_grid
+
+TABLES_META = 'estimate_tables.json'
+COMPETITORS_FILE = 'estimate_competitors.npy'
+GROUPS_FILE = 'estimate_groups.npy'
+MINUTES_FILE = 'estimate_minutes.npy'
+
+MAX_COMPETITORS = 5000
+# Advancement percentage of every round but the last, and final sizes, covered by the tables
+ADVANCE_OPTIONS = (50, 75)
+FINAL_SIZES = (8, 12, 16)
+CUTOFFS = ('None', '1:00', '2:00', '3:00')
+
+# (rounds, advancement, final size) combinations; None where a setting is not used
+SETTINGS = ((1, None, None),) + tuple((2, None, final) for final in FINAL_SIZES) + tuple(
+    (rounds, advance, final) for rounds in range(3, MAX_ROUNDS + 1)
+    for advance in ADVANCE_OPTIONS for final in FINAL_SIZES)
+SETTING_INDEX = {setting: i for i, setting in enumerate(SETTINGS)}
+CUTOFF_INDEX = {cutoff: i for i, cutoff in enumerate(CUTOFFS)}
+CATEGORY_INDEX = {category: i for i, category in enumerate(categories)}
+
+
+def fingerprint():
+    """Hash of everything the tables are computed from"""
+    inputs = {
+        'event_details': event_details,
+        'registration_percentages': registration_percentages,
+        'categories': [categories, sorted(small_categories), sorted(single_group_categories),
+                       sorted(fixed_time_categories)],
+        'constants': [DEFAULT_SOLVE_TIME, FIXED_ROUND_TIME, RESERVED_STATIONS],
+        'domain': [MAX_COMPETITORS, SETTINGS, CUTOFFS],
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def setting_of(event):
+    """Index into SETTINGS of an event's settings, or None when the tables do not cover them"""
+    if event.rounds == 1:
+        return SETTING_INDEX[SETTINGS[0]]
+    if event.rounds == 2:
+        return SETTING_INDEX.get((2, None, event.final_size))
+    advances = {min(75, event.advance_percent(number)) for number in range(1, event.rounds - 1)}
+    if len(advances) != 1:
+        return None
+    return SETTING_INDEX.get((event.rounds, advances.pop(), event.final_size))
+
+def _setting_event(category, setting, cutoff):
+    rounds, advance, final = setting
+    advance = advance or 50
+    return Event(category, rounds, cutoff, advance, advance, advance, final or 8)
+
+def build_tables(directory):
+    """Compute the tables and write them to directory"""
+    counts = np.arange(1, MAX_COMPETITORS + 1)
+    shape = (len(categories), len(SETTINGS), MAX_COMPETITORS, MAX_ROUNDS)
+    competitors = np.zeros(shape, dtype=np.uint16)
+    groups = np.zeros(shape, dtype=np.uint16)
+    minutes = np.zeros(shape[:2] + (len(CUTOFFS),) + shape[2:], dtype=np.uint16)
+    for s, setting in enumerate(SETTINGS):
+        for c, cutoff in enumerate(CUTOFFS):
+            grid = estimate_grid(counts, [_setting_event(category, setting, cutoff) for category in categories])
+            # Competitors and groups do not depend on the cutoff
+            if c == 0:
+                competitors[:, s] = grid.competitors.transpose(0, 2, 1)
+                groups[:, s] = grid.groups.transpose(0, 2, 1)
+            minutes[:, s, c] = grid.minutes.transpose(0, 2, 1)
+
+    os.makedirs(directory, exist_ok=True)
+    for name, table in ((COMPETITORS_FILE, competitors), (GROUPS_FILE, groups), (MINUTES_FILE, minutes)):
+        # Written aside and moved into place, so a process loading the tables never sees half a file
+        partial = os.path.join(directory, f'.{name}.partial')
+        with open(partial, 'wb') as f:
+            np.save(f, table)
+        os.replace(partial, os.path.join(directory, name))
+    partial = os.path.join(directory, f'.{TABLES_META}.partial')
+    with open(partial, 'w') as f:
+        json.dump({'fingerprint': fingerprint(), 'shape': list(minutes.shape)}, f)
+    os.replace(partial, os.path.join(directory, TABLES_META))
+
+
+class EstimateTables:
+    """Memory-mapped estimate tables"""
+
+    def __init__(self, competitors, groups, minutes):
+        self.competitors = competitors
+        self.groups = groups
+        self.minutes = minutes
+
+    @staticmethod
+    def is_current(directory):
+        """Whether directory holds tables built from the current inputs"""
+        try:
+            with open(os.path.join(directory, TABLES_META)) as f:
+                return json.load(f).get('fingerprint') == fingerprint()
+        except (OSError, ValueError):
+            return False
+
+    @classmethod
+    def load(cls, directory, build=False):
+        """
+        Memory-map the tables in directory; with build they are built first when
+        missing or out of date, otherwise None is returned then
+        """
+        if not cls.is_current(directory):
+            if not build:
+                return None
+            build_tables(directory)
+        tables = [np.load(os.path.join(directory, name), mmap_mode='r')
+                  for name in (COMPETITORS_FILE, GROUPS_FILE, MINUTES_FILE)]
+        expected = (len(categories), len(SETTINGS), len(CUTOFFS), MAX_COMPETITORS, MAX_ROUNDS)
+        if tables[2].shape != expected:
+            raise ValueError(f"Estimate tables have shape {tables[2].shape}, expected {expected}")
+        # Plain ndarray views of the maps index several times faster than np.memmap itself
+        return cls(*(table.view(np.ndarray) for table in tables))
+
+    def lookup(self, event, total_competitors):
+        """
+        (rounds, warning) as estimate_event returns them for the default
+        percentages and stations, or None when the tables do not cover the event
+        """
+        category = CATEGORY_INDEX.get(event.category)
+        setting = setting_of(event)
+        cutoff = CUTOFF_INDEX.get(event.cutoff)
+        if category is None or setting is None or cutoff is None or not 1 <= total_competitors <= MAX_COMPETITORS:
+            return None
+        row = total_competitors - 1
+        competitors = self.competitors[category, setting, row].tolist()
+        groups = self.groups[category, setting, row].tolist()
+        minutes = self.minutes[category, setting, cutoff, row].tolist()
+
+        num_rounds, message = validate_rounds(competitors[0], event.rounds)
+        warning = f"{event.category}: {message}" if num_rounds != event.rounds else None
+        rounds = []
+        for number in range(1, num_rounds + 1):
+            count, num_groups = competitors[number - 1], groups[number - 1]
+            if event.category in single_group_categories:
+                group_size = count
+            else:
+                group_size = -(-count // num_groups) if num_groups else 0
+            rounds.append(Round(event.category, number, count, num_groups, group_size, minutes[number - 1],
+                                number == num_rounds and num_rounds > 1, event.cutoff))
+        return tuple(rounds), warning
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', help="directory to write the tables to")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the tables are up to date")
+    args = parser.parse_args(argv)
+
+    if not args.force and EstimateTables.is_current(args.directory):
+        print(f"Tables in {args.directory} are up to date")
+        return
+    build_tables(args.directory)
+    print(f"Built estimate tables in {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
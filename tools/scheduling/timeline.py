@@ -0,0 +1,201 @@
+"""
+Group-level timeline of a schedule with an interval index.
+
+Every round is split into its groups, and every group and break becomes a
+Block in integer minutes on its day and in its room (the round's stage;
+breaks are venue-wide and have no room). Blocks are indexed per day and room,
+and each competitor's and staff member's blocks per day, in lanes: intervals
+sorted by start and split into as few chains as possible of intervals that do
+not overlap each other. Within a chain the ends are sorted as well as the
+starts, so the intervals overlapping a query are a slice found by two
+bisections, however long any one of them is. "What is on at 14:05 in this
+room", overlap and free/busy queries take O(d log n) plus the number of blocks
+found, where d is the most blocks a lane has running at once: one for a room
+that is not double-booked, two while a venue-wide break overlaps a round.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+
+from .groups import group_times
+
+
+@dataclass(frozen=True, slots=True)
+class Block:
+    """One group of a round, or a break (round 0, group 0); start and end are minutes from midnight"""
+    day: int
+    start: int
+    end: int
+    room: str
+    event: str
+    round: int = 0
+    group: int = 0
+
+    @property
+    def is_break(self):
+        return self.round == 0
+
+
+class _Lane:
+    """
+    Intervals sorted by start, split into chains of intervals that do not overlap;
+    a chain is (starts, ends, positions in the lane)
+    """
+    __slots__ = ('starts', 'ends', 'items', 'chains')
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda interval: interval[:2])
+        self.starts = [start for start, _, _ in intervals]
+        self.ends = [end for _, end, _ in intervals]
+        self.items = [item for _, _, item in intervals]
+        # Each interval goes to the chain that ended earliest, if it has ended by then,
+        # which gives as many chains as intervals running at once
+        self.chains = []
+        ended = []
+        for i, (start, end) in enumerate(zip(self.starts, self.ends)):
+            if ended and ended[0][0] <= start:
+                _, number = heapq.heappop(ended)
+            else:
+                number = len(self.chains)
+                self.chains.append(([], [], []))
+            chain_starts, chain_ends, positions = self.chains[number]
+            chain_starts.append(start)
+            chain_ends.append(end)
+            positions.append(i)
+            heapq.heappush(ended, (end, number))
+
+    def overlapping(self, start, end):
+        """Items whose interval overlaps [start, end), in start order"""
+        found = []
+        for chain_starts, chain_ends, positions in self.chains:
+            found.extend(positions[bisect_right(chain_ends, start):bisect_left(chain_starts, end)])
+        if len(self.chains) > 1:
+            found.sort()
+        return [self.items[i] for i in found]
+
+    def overlaps(self):
+        """(earlier, later) pairs of items whose intervals overlap"""
+        pairs = []
+        for j, start in enumerate(self.starts):
+            # Intervals before j in the lane that end after it starts
+            earlier = []
+            for _, chain_ends, positions in self.chains:
+                earlier.extend(positions[bisect_right(chain_ends, start):bisect_left(positions, j)])
+            pairs.extend((self.items[k], self.items[j]) for k in sorted(earlier))
+        return pairs
+
+
+class Timeline:
+    """
+    Blocks of a schedule indexed by day and room, and optionally by person;
+    people maps a person (competitor index) to the blocks they compete or staff in
+    """
+
+    def __init__(self, blocks, people=None):
+        self.blocks = tuple(sorted(blocks, key=lambda block: (block.day, block.start, block.room)))
+        lanes = {}
+        for block in self.blocks:
+            lanes.setdefault((block.day, block.room), []).append((block.start, block.end, block))
+        self._lanes = {key: _Lane(intervals) for key, intervals in lanes.items()}
+        self._groups = {}
+        for block in self.blocks:
+            if not block.is_break:
+                self._groups.setdefault((block.event, block.round), []).append(block)
+        person_lanes = {}
+        for person, person_blocks in (people or {}).items():
+            for block in person_blocks:
+                person_lanes.setdefault((person, block.day), []).append((block.start, block.end, block))
+        self._people = {key: _Lane(intervals) for key, intervals in person_lanes.items()}
+
+    @classmethod
+    def from_schedule(cls, result, plan=None, assignment=None, staff=None):
+        """
+        Timeline of a Schedule; rounds are split into the groups estimated in plan
+        (one group without it), with the first-round group times of a
+        GroupAssignment made for this schedule, and the people of the assignment
+        and of a StaffAssignment indexed
+        """
+        rounds = {(rnd.category, rnd.number): rnd for rnd in plan.rounds} if plan else {}
+        first_rounds = {event.category: event for event in assignment.events} if assignment else {}
+        blocks = []
+        for slot in result.slots:
+            if slot.is_break:
+                blocks.append(Block(slot.day, slot.start, slot.end, '', slot.event))
+                continue
+            assigned = first_rounds.get(slot.event) if slot.round == 1 else None
+            if assigned is not None and assigned.times and assigned.day == slot.day \
+                    and assigned.times[0][0] == slot.start:
+                times = assigned.times
+            else:
+                rnd = rounds.get((slot.event, slot.round))
+                num_groups = max(1, rnd.groups) if rnd else 1
+                times = [(round(start), round(end)) for start, end in group_times(slot, num_groups)]
+            blocks.extend(Block(slot.day, start, end, slot.stage, slot.event, slot.round, number)
+                          for number, (start, end) in enumerate(times, start=1))
+
+        timeline = cls(blocks)
+        if assignment is None and staff is None:
+            return timeline
+        people = {}
+        for event in assignment.events if assignment else ():
+            for number, members in enumerate(event.groups, start=1):
+                block = timeline.group(event.category, 1, number)
+                for person in members if block else ():
+                    people.setdefault(person, []).append(block)
+        for task in staff.tasks if staff else ():
+            block = timeline.group(task.category, 1, task.group)
+            if block:
+                people.setdefault(task.person, []).append(block)
+        return cls(blocks, people)
+
+    @property
+    def rooms(self):
+        return tuple(sorted({block.room for block in self.blocks if block.room}))
+
+    def groups(self, event, round_number):
+        """Blocks of the groups of a round, in group order"""
+        return tuple(self._groups.get((event, round_number), ()))
+
+    def group(self, event, round_number, group):
+        blocks = self._groups.get((event, round_number), ())
+        return blocks[group - 1] if 0 < group <= len(blocks) else None
+
+    def overlapping(self, day, start, end, room=None):
+        """Blocks overlapping [start, end) on day, in room and venue-wide, or in every room when room is None"""
+        if room is None:
+            lanes = [lane for (lane_day, _), lane in self._lanes.items() if lane_day == day]
+        else:
+            lanes = [self._lanes[key] for key in {(day, room), (day, '')} if key in self._lanes]
+        found = [block for lane in lanes for block in lane.overlapping(start, end)]
+        return sorted(found, key=lambda block: (block.start, block.room)) if len(lanes) > 1 else found
+
+    def at(self, day, minute, room=None):
+        """Blocks running at minute on day"""
+        return self.overlapping(day, minute, minute + 1, room)
+
+    def conflicts(self):
+        """(earlier, later) pairs of blocks double-booked in a room, or overlapping a venue-wide break"""
+        pairs = []
+        for (day, room), lane in self._lanes.items():
+            pairs.extend(lane.overlaps())
+            venue = self._lanes.get((day, ''))
+            if room and venue is not None:
+                for block in venue.items:
+                    pairs.extend((block, other) if block.start <= other.start else (other, block)
+                                 for other in lane.overlapping(block.start, block.end))
+        return pairs
+
+    def person_at(self, person, day, minute):
+        """Blocks a person is in at minute on day"""
+        lane = self._people.get((person, day))
+        return lane.overlapping(minute, minute + 1) if lane else []
+
+    def is_free(self, person, day, start, end):
+        """Whether a person has no block overlapping [start, end) on day"""
+        lane = self._people.get((person, day))
+        return lane is None or not lane.overlapping(start, end)
+
+    def double_bookings(self):
+        """(person, earlier, later) for every person in two blocks at once"""
+        return [(person, earlier, later) for (person, _), lane in self._people.items()
+                for earlier, later in lane.overlaps()]
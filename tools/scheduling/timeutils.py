@@ -0,0 +1,26 @@
+"""Conversions between "HH:MM" strings and integer minutes"""
+
+
+def parse_hhmm(value):
+    """Convert an HH:MM (or MM:SS) string to an integer count of minutes (or seconds)"""
+    hours, minutes = map(int, value.split(':'))
+    return hours * 60 + minutes
+
+def minutes_to_hhmm(minutes):
+    """Convert minutes to HH:MM format"""
+    hours = minutes // 60
+    remaining_minutes = minutes % 60
+    return f"{int(hours):02d}:{int(remaining_minutes):02d}"
+
+def get_day_schedule(day_start, day_end):
+    """Convert time strings to minutes from midnight"""
+    return parse_hhmm(day_start), parse_hhmm(day_end)
+
+def parse_cutoff(cutoff):
+    """Return a cutoff in seconds, or None when the event has no usable cutoff"""
+    if cutoff and cutoff != 'None' and isinstance(cutoff, str) and ':' in cutoff:
+        try:
+            return parse_hhmm(cutoff)
+        except ValueError:
+            return None
+    return None
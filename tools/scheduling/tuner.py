@@ -0,0 +1,229 @@
+"""
+Settings tuner: rounds, cutoffs and advancement that make a competition fit
+its days while keeping it as friendly to competitors as possible.
+
+Every event's settings are only ever lowered from the organizer's: fewer
+rounds (as far as validate_rounds allows), a tighter cutoff from CUTOFF_LADDER
+but no lower than the event's expected solve time, 25-75% advancement in
+ADVANCE_STEPS and a smaller final. Each variant is scored for friendliness:
+
+    ROUND_POINTS per round, a point per competitor in a round after the first,
+    less 30 / cutoff seconds per first-round competitor (half a point at 1:00)
+
+Per event, the variants are estimated once and memoized, and only those no
+other variant beats on both score and minutes are kept. Every round lasts a
+multiple of 15 minutes, so a table of the best score the remaining events can
+reach within each number of 15-minute units left is built backwards over the
+events. A depth-first search then picks one variant per event, pruning any
+branch whose minutes cannot fit the time left for rounds (a lower bound on the
+days it needs) or whose score cannot beat the suggestions kept so far. The
+highest-scoring combinations are scheduled for real; when too few of them fit,
+the minutes allowed are lowered a unit at a time and the search repeated.
+"""
+import heapq
+import itertools
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from .constants import fixed_time_categories, DEFAULT_SOLVE_TIME, REGISTRATION_TIME, LUNCH_TIME, PRIZE_GIVING_TIME
+from .estimation import calculate_stations, estimate_event, validate_rounds
+from .models import SETTING_KEYS, Event, Plan
+from .scheduler import schedule
+from .stages import schedule_stages
+from .timeutils import get_day_schedule, parse_cutoff
+
+# Tighter cutoffs the tuner may suggest, loosest first
+CUTOFF_LADDER = ('None', '5:00', '3:00', '2:00', '1:30', '1:00', '0:45', '0:30')
+ADVANCE_STEPS = (75, 50, 25)
+FINAL_SIZES = (16, 12, 8, 6, 4)
+ROUND_POINTS = 1000
+UNIT = 15
+# Combinations scheduled per search, for each suggestion asked for
+CANDIDATES_PER_SUGGESTION = 4
+
+
+@dataclass(frozen=True, slots=True)
+class Option:
+    """One variant of an event's settings; minutes is the length of all its rounds"""
+    event: Event
+    rounds: tuple
+    minutes: int
+    score: float
+    changes: int
+
+
+@dataclass(frozen=True, slots=True)
+class Suggestion:
+    """
+    Settings that fit the days; changes are (category, setting, current, suggested)
+    tuples, and finish is minutes from midnight on the last day used
+    """
+    events: tuple
+    score: float
+    minutes: int
+    days_used: int
+    finish: int
+    changes: tuple
+
+
+def friendliness(event, rounds):
+    """Score of an event's estimated rounds, higher is friendlier"""
+    score = ROUND_POINTS * len(rounds) + sum(rnd.competitors for rnd in rounds[1:])
+    cutoff = parse_cutoff(event.cutoff)
+    if cutoff and rounds and event.category not in fixed_time_categories:
+        score -= rounds[0].competitors * 30 / cutoff
+    return score
+
+def relevant_settings(event):
+    """The setting keys that affect an event with its number of rounds"""
+    keys = ['rounds', 'cutoff']
+    keys.extend(f'advance_r{number}' for number in range(1, event.rounds - 1))
+    if event.rounds > 1:
+        keys.append('final_size')
+    return keys
+
+def setting_changes(current, suggested):
+    """(category, setting, current, suggested) for every relevant setting that differs"""
+    before, after = current.to_settings(), suggested.to_settings()
+    return tuple((current.category, key, before[key], after[key]) for key in relevant_settings(suggested)
+                 if key in SETTING_KEYS and before[key] != after[key])
+
+def _looser_or_equal(cutoff, other):
+    """Whether cutoff lets through at least as much as other"""
+    seconds, other_seconds = parse_cutoff(cutoff), parse_cutoff(other)
+    return seconds is None or other_seconds is not None and seconds >= other_seconds
+
+def _variants(event, max_rounds, solve_time):
+    """Every event with settings no higher than event's and cutoffs of at least solve_time seconds"""
+    cutoffs = [event.cutoff]
+    if event.category not in fixed_time_categories:
+        cutoffs += [cutoff for cutoff in CUTOFF_LADDER if cutoff != event.cutoff
+                    and _looser_or_equal(event.cutoff, cutoff) and (parse_cutoff(cutoff) or solve_time) >= solve_time]
+    for rounds in range(1, min(event.rounds, max_rounds) + 1):
+        advances = [sorted({event.advance_percent(number)} | {step for step in ADVANCE_STEPS
+                                                             if step < event.advance_percent(number)})
+                    for number in range(1, rounds - 1)]
+        finals = sorted({event.final_size} | {size for size in FINAL_SIZES if size < event.final_size}) \
+            if rounds > 1 else [event.final_size]
+        for cutoff, final_size, advance in itertools.product(cutoffs, finals, itertools.product(*advances)):
+            settings = dict(zip(('advance_r1', 'advance_r2', 'advance_r3'), advance))
+            yield replace(event, rounds=rounds, cutoff=cutoff, final_size=final_size, **settings)
+
+@lru_cache(maxsize=512)
+def event_options(event, total_competitors, num_stations, percentage=None, solve_times=None, registered=None):
+    """
+    Variants of an event, fewest minutes first, keeping only those with a higher
+    score than every variant that takes no longer
+    """
+    rounds, _ = estimate_event(event, total_competitors, num_stations, percentage, solve_times, registered)
+    max_rounds, _ = validate_rounds(rounds[0].competitors if rounds else 0, event.rounds)
+    # Variants that estimate to the same rounds differ only in settings that have no effect
+    best = {}
+    for variant in _variants(event, max_rounds, solve_times[0] if solve_times else DEFAULT_SOLVE_TIME):
+        rounds, _ = estimate_event(variant, total_competitors, num_stations, percentage, solve_times, registered)
+        option = Option(variant, rounds, sum(rnd.duration for rnd in rounds), friendliness(variant, rounds),
+                        len(setting_changes(event, variant)))
+        known = best.get(rounds)
+        if known is None or (option.score, -option.changes) > (known.score, -known.changes):
+            best[rounds] = option
+
+    options = []
+    for option in sorted(best.values(), key=lambda option: (option.minutes, -option.score, option.changes)):
+        if not options or option.score > options[-1].score:
+            options.append(option)
+    return tuple(options)
+
+def round_minutes(days):
+    """Upper bound on the minutes rounds can take over the days, after registration, lunches and prize giving"""
+    total = sum(end - start for start, end in days)
+    return total - REGISTRATION_TIME - LUNCH_TIME * len(days) - PRIZE_GIVING_TIME
+
+def _best_scores(options, units):
+    """best[i][u]: highest total score of events i and on within u units, None where they cannot fit"""
+    best = [[0.0] * (units + 1)]
+    for choices in reversed(options):
+        after = best[0]
+        row = [None] * (units + 1)
+        for option in choices:
+            need = option.minutes // UNIT
+            for left in range(need, units + 1):
+                rest = after[left - need]
+                if rest is not None and (row[left] is None or option.score + rest > row[left]):
+                    row[left] = option.score + rest
+        best.insert(0, row)
+    return best
+
+def _top_combinations(options, units, count, skip):
+    """The count highest-scoring choices of one option per event within units, other than those in skip"""
+    best = _best_scores(options, units)
+    # Friendliest options first, so good combinations are found early and prune the rest
+    orders = [sorted(range(len(choices)), key=lambda k: -choices[k].score) for choices in options]
+    kept = []  # min-heap of (score, tiebreak, choice)
+    counter = itertools.count()
+    choice = []
+
+    def search(i, left, score):
+        if best[i][left] is None:
+            return
+        if len(kept) == count and score + best[i][left] <= kept[0][0]:
+            return
+        if i == len(options):
+            if tuple(choice) not in skip:
+                entry = (score, next(counter), tuple(choice))
+                if len(kept) < count:
+                    heapq.heappush(kept, entry)
+                else:
+                    heapq.heappushpop(kept, entry)
+            return
+        for index in orders[i]:
+            need = options[i][index].minutes // UNIT
+            if need <= left:
+                choice.append(index)
+                search(i + 1, left - need, score + options[i][index].score)
+                choice.pop()
+
+    search(0, units, 0.0)
+    return [choice for _, _, choice in sorted(kept, reverse=True)]
+
+def suggest(config, limit=5, mode='greedy'):
+    """
+    Up to limit Suggestions of lowered settings with which config fits its days,
+    friendliest first; the current settings come first when they fit already
+    mode is 'greedy' or 'stages', as in sweep
+    """
+    num_stations = config.num_stations or calculate_stations(config.number_of_competitors)
+    days = tuple(get_day_schedule(*day) for day in config.day_schedules[:config.num_days])
+    rates, solve_times, registrations = (dict(config.registration_rates), dict(config.solve_times),
+                                         dict(config.registrations))
+    events = [event if isinstance(event, Event) else Event(event) for event in config.events]
+    options = [event_options(event, config.number_of_competitors, num_stations, rates.get(event.category),
+                             solve_times.get(event.category), registrations.get(event.category))
+               for event in events]
+
+    suggestions = []
+    tried = set()
+    units = round_minutes(days) // UNIT
+    while units >= 0 and len(suggestions) < limit:
+        combinations = _top_combinations(options, units, limit * CANDIDATES_PER_SUGGESTION, tried)
+        if not combinations:
+            # Nothing new fits the bound, so nothing with fewer minutes can either
+            break
+        for choice in combinations:
+            tried.add(choice)
+            chosen = [options[i][index] for i, index in enumerate(choice)]
+            plan = Plan(tuple(rnd for option in chosen for rnd in option.rounds), num_stations, days,
+                        config.main_event)
+            result = schedule_stages(plan) if mode == 'stages' else schedule(plan)
+            if not result.is_complete:
+                continue
+            last = max((slot for slot in result.slots if not slot.is_break), key=lambda slot: (slot.day, slot.end),
+                       default=None)
+            suggestions.append(Suggestion(
+                tuple(option.event for option in chosen), sum(option.score for option in chosen),
+                sum(option.minutes for option in chosen), last.day if last else 0, last.end if last else 0,
+                tuple(change for event, option in zip(events, chosen)
+                      for change in setting_changes(event, option.event))))
+        # The combinations left within this bound did not fit, so look for ones that leave more slack
+        units -= 1
+    suggestions.sort(key=lambda suggestion: (-suggestion.score, len(suggestion.changes)))
+    return suggestions[:limit]
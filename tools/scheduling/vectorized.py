@@ -0,0 +1,183 @@
+"""
+Vectorized round model: competitors, groups and minutes for every
+event x round x competitor-count cell in one NumPy pass.
+
+Gives the same numbers as estimation.estimate_event, but evaluates thousands of
+competitor counts at once, e.g. for sweeps over 20 to 3000 competitors.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .constants import (categories, registration_percentages, event_details, small_categories,
+                        single_group_categories, fixed_time_categories, DEFAULT_SOLVE_TIME,
+                        FIXED_ROUND_TIME, RESERVED_STATIONS)
+from .models import Event
+from .timeutils import parse_cutoff
+
+# WCA regulations allow at most 4 rounds per event
+MAX_ROUNDS = 4
+
+# Event tables as arrays, aligned with `categories`
+CATEGORY_INDEX = {category: i for i, category in enumerate(categories)}
+PERCENTAGES = np.array([registration_percentages[c] for c in categories], dtype=np.float64)
+ATTEMPTS = np.array([event_details[c]['attempts'] for c in categories], dtype=np.float64)
+SCRAMBLE_TIMES = np.array([event_details[c]['scramble_time'] for c in categories], dtype=np.float64)
+IS_FIXED_TIME = np.array([c in fixed_time_categories for c in categories])
+IS_SINGLE_GROUP = np.array([c in single_group_categories for c in categories])
+# Stations multiplier for the maximum group size
+GROUP_FACTOR = np.array([3 if c in small_categories else 2 for c in categories], dtype=np.float64)
+
+
+@dataclass(frozen=True, slots=True)
+class Grid:
+    """
+    Dense estimates; per-cell arrays have shape (events, MAX_ROUNDS, counts)
+    and rounds past an event's allowed rounds are zero
+    """
+    categories: tuple
+    competitor_counts: np.ndarray
+    num_stations: np.ndarray
+    rounds: np.ndarray
+    competitors: np.ndarray
+    groups: np.ndarray
+    group_size: np.ndarray
+    minutes: np.ndarray
+
+    @property
+    def active(self):
+        """Mask of cells that are real rounds"""
+        round_numbers = np.arange(1, MAX_ROUNDS + 1)[None, :, None]
+        return round_numbers <= self.rounds[:, None, :]
+
+    def total_minutes(self):
+        """Total competition minutes per competitor count"""
+        return self.minutes.sum(axis=(0, 1))
+
+    def to_frame(self):
+        """Return the active cells as a tidy DataFrame"""
+        import pandas as pd
+
+        event_idx, round_idx, count_idx = np.nonzero(self.active)
+        return pd.DataFrame({
+            'Category': np.asarray(self.categories, dtype=object)[event_idx],
+            'Total Competitors': self.competitor_counts[count_idx],
+            'Round': round_idx + 1,
+            'Competitors': self.competitors[event_idx, round_idx, count_idx],
+            'Groups': self.groups[event_idx, round_idx, count_idx],
+            'Group Size': self.group_size[event_idx, round_idx, count_idx],
+            'Minutes': self.minutes[event_idx, round_idx, count_idx],
+        })
+
+
+def calculate_stations(total_competitors):
+    """Vectorized estimation.calculate_stations"""
+    base_stations = np.ceil(total_competitors / 20) * 2
+    return np.maximum(base_stations, 6).astype(np.int64)
+
+def validate_rounds(num_competitors, proposed_rounds):
+    """Vectorized estimation.validate_rounds; returns the allowed rounds only"""
+    proposed_rounds = np.broadcast_to(proposed_rounds, np.shape(num_competitors))
+    return np.select(
+        [num_competitors <= 7, num_competitors <= 15, num_competitors <= 99],
+        [1, np.minimum(2, proposed_rounds), np.minimum(3, proposed_rounds)],
+        proposed_rounds,
+    )
+
+def _round_up_to_5(number):
+    return np.ceil(number / 5) * 5
+
+def _event_arrays(events, solve_times=()):
+    """Per-event settings as arrays of shape (events, 1) so they broadcast over counts"""
+    solve_times = dict(solve_times)
+    events = [Event(e) if isinstance(e, str) else e for e in events]
+    events = [e for e in events if e.category in CATEGORY_INDEX]
+    index = np.array([CATEGORY_INDEX[e.category] for e in events], dtype=np.int64)
+    cutoffs = [parse_cutoff(e.cutoff) for e in events]
+    has_cutoff = np.array([c is not None for c in cutoffs])
+    cutoff_seconds = np.array([c or 0 for c in cutoffs], dtype=np.float64)
+    column = lambda values, dtype=np.float64: np.asarray(values, dtype=dtype)[:, None]
+    return {
+        'categories': tuple(e.category for e in events),
+        'index': index,
+        'rounds': column([min(e.rounds, MAX_ROUNDS) for e in events], np.int64),
+        # Ensure at least 25% are eliminated
+        'advance': np.minimum(75, np.array([[e.advance_percent(r) for r in range(1, MAX_ROUNDS)]
+                                            for e in events], dtype=np.float64).reshape(len(events), -1)),
+        'final_size': column([e.final_size for e in events]),
+        'has_cutoff': column(has_cutoff, bool),
+        'cutoff_seconds': column(cutoff_seconds),
+        # Seconds per attempt for the first, second, semi and final round types without a cutoff
+        'solve_time': np.array([[time or DEFAULT_SOLVE_TIME for time in solve_times.get(e.category, (None,) * 4)]
+                                for e in events], dtype=np.float64).reshape(len(events), 4),
+    }
+
+def _solving_time(settings, round_num, is_final):
+    """Seconds per attempt of a round, shape (events, counts) or (events, 1)"""
+    # Use 70% of cutoff time for first round, 60% for subsequent rounds
+    if round_num == 1:
+        return np.where(settings['has_cutoff'], settings['cutoff_seconds'] * 0.7, settings['solve_time'][:, :1])
+    round_type = min(round_num, 3) - 1
+    prior = np.where(is_final, settings['solve_time'][:, 3:], settings['solve_time'][:, round_type:round_type + 1])
+    return np.where(settings['has_cutoff'], settings['cutoff_seconds'] * 0.6, prior)
+
+def _groups(idx, competitors, num_stations):
+    max_per_group = num_stations * GROUP_FACTOR[idx][:, None]
+    num_groups = np.ceil(competitors / max_per_group)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        group_size = np.where(num_groups > 0, np.ceil(competitors / np.maximum(num_groups, 1)), 0)
+    single = IS_SINGLE_GROUP[idx][:, None]
+    num_groups = np.where(single, 1, num_groups)
+    group_size = np.where(single, competitors, group_size)
+    return num_groups, group_size
+
+def _minutes(idx, competitors, num_stations, solving_time):
+    total_time_per_solve = solving_time + SCRAMBLE_TIMES[idx][:, None]
+    total_seconds = (total_time_per_solve * ATTEMPTS[idx][:, None] * competitors) / (num_stations - RESERVED_STATIONS)
+    total_minutes = total_seconds / 60
+    minutes = np.ceil(total_minutes / 15) * 15
+    return np.where(IS_FIXED_TIME[idx][:, None], FIXED_ROUND_TIME, minutes)
+
+def estimate_grid(competitor_counts, events=None, solve_times=()):
+    """
+    Estimate every round of every event for each total competitor count
+    events are Event objects or category names and default to all categories;
+    solve_times are (category, seconds per round type) pairs as in Config.solve_times
+    """
+    counts = np.atleast_1d(np.asarray(competitor_counts, dtype=np.int64))
+    settings = _event_arrays(categories if events is None else events, solve_times)
+    idx = settings['index']
+    num_events = len(idx)
+
+    num_stations = calculate_stations(counts)
+    stations = num_stations[None, :].astype(np.float64)
+
+    shape = (num_events, MAX_ROUNDS, len(counts))
+    competitors = np.zeros(shape)
+    groups = np.zeros(shape)
+    group_size = np.zeros(shape)
+    minutes = np.zeros(shape)
+
+    current = _round_up_to_5((PERCENTAGES[idx][:, None] / 100) * counts[None, :])
+    allowed_rounds = validate_rounds(current, settings['rounds'])
+
+    for round_num in range(1, MAX_ROUNDS + 1):
+        active = round_num <= allowed_rounds
+        is_final = round_num == allowed_rounds
+        if round_num > 1:
+            final = np.minimum(settings['final_size'], np.floor(current * 0.75))
+            advanced = _round_up_to_5(current * (settings['advance'][:, round_num - 2:round_num - 1] / 100))
+            current = np.where(is_final, final, advanced)
+        current = np.where(active, current, 0)
+        solving_time = _solving_time(settings, round_num, is_final)
+
+        r = round_num - 1
+        competitors[:, r] = current
+        round_groups, round_group_size = _groups(idx, current, stations)
+        groups[:, r] = np.where(active, round_groups, 0)
+        group_size[:, r] = np.where(active, round_group_size, 0)
+        minutes[:, r] = np.where(active, _minutes(idx, current, stations, solving_time), 0)
+
+    as_int = lambda values: values.astype(np.int64)
+    return Grid(settings['categories'], counts, num_stations, as_int(allowed_rounds),
+                as_int(competitors), as_int(groups), as_int(group_size), as_int(minutes))
@@ -0,0 +1,419 @@
+"""
+Import and export of the WCA Competition Interchange Format (WCIF).
+
+read_wcif takes the events, rounds, cutoffs and advancement of a competition
+and its accepted registrations; the per-event registration counts replace the
+estimated registration percentages. export_wcif writes a generated schedule as
+one venue with a room per stage, an activity per round and break, and child
+activities for the groups of every round.
+
+WCIF files of large competitions hold thousands of persons. The file is read
+a chunk at a time and decoded one value at a time, and each person is reduced
+to a Competitor as soon as it is decoded, so the whole document is never held
+in memory:
+
+    python -m tools.scheduling.wcif competition.json --output schedule.json
+"""
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from .constants import cutoff_attempts, event_details, fixed_time_categories
+from .estimation import estimate
+from .groups import Competitor
+from .models import Config, Event
+from .scheduler import schedule
+from .timeline import Timeline
+from .timeutils import parse_cutoff
+
+# WCIF event ids of the categories
+EVENT_IDS = {
+    '3x3': '333', '2x2': '222', '4x4': '444', '5x5': '555', '6x6': '666', '7x7': '777',
+    '3BLD': '333bf', '3OH': '333oh', 'FMC': '333fm', 'Megaminx': 'minx', 'Pyraminx': 'pyram',
+    'Skewb': 'skewb', 'Square-1': 'sq1', 'Clock': 'clock', '4BLD': '444bf', '5BLD': '555bf',
+    'MBLD': '333mbf',
+}
+CATEGORIES = {event_id: category for category, event_id in EVENT_IDS.items()}
+# Activity codes of the breaks
+BREAK_CODES = {'Registration': 'other-registration', 'Lunch Break': 'other-lunch',
+               'Prize Giving': 'other-awards'}
+ROUND_FORMATS = {'Ao5': 'a', 'Mo3': 'm', 'Single': '1'}
+# Hours of a day, and the hours every imported day is widened to
+DEFAULT_DAY_HOURS = ('08:00', '18:00')
+# WCIF staff roles mapped onto Competitor.staff_roles
+STAFF_ROLES = {'staff-scrambler': 'scrambler', 'staff-runner': 'runner', 'staff-judge': 'judge'}
+ROOM_COLORS = ('#304a96', '#0e7c47', '#a3151b', '#c56b00')
+
+# Characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'\s*')
+_DECODER = json.JSONDecoder()
+
+
+@dataclass(frozen=True, slots=True)
+class Competition:
+    """
+    What the scheduler uses from a WCIF; registrations are (category, competitors)
+    pairs and day_schedules the (start, end) hours of each day of the WCIF's own
+    schedule widened to DEFAULT_DAY_HOURS, empty when it has none
+    """
+    id: str
+    name: str
+    start_date: str
+    num_days: int
+    events: tuple
+    registrations: tuple
+    competitors: tuple
+    day_schedules: tuple = ()
+    timezone: str = 'UTC'
+
+    @property
+    def number_of_competitors(self):
+        return sum(1 for competitor in self.competitors if competitor.events)
+
+    def config(self, day_schedules=None, main_event='3x3', **kwargs):
+        """Config of the competition with its actual registrations"""
+        day_schedules = tuple(day_schedules or self.day_schedules or (DEFAULT_DAY_HOURS,) * self.num_days)
+        return Config(self.number_of_competitors, self.events, self.num_days, day_schedules, main_event,
+                      registrations=self.registrations, **kwargs)
+
+
+class _Stream:
+    """Incremental reader of one JSON document from a text file"""
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        """Append up to size characters, dropping what has been consumed"""
+        chunk = self.file.read(size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return bool(chunk)
+
+    def peek(self):
+        """Next non-whitespace character, '' at the end of the input"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Invalid WCIF: expected {char!r}, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete value"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read more, twice as much each time, so long values are decoded a few times at most
+            self._fill(size)
+            size *= 2
+
+    def _separator(self, close):
+        """Whether another member follows, after a ',' or the closing character"""
+        found = self.peek()
+        self.pos += 1
+        if found == close:
+            return False
+        if found != ',':
+            raise ValueError(f"Invalid WCIF: expected ',' or {close!r}, found {found or 'end of file'!r}")
+        return True
+
+    def keys(self):
+        """Keys of an object; the caller consumes each member's value before the next key"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if not self._separator('}'):
+                return
+
+    def items(self):
+        """Positions of the items of an array; the caller consumes each item"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if not self._separator(']'):
+                return
+
+
+def _cutoff(cutoff):
+    """Cutoff in the sidebar's MM:SS format from a WCIF cutoff"""
+    if not cutoff:
+        return 'None'
+    seconds = cutoff['attemptResult'] // 100
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def _event(category, rounds, registered):
+    """Event settings from the rounds of a WCIF event"""
+    settings = {'rounds': max(1, len(rounds))}
+    if rounds and category not in fixed_time_categories:
+        settings['cutoff'] = _cutoff(rounds[0].get('cutoff'))
+    competitors = registered
+    for number, rnd in enumerate(rounds[:-1], start=1):
+        condition = rnd.get('advancementCondition') or {}
+        if condition.get('type') == 'percent':
+            percent = condition['level']
+        elif condition.get('type') == 'ranking':
+            percent = 100 * condition['level'] / competitors if competitors else 75
+        else:
+            continue
+        if number == len(rounds) - 1 and condition.get('type') == 'ranking':
+            settings['final_size'] = max(2, condition['level'])
+        else:
+            settings[f'advance_r{number}'] = min(75, max(25, round(percent)))
+        competitors = max(1, round(competitors * percent / 100))
+    return Event.from_settings(category, settings)
+
+def _competitor(person):
+    """Competitor from a WCIF person; None for people who are neither registered nor staff"""
+    registration = person.get('registration') or {}
+    accepted = registration.get('status', 'accepted') == 'accepted' and registration.get('isCompeting', True)
+    events = frozenset(CATEGORIES[event_id] for event_id in registration.get('eventIds', ())
+                       if event_id in CATEGORIES) if accepted else frozenset()
+    staff_roles = frozenset(STAFF_ROLES[role] for role in person.get('roles', ()) if role in STAFF_ROLES)
+    if not events and not staff_roles:
+        return None
+    # Averages seed ahead of singles, as in the WCA rankings used for grouping
+    averages = {}
+    singles = {}
+    for best in person.get('personalBests', ()):
+        category = CATEGORIES.get(best.get('eventId'))
+        if category in events:
+            (averages if best.get('type') == 'average' else singles)[category] = best['best'] / 100
+    seeds = {**singles, **averages}
+    return Competitor(person.get('name', ''), events, tuple(sorted(seeds.items())), staff_roles)
+
+def _day_schedules(schedule_data, start_date, num_days):
+    """
+    (start, end) hours of each day of a WCIF schedule, at least DEFAULT_DAY_HOURS so
+    that a day with few activities keeps room to reschedule; empty if it has no activities
+    """
+    first_day = date.fromisoformat(start_date)
+    default_start, default_end = (datetime.strptime(hhmm, '%H:%M').time() for hhmm in DEFAULT_DAY_HOURS)
+    hours = {}
+    for venue in schedule_data.get('venues', ()):
+        zone = ZoneInfo(venue.get('timezone') or 'UTC')
+        for room in venue.get('rooms', ()):
+            for activity in room.get('activities', ()):
+                start = datetime.fromisoformat(activity['startTime']).astimezone(zone)
+                end = datetime.fromisoformat(activity['endTime']).astimezone(zone)
+                day = (start.date() - first_day).days
+                earliest, latest = hours.get(day, (start.time(), end.time()))
+                hours[day] = (min(earliest, start.time()), max(latest, end.time()))
+    if not hours:
+        return ()
+    return tuple((min(start, default_start).strftime('%H:%M'), max(end, default_end).strftime('%H:%M'))
+                 for start, end in (hours.get(day, (default_start, default_end)) for day in range(num_days)))
+
+def read_wcif(file):
+    """Read a Competition from a WCIF text file object"""
+    stream = _Stream(file)
+    header = {}
+    events_data = []
+    schedule_data = {}
+    competitors = []
+    counts = {}
+    for key in stream.keys():
+        if key == 'persons':
+            for _ in stream.items():
+                person = stream.value()
+                if not isinstance(person, dict):
+                    raise ValueError(f"Invalid WCIF: expected a person object, found {person!r}")
+                competitor = _competitor(person)
+                if competitor is None:
+                    continue
+                competitors.append(competitor)
+                for category in competitor.events:
+                    counts[category] = counts.get(category, 0) + 1
+        elif key == 'events':
+            events_data = stream.value()
+        elif key == 'schedule':
+            schedule_data = stream.value() or {}
+        else:
+            header[key] = stream.value()
+
+    events = tuple(_event(CATEGORIES[event['id']], event.get('rounds') or (), counts.get(CATEGORIES[event['id']], 0))
+                   for event in events_data if event.get('id') in CATEGORIES)
+    start_date = schedule_data.get('startDate') or date.today().isoformat()
+    num_days = int(schedule_data.get('numberOfDays') or 1)
+    venues = schedule_data.get('venues') or ()
+    return Competition(
+        header.get('id', ''), header.get('name', ''), start_date, num_days, events,
+        tuple((event.category, counts.get(event.category, 0)) for event in events),
+        tuple(competitors), _day_schedules(schedule_data, start_date, num_days),
+        venues[0].get('timezone') or 'UTC' if venues else 'UTC')
+
+def load_wcif(path):
+    with open(path, encoding='utf-8') as f:
+        return read_wcif(f)
+
+
+def _round_id(category, number):
+    return f"{EVENT_IDS[category]}-r{number}"
+
+def _wcif_rounds(event, rounds):
+    """WCIF rounds of one event from its settings and estimated rounds"""
+    details = event_details[event.category]
+    cutoff_seconds = parse_cutoff(event.cutoff)
+    wcif_rounds = []
+    for rnd in rounds:
+        has_cutoff = rnd.number == 1 and cutoff_seconds is not None and details['format'] in cutoff_attempts
+        if rnd.is_final or rnd.number == len(rounds):
+            advancement = None
+        elif rnd.number == len(rounds) - 1:
+            advancement = {'type': 'ranking', 'level': rounds[-1].competitors}
+        else:
+            advancement = {'type': 'percent', 'level': event.advance_percent(rnd.number)}
+        wcif_rounds.append({
+            'id': _round_id(event.category, rnd.number),
+            'format': ROUND_FORMATS[details['format']],
+            'timeLimit': None if event.category in fixed_time_categories
+                         else {'centiseconds': details['time_limit'] * 100, 'cumulativeRoundIds': []},
+            'cutoff': {'numberOfAttempts': cutoff_attempts[details['format']], 'attemptResult': cutoff_seconds * 100}
+                      if has_cutoff else None,
+            'advancementCondition': advancement,
+            'scrambleSetCount': rnd.groups,
+            'results': [],
+            'extensions': [],
+        })
+    return wcif_rounds
+
+def export_wcif(config, plan, result, competition_id='', name='', start_date=None, timezone='UTC',
+                assignment=None):
+    """
+    WCIF document of a schedule; assignment is a GroupAssignment whose first-round
+    group times are used, other rounds' slots are split evenly between their groups
+    as in Timeline.from_schedule
+    """
+    start_date = date.fromisoformat(start_date) if start_date else date.today()
+    zone = ZoneInfo(timezone)
+    rounds = {(rnd.category, rnd.number): rnd for rnd in plan.rounds}
+    timeline = Timeline.from_schedule(result, plan, assignment)
+
+    def instant(day, minutes):
+        local = datetime.combine(start_date + timedelta(days=day - 1), datetime.min.time(), zone)
+        return (local + timedelta(minutes=minutes)).astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    activity_ids = iter(range(1, 1 << 31))
+
+    def activity(slot, activity_name, code, start, end):
+        return {'id': next(activity_ids), 'name': activity_name, 'activityCode': code,
+                'startTime': instant(slot.day, start), 'endTime': instant(slot.day, end),
+                'childActivities': [], 'extensions': []}
+
+    # A room per stage; breaks are venue-wide, so they are listed in every room
+    rooms = {stage: [] for stage in sorted({slot.stage for slot in result.slots if not slot.is_break}) or ['']}
+    for slot in result.slots:
+        if slot.is_break:
+            for activities in rooms.values():
+                activities.append(activity(slot, slot.event, BREAK_CODES.get(slot.event, 'other-misc'),
+                                           slot.start, slot.end))
+            continue
+        rnd = rounds.get((slot.event, slot.round))
+        code = _round_id(slot.event, slot.round)
+        round_name = f"{slot.event}, {'Final' if rnd is not None and rnd.is_final else f'Round {slot.round}'}"
+        parent = activity(slot, round_name, code, slot.start, slot.end)
+        for group in timeline.groups(slot.event, slot.round):
+            parent['childActivities'].append(activity(slot, f"{round_name}, Group {group.group}",
+                                                      f"{code}-g{group.group}", group.start, group.end))
+        rooms[slot.stage].append(parent)
+
+    events_by_category = {event.category: event for event in config.events}
+    return {
+        'formatVersion': '1.0',
+        'id': competition_id,
+        'name': name,
+        'shortName': name,
+        'persons': [],
+        'events': [{
+            'id': EVENT_IDS[category],
+            'rounds': _wcif_rounds(event, [rnd for rnd in plan.rounds if rnd.category == category]),
+            'extensions': [],
+        } for category, event in events_by_category.items() if category in EVENT_IDS],
+        'schedule': {
+            'startDate': start_date.isoformat(),
+            'numberOfDays': len(plan.days),
+            'venues': [{
+                'id': 1,
+                'name': name or 'Venue',
+                'latitudeMicrodegrees': 0,
+                'longitudeMicrodegrees': 0,
+                'countryIso2': '',
+                'timezone': timezone,
+                'rooms': [{
+                    'id': i,
+                    'name': stage or 'Main Room',
+                    'color': ROOM_COLORS[(i - 1) % len(ROOM_COLORS)],
+                    'activities': activities,
+                    'extensions': [],
+                } for i, (stage, activities) in enumerate(rooms.items(), start=1)],
+                'extensions': [],
+            }],
+        },
+        'competitorLimit': None,
+        'extensions': [],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('input', help="WCIF file of the competition")
+    parser.add_argument('--output', default='-', help="WCIF file to write the schedule to, - for stdout")
+    parser.add_argument('--main-event', default='3x3')
+    parser.add_argument('--hours', nargs=2, metavar=('START', 'END'),
+                        help="hours of every day (default: those of the input's schedule, or 08:00 18:00)")
+    args = parser.parse_args(argv)
+
+    competition = load_wcif(args.input)
+    config = competition.config((tuple(args.hours),) * competition.num_days if args.hours else None,
+                                args.main_event)
+    plan = estimate(config)
+    result = schedule(plan)
+    for warning in plan.warnings + result.warnings:
+        print(warning, file=sys.stderr)
+    wcif = export_wcif(config, plan, result, competition.id, competition.name, competition.start_date,
+                       competition.timezone)
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        json.dump(wcif, target, indent=2)
+        target.write('\n')
+    finally:
+        if target is not sys.stdout:
+            target.close()
+
+
+if __name__ == '__main__':
+    main()